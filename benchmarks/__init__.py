@@ -0,0 +1 @@
+# Benchmark and simulation tooling for fsm. Not shipped with the package.
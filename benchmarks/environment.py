@@ -0,0 +1,67 @@
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+
+from benchmarks import fake_adb
+from benchmarks.release_server import ReleaseServer
+
+PROJECT_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+class FakeEnvironment:
+    """Temporary fake adb home plus a local release server"""
+
+    def __init__(self, versions=("16.1.4",), asset_size=1024 * 1024):
+        self.versions = versions
+        self.asset_size = asset_size
+        self.root = None
+        self.home = None
+        self.bin_dir = None
+        self.server = None
+
+    def __enter__(self):
+        self.root = tempfile.mkdtemp(prefix="fsm-bench-")
+        self.home = os.path.join(self.root, "devices")
+        self.bin_dir = os.path.join(self.root, "bin")
+        os.makedirs(self.home)
+        fake_adb.install_fake_adb(self.bin_dir)
+        self.server = ReleaseServer(versions=self.versions, asset_size=self.asset_size).start()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        if self.server:
+            self.server.stop()
+        shutil.rmtree(self.root, ignore_errors=True)
+
+    def add_device(self, serial="emulator-5554", **kwargs):
+        """Create a simulated device and return its directory"""
+        return fake_adb.create_device(self.home, serial, **kwargs)
+
+    def add_servers(self, device_dir, count, version="16.1.4", directory="/data/local/tmp"):
+        """Populate a device with `count` fake frida-server binaries"""
+        content = fake_adb.fake_server_script(version)
+        for index in range(count):
+            fake_adb.add_device_file(device_dir, f"{directory}/frida-server-{version}-{index:03d}", content)
+
+    def env(self, serial=None):
+        """Environment for child processes that should see the fake adb"""
+        env = dict(os.environ)
+        env["PATH"] = self.bin_dir + os.pathsep + env.get("PATH", "")
+        env[fake_adb.HOME_ENV] = self.home
+        env["PYTHONPATH"] = PROJECT_ROOT + os.pathsep + env.get("PYTHONPATH", "")
+        if serial:
+            env["ANDROID_SERIAL"] = serial
+        return env
+
+    def run_fsm(self, args, serial=None, check=True):
+        """Run `python -m fsm <args>` and return (elapsed seconds, CompletedProcess)"""
+        start = time.perf_counter()
+        result = subprocess.run([sys.executable, "-m", "fsm"] + list(args), env=self.env(serial),
+                                stdout=subprocess.PIPE, stderr=subprocess.PIPE, text=True)
+        elapsed = time.perf_counter() - start
+        if check and result.returncode != 0:
+            raise RuntimeError(f"fsm {' '.join(args)} failed ({result.returncode}):\n{result.stdout}{result.stderr}")
+        return elapsed, result
@@ -0,0 +1,607 @@
+#!/usr/bin/env python3
+"""
+Scriptable stand-in for the `adb` executable.
+
+Every simulated device lives in its own directory under $FSM_FAKE_ADB_HOME:
+
+    <home>/<serial>/device.json      static facts (abi, model, latency, failure rate)
+    <home>/<serial>/processes.json   process table shown by ps/pkill/kill
+    <home>/<serial>/root/            device filesystem (/data/local/tmp, ...)
+    <home>/<serial>/logcat.txt       log buffer (`-v epoch` lines) served by `adb logcat`
+    <home>/forwards.json             `adb forward` table shared by all devices
+
+`adb shell` commands run in a real /bin/sh with device paths rewritten into the
+device root, so ls, stat, find, cat, chmod, mv and friends behave like the real
+thing. Process related tools (ps, pidof, pkill, killall, kill, nohup, su,
+getprop, id) are provided as shims that operate on processes.json.
+"""
+
+import json
+import os
+import random
+import re
+import shutil
+import subprocess
+import sys
+import threading
+import time
+
+HOME_ENV = "FSM_FAKE_ADB_HOME"
+DEVICE_ENV = "FSM_FAKE_ADB_DEVICE"
+
+ROOT_ENV = "FSM_FAKE_ADB_ROOT"
+
+SHIMS = ["ps", "pidof", "pkill", "killall", "kill", "nohup", "su", "getprop", "id"]
+
+# Device path prefixes that are mapped into the device root directory
+_DEVICE_PATH_RE = re.compile(r"(?<![\w.\-/])/(?:data|sdcard|storage|vendor)(?=[/\s'\";|&)<>]|$)")
+
+_BASE_PROCESSES = [
+    ("root", "init"),
+    ("root", "ueventd"),
+    ("logd", "logd"),
+    ("root", "zygote64"),
+    ("system", "system_server"),
+    ("u0_a42", "com.android.systemui"),
+]
+
+
+def create_device(home, serial, abi="arm64-v8a", model="Pixel Fake", latency=0.0,
+                  failure_rate=0.0, root=True, process_count=0, props=None):
+    """Create (or reset) a simulated device and return its directory"""
+    device_dir = os.path.join(home, serial)
+    if os.path.exists(device_dir):
+        shutil.rmtree(device_dir)
+    os.makedirs(os.path.join(device_dir, "root", "data", "local", "tmp"))
+    os.makedirs(os.path.join(device_dir, "root", "sdcard"))
+
+    config = {
+        "serial": serial,
+        "latency": latency,
+        "failure_rate": failure_rate,
+        "root": root,
+        "props": {
+            "ro.product.cpu.abi": abi,
+            "ro.product.model": model,
+            "ro.build.version.sdk": "33",
+        },
+    }
+    if props:
+        config["props"].update(props)
+    with open(os.path.join(device_dir, "device.json"), "w") as f:
+        json.dump(config, f, indent=2)
+
+    os.makedirs(_shim_dir(device_dir))
+    for shim in SHIMS:
+        _write_wrapper(os.path.join(_shim_dir(device_dir), shim), ["--shim", shim])
+
+    processes = []
+    for index, (user, name) in enumerate(_BASE_PROCESSES):
+        processes.append(_process_entry(index + 1, user, name))
+    for index in range(process_count):
+        pid = 1000 + index
+        processes.append(_process_entry(pid, f"u0_a{index % 200}", f"com.example.app{index}"))
+    _write_json(os.path.join(device_dir, "processes.json"), {"next_pid": 20000, "processes": processes})
+
+    return device_dir
+
+
+def add_device_file(device_dir, device_path, content, mode=0o755):
+    """Place a file on a simulated device"""
+    local_path = os.path.join(device_dir, "root", device_path.lstrip("/"))
+    os.makedirs(os.path.dirname(local_path), exist_ok=True)
+    with open(local_path, "wb") as f:
+        f.write(content)
+    os.chmod(local_path, mode)
+    return local_path
+
+
+def add_logcat(device_dir, tag, message, pid=1000, priority="I", timestamp=None):
+    """Append an entry to a simulated device's log buffer"""
+    timestamp = time.time() if timestamp is None else timestamp
+    with open(os.path.join(device_dir, "logcat.txt"), "a") as f:
+        f.write(f"{timestamp:15.3f} {pid:5d} {pid:5d} {priority} {tag:<8}: {message}\n")
+        f.flush()
+
+
+def install_fake_adb(bin_dir):
+    """Write an `adb` wrapper into bin_dir that dispatches to this script"""
+    os.makedirs(bin_dir, exist_ok=True)
+    adb_path = os.path.join(bin_dir, "adb")
+    _write_wrapper(adb_path, [])
+    return adb_path
+
+
+def fake_server_script(version, padding=0):
+    """Return the bytes of a fake frida-server that answers --version"""
+    script = (
+        "#!/bin/sh\n"
+        f"# frida-server {version}\n"
+        f"if [ \"$1\" = \"--version\" ]; then echo {version}; exit 0; fi\n"
+        f"echo \"Frida {version} listening on 127.0.0.1:27042\"\n"
+        "exit 0\n"
+    ).encode()
+    if padding:
+        # Fill with incompressible data so downloads and pushes move real bytes
+        script += b"#" + os.urandom(padding // 2).hex().encode()[:padding] + b"\n"
+    return script
+
+
+def _write_wrapper(path, extra_args):
+    args = " ".join(extra_args)
+    with open(path, "w") as f:
+        f.write(f"#!/bin/sh\nexec \"{sys.executable}\" \"{os.path.abspath(__file__)}\" {args} \"$@\"\n")
+    os.chmod(path, 0o755)
+
+
+def _process_entry(pid, user, args):
+    return {"pid": pid, "ppid": 1, "user": user, "vsz": 1000000 + pid, "rss": 20000 + pid % 5000, "args": args}
+
+
+def _read_json(path):
+    with open(path) as f:
+        return json.load(f)
+
+
+def _write_json(path, data):
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+    with open(tmp_path, "w") as f:
+        json.dump(data, f)
+    os.replace(tmp_path, path)
+
+
+class _ProcessTable:
+    """Locked read-modify-write access to a device's processes.json"""
+
+    def __init__(self, device_dir):
+        self.path = os.path.join(device_dir, "processes.json")
+        self.lock_path = self.path + ".lock"
+
+    def __enter__(self):
+        import fcntl
+        self._lock = open(self.lock_path, "a")
+        fcntl.flock(self._lock, fcntl.LOCK_EX)
+        self.data = _read_json(self.path)
+        return self.data
+
+    def __exit__(self, exc_type, exc, tb):
+        if exc_type is None:
+            _write_json(self.path, self.data)
+        self._lock.close()
+
+
+def _device_dirs(home):
+    if not os.path.isdir(home):
+        return []
+    return sorted(
+        os.path.join(home, name) for name in os.listdir(home)
+        if os.path.exists(os.path.join(home, name, "device.json"))
+    )
+
+
+def _select_device(home, serial):
+    devices = _device_dirs(home)
+    if serial:
+        for device_dir in devices:
+            if os.path.basename(device_dir) == serial:
+                return device_dir
+        sys.stderr.write(f"adb: device '{serial}' not found\n")
+        sys.exit(1)
+    if not devices:
+        sys.stderr.write("adb: no devices/emulators found\n")
+        sys.exit(1)
+    if len(devices) > 1:
+        sys.stderr.write("adb: more than one device/emulator\n")
+        sys.exit(1)
+    return devices[0]
+
+
+def _to_device(device_dir, text):
+    root = os.path.join(device_dir, "root")
+    return _DEVICE_PATH_RE.sub(lambda m: root + m.group(0), text)
+
+
+def _from_device(device_dir, text):
+    return text.replace(os.path.join(device_dir, "root"), "")
+
+
+def _shim_dir(device_dir):
+    return os.path.join(device_dir, "bin")
+
+
+def _shell_prelude(device_dir):
+    # `kill` is a shell builtin, so route it to the shim explicitly
+    return f'kill() {{ "{_shim_dir(device_dir)}/kill" "$@"; }}\n'
+
+
+def _simulate_link(config):
+    if config.get("latency"):
+        time.sleep(config["latency"])
+    if config.get("failure_rate") and random.random() < config["failure_rate"]:
+        sys.stderr.write("adb: error: device offline\n")
+        sys.exit(1)
+
+
+def _cmd_devices(home):
+    sys.stdout.write("List of devices attached\n")
+    for device_dir in _device_dirs(home):
+        config = _read_json(os.path.join(device_dir, "device.json"))
+        if config.get("latency"):
+            time.sleep(config["latency"] / 10)
+        sys.stdout.write(f"{config['serial']}\tdevice\n")
+    sys.stdout.write("\n")
+    return 0
+
+
+def _cmd_push(device_dir, local_path, remote_path):
+    target = _to_device(device_dir, remote_path)
+    if os.path.isdir(target):
+        target = os.path.join(target, os.path.basename(local_path))
+    if not os.path.isdir(os.path.dirname(target)):
+        sys.stderr.write(f"adb: error: failed to copy '{local_path}' to '{remote_path}': No such file or directory\n")
+        return 1
+    start = time.time()
+    shutil.copyfile(local_path, target)
+    size = os.path.getsize(target)
+    elapsed = max(time.time() - start, 1e-6)
+    sys.stdout.write(f"{local_path}: 1 file pushed, 0 skipped. {size / elapsed / 1e6:.1f} MB/s ({size} bytes in {elapsed:.3f}s)\n")
+    return 0
+
+
+def _cmd_pull(device_dir, remote_path, local_path):
+    source = _to_device(device_dir, remote_path)
+    if not os.path.exists(source):
+        sys.stderr.write(f"adb: error: failed to stat remote object '{remote_path}': No such file or directory\n")
+        return 1
+    if os.path.isdir(local_path):
+        local_path = os.path.join(local_path, os.path.basename(remote_path))
+    shutil.copyfile(source, local_path)
+    sys.stdout.write(f"{remote_path}: 1 file pulled, 0 skipped.\n")
+    return 0
+
+
+class _ForwardTable(_ProcessTable):
+    """Locked read-modify-write access to the host-wide forwards.json"""
+
+    def __init__(self, home):
+        self.path = os.path.join(home, "forwards.json")
+        self.lock_path = self.path + ".lock"
+
+    def __enter__(self):
+        import fcntl
+        self._lock = open(self.lock_path, "a")
+        fcntl.flock(self._lock, fcntl.LOCK_EX)
+        self.data = _read_json(self.path) if os.path.exists(self.path) else []
+        return self.data
+
+
+def _cmd_forward(home, serial, args):
+    with _ForwardTable(home) as forwards:
+        # Like adb, forwards of devices that went away disappear
+        connected = {os.path.basename(device_dir) for device_dir in _device_dirs(home)}
+        forwards[:] = [forward for forward in forwards if forward["serial"] in connected]
+
+        if args and args[0] == "--list":
+            for forward in forwards:
+                sys.stdout.write(f"{forward['serial']} {forward['local']} {forward['remote']}\n")
+            return 0
+        if args and args[0] == "--remove-all":
+            forwards[:] = []
+            return 0
+        if args and args[0] == "--remove":
+            remaining = [forward for forward in forwards if forward["local"] != args[1]]
+            if len(remaining) == len(forwards):
+                sys.stderr.write(f"adb: error: listener '{args[1]}' not found\n")
+                return 1
+            forwards[:] = remaining
+            return 0
+
+        no_rebind = "--no-rebind" in args
+        local, remote = [arg for arg in args if not arg.startswith("--")][:2]
+        if no_rebind and any(forward["local"] == local for forward in forwards):
+            sys.stderr.write("adb: error: cannot rebind existing socket\n")
+            return 1
+        device_serial = os.path.basename(_select_device(home, serial))
+        forwards[:] = [forward for forward in forwards if forward["local"] != local]
+        forwards.append({"serial": device_serial, "local": local, "remote": remote})
+    return 0
+
+
+def _cmd_logcat(device_dir, args):
+    import shlex
+    # Like the real adb, the arguments are interpreted by the device shell
+    args = shlex.split(" ".join(args))
+    dump, pattern, pid, since, count = False, None, None, None, None
+    index = 0
+    while index < len(args):
+        arg = args[index]
+        if arg == "-d":
+            dump = True
+        elif arg in ("-e", "--regex"):
+            index += 1
+            pattern = re.compile(args[index])
+        elif arg.startswith("--pid="):
+            pid = int(arg.split("=", 1)[1])
+        elif arg == "-T":
+            # Like logcat: 'sssss.mmm' is a start time, a plain number a count of recent lines
+            index += 1
+            if "." in args[index]:
+                since = float(args[index])
+            else:
+                count = int(args[index])
+        elif arg in ("-v", "-b"):
+            index += 1
+        index += 1
+
+    def matches(line):
+        parts = line.split(None, 5)
+        if len(parts) < 6:
+            return False
+        if since is not None and float(parts[0]) < since:
+            return False
+        if pid is not None and int(parts[1]) != pid:
+            return False
+        message = line.split(": ", 1)[1] if ": " in line else ""
+        return not pattern or bool(pattern.search(message))
+
+    path = os.path.join(device_dir, "logcat.txt")
+    if not os.path.exists(path):
+        open(path, "a").close()
+    with open(path, "rb") as f:
+        if count is not None:
+            lines = f.readlines()
+            complete = [line for line in lines if line.endswith(b"\n")]
+            skip = max(len(complete) - count, 0)
+            f.seek(sum(len(line) for line in complete[:skip]))
+        while True:
+            line = f.readline()
+            if line.endswith(b"\n"):
+                if matches(line.decode(errors="replace")):
+                    sys.stdout.write(line.decode(errors="replace"))
+                    sys.stdout.flush()
+                continue
+            if dump:
+                return 0
+            # Follow the buffer like logcat does until killed
+            f.seek(f.tell() - len(line))
+            time.sleep(0.05)
+
+
+def _cmd_shell(device_dir, args):
+    command = _shell_prelude(device_dir) + _to_device(device_dir, " ".join(args))
+    env = dict(os.environ)
+    env[DEVICE_ENV] = device_dir
+    env["PATH"] = _shim_dir(device_dir) + os.pathsep + env.get("PATH", "")
+    process = subprocess.Popen(["/bin/sh", "-c", command], stdin=sys.stdin, stdout=subprocess.PIPE,
+                               stderr=subprocess.PIPE, env=env)
+    errors = []
+    reader = threading.Thread(target=lambda: errors.append(process.stderr.read()), daemon=True)
+    reader.start()
+    # Relay stdout as it is produced so streaming commands like `tail -f` work
+    for line in process.stdout:
+        sys.stdout.write(_from_device(device_dir, line.decode(errors="replace")))
+        sys.stdout.flush()
+    process.wait()
+    reader.join()
+    sys.stderr.write(_from_device(device_dir, b"".join(errors).decode(errors="replace")))
+    return process.returncode
+
+
+def adb_main(argv):
+    home = os.environ.get(HOME_ENV)
+    if not home:
+        sys.stderr.write(f"fake adb: {HOME_ENV} is not set\n")
+        return 1
+
+    serial = os.environ.get("ANDROID_SERIAL")
+    while argv and argv[0] in ("-s", "-d", "-e"):
+        if argv[0] == "-s":
+            serial = argv[1]
+            argv = argv[2:]
+        else:
+            argv = argv[1:]
+
+    if not argv:
+        sys.stderr.write("fake adb: no command given\n")
+        return 1
+
+    command, args = argv[0], argv[1:]
+    if command == "devices":
+        return _cmd_devices(home)
+    if command in ("start-server", "kill-server"):
+        return 0
+    if command == "forward":
+        return _cmd_forward(home, serial, args)
+
+    device_dir = _select_device(home, serial)
+    config = _read_json(os.path.join(device_dir, "device.json"))
+    _simulate_link(config)
+
+    if command == "get-serialno":
+        sys.stdout.write(config["serial"] + "\n")
+        return 0
+    if command == "push":
+        return _cmd_push(device_dir, args[0], args[1])
+    if command == "pull":
+        return _cmd_pull(device_dir, args[0], args[1] if len(args) > 1 else ".")
+    if command in ("shell", "exec-out"):
+        return _cmd_shell(device_dir, args)
+    if command == "logcat":
+        return _cmd_logcat(device_dir, args)
+
+    sys.stderr.write(f"fake adb: unsupported command: {command}\n")
+    return 1
+
+
+# --- device-side shims -------------------------------------------------------
+
+def _format_ps(processes, fields=None):
+    if fields:
+        columns = [field.upper() for field in fields.split(",")]
+        lines = [" ".join(columns)]
+        for proc in processes:
+            values = []
+            for column in columns:
+                if column in ("ARGS", "CMD", "CMDLINE", "NAME", "COMM"):
+                    values.append(proc["args"])
+                else:
+                    values.append(str(proc.get(column.lower(), "")))
+            lines.append(" ".join(values))
+        return "\n".join(lines) + "\n"
+
+    lines = ["USER           PID  PPID     VSZ    RSS WCHAN            ADDR S NAME"]
+    for proc in processes:
+        lines.append(
+            f"{proc['user']:<10} {proc['pid']:>7} {proc['ppid']:>5} {proc['vsz']:>7} {proc['rss']:>6} "
+            f"0                   0 S {proc['args']}"
+        )
+    return "\n".join(lines) + "\n"
+
+
+def _matches(proc, pattern, full):
+    if full:
+        return re.search(pattern, proc["args"]) is not None
+    name = os.path.basename(proc["args"].split()[0]) if proc["args"] else ""
+    return name == pattern
+
+
+def _shim_ps(device_dir, args):
+    with _ProcessTable(device_dir) as table:
+        processes = list(table["processes"])
+    fields = None
+    if "-p" in args:
+        pids = {int(pid) for pid in args[args.index("-p") + 1].split(",")}
+        processes = [proc for proc in processes if proc["pid"] in pids]
+        if not processes:
+            return 1
+    if "-o" in args:
+        fields = args[args.index("-o") + 1]
+    sys.stdout.write(_format_ps(processes, fields))
+    return 0
+
+
+def _shim_pidof(device_dir, args):
+    with _ProcessTable(device_dir) as table:
+        pids = [str(proc["pid"]) for proc in table["processes"] if args and _matches(proc, args[-1], False)]
+    if not pids:
+        return 1
+    sys.stdout.write(" ".join(pids) + "\n")
+    return 0
+
+
+def _shim_kill_by(device_dir, pattern, full):
+    with _ProcessTable(device_dir) as table:
+        before = len(table["processes"])
+        table["processes"] = [proc for proc in table["processes"] if not _matches(proc, pattern, full)]
+        killed = before - len(table["processes"])
+    return 0 if killed else 1
+
+
+def _shim_pkill(device_dir, args):
+    full = "-f" in args
+    pattern = [arg for arg in args if not arg.startswith("-")][-1]
+    return _shim_kill_by(device_dir, pattern, full)
+
+
+def _shim_killall(device_dir, args):
+    name = [arg for arg in args if not arg.startswith("-")][-1]
+    result = _shim_kill_by(device_dir, name, False)
+    if result:
+        sys.stderr.write(f"killall: {name}: no process killed\n")
+    return result
+
+
+def _shim_kill(device_dir, args):
+    pids = {int(arg) for arg in args if arg.isdigit()}
+    with _ProcessTable(device_dir) as table:
+        before = len(table["processes"])
+        table["processes"] = [proc for proc in table["processes"] if proc["pid"] not in pids]
+        killed = before - len(table["processes"])
+    if not killed:
+        sys.stderr.write("kill: No such process\n")
+        return 1
+    return 0
+
+
+def _shim_nohup(device_dir, args):
+    if not args:
+        return 1
+    binary = args[0]
+    if not (os.path.isfile(binary) and os.access(binary, os.X_OK)):
+        sys.stderr.write(f"nohup: {binary}: Permission denied\n")
+        return 126
+    with _ProcessTable(device_dir) as table:
+        pid = table["next_pid"]
+        table["next_pid"] += 1
+        entry = _process_entry(pid, "root", _from_device(device_dir, " ".join(args)))
+        table["processes"].append(entry)
+    # Emit the banner the fake server prints so log redirection can be observed
+    subprocess.run(args, stdin=subprocess.DEVNULL)
+    return 0
+
+
+def _shim_su(device_dir, args):
+    config = _read_json(os.path.join(device_dir, "device.json"))
+    if not config.get("root", True):
+        sys.stderr.write("/system/bin/sh: su: inaccessible or not found\n")
+        return 127
+    env = dict(os.environ, **{ROOT_ENV: "1"})
+    if args and args[0] == "-c":
+        script = args[1]
+    else:
+        # `su 0 <command...>` / `su root sh -c <script>`
+        command = [arg for arg in args if arg not in ("0", "root")]
+        if len(command) >= 3 and os.path.basename(command[0]) == "sh" and command[1] == "-c":
+            script = command[2]
+        elif command:
+            script = " ".join(command)
+        else:
+            return subprocess.run(["/bin/sh"], env=env).returncode
+    return subprocess.run(["/bin/sh", "-c", _shell_prelude(device_dir) + script], env=env).returncode
+
+
+def _shim_getprop(device_dir, args):
+    config = _read_json(os.path.join(device_dir, "device.json"))
+    if args:
+        sys.stdout.write(config["props"].get(args[0], "") + "\n")
+    else:
+        for key, value in sorted(config["props"].items()):
+            sys.stdout.write(f"[{key}]: [{value}]\n")
+    return 0
+
+
+def _shim_id(device_dir, args):
+    if os.environ.get(ROOT_ENV):
+        sys.stdout.write("uid=0(root) gid=0(root) groups=0(root)\n")
+    else:
+        sys.stdout.write("uid=2000(shell) gid=2000(shell) groups=2000(shell)\n")
+    return 0
+
+
+_SHIM_HANDLERS = {
+    "ps": _shim_ps,
+    "pidof": _shim_pidof,
+    "pkill": _shim_pkill,
+    "killall": _shim_killall,
+    "kill": _shim_kill,
+    "nohup": _shim_nohup,
+    "su": _shim_su,
+    "getprop": _shim_getprop,
+    "id": _shim_id,
+}
+
+
+def shim_main(name, argv):
+    device_dir = os.environ[DEVICE_ENV]
+    return _SHIM_HANDLERS[name](device_dir, argv)
+
+
+def main(argv=None):
+    argv = sys.argv[1:] if argv is None else argv
+    if argv and argv[0] == "--shim":
+        return shim_main(argv[1], argv[2:])
+    return adb_main(argv)
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,89 @@
+"""
+Local TCP stand-in for frida-server's listening port.
+
+frida-server speaks D-Bus over a WebSocket, so a client's first exchange is
+an HTTP/1.1 upgrade of GET /ws answered with `101 Switching Protocols`. This
+server answers exactly that handshake, optionally after a delay, and can
+refuse to answer until it is "ready" so readiness gates can be exercised.
+"""
+
+import base64
+import hashlib
+import socketserver
+import threading
+import time
+
+WEBSOCKET_GUID = "258EAFA5-E914-47DA-95CA-C5AB0DC85B11"
+
+
+class FakeFridaServer:
+    """Answer WebSocket upgrade requests on 127.0.0.1 like frida-server does"""
+
+    def __init__(self, delay=0.0, ready_after=0.0):
+        self.delay = delay
+        self.ready_after = ready_after
+        self.connections = 0
+        self._started_at = None
+        self._server = None
+        self._thread = None
+
+    @property
+    def port(self):
+        return self._server.server_address[1]
+
+    @property
+    def endpoint(self):
+        return f"127.0.0.1:{self.port}"
+
+    def start(self):
+        server = self
+
+        class Handler(socketserver.StreamRequestHandler):
+            def handle(self):
+                server.connections += 1
+                headers = {}
+                request_line = self.rfile.readline()
+                for line in iter(self.rfile.readline, b''):
+                    if line in (b'\r\n', b'\n'):
+                        break
+                    key, _, value = line.decode('latin-1').partition(':')
+                    headers[key.strip().lower()] = value.strip()
+                if time.monotonic() - server._started_at < server.ready_after:
+                    # Still starting up: drop the connection without answering
+                    return
+                if server.delay:
+                    time.sleep(server.delay)
+                if not request_line.startswith(b'GET ') or 'sec-websocket-key' not in headers:
+                    self.wfile.write(b"HTTP/1.1 400 Bad Request\r\nContent-Length: 0\r\n\r\n")
+                    return
+                accept = base64.b64encode(hashlib.sha1(
+                    (headers['sec-websocket-key'] + WEBSOCKET_GUID).encode()).digest()).decode()
+                self.wfile.write((
+                    "HTTP/1.1 101 Switching Protocols\r\n"
+                    "Upgrade: websocket\r\n"
+                    "Connection: Upgrade\r\n"
+                    f"Sec-WebSocket-Accept: {accept}\r\n\r\n").encode())
+                # Hold the connection like a real session until the client hangs up
+                self.rfile.read(1)
+
+        class Server(socketserver.ThreadingMixIn, socketserver.TCPServer):
+            daemon_threads = True
+            allow_reuse_address = True
+
+        self._server = Server(("127.0.0.1", 0), Handler)
+        self._started_at = time.monotonic()
+        self._thread = threading.Thread(target=self._server.serve_forever, daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        if self._server:
+            self._server.shutdown()
+            self._server.server_close()
+            self._server = None
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, exc_type, exc, tb):
+        self.stop()
@@ -0,0 +1,87 @@
+#!/usr/bin/env python3
+"""
+Startup benchmark based on `python -X importtime`.
+
+Usage:
+    python -m benchmarks.importtime
+    python -m benchmarks.importtime --module fsm.cli --runs 10 --budget-ms 200
+"""
+
+import argparse
+import os
+import re
+import subprocess
+import sys
+
+from benchmarks.environment import PROJECT_ROOT
+
+# Upper bound for `import fsm.cli` (best of several runs, cumulative import time)
+STARTUP_BUDGET_MS = 200
+
+# Modules that must only be imported by the commands that need them
+LAZY_MODULES = [
+    "fsm.core",
+    "urllib.request",
+    "http.client",
+    "json",
+    "tempfile",
+    "rich.console",
+    "rich.table",
+    "rich.progress",
+    "rich.text",
+]
+
+_LINE_RE = re.compile(r"^import time:\s+(\d+)\s+\|\s+(\d+)\s+\|(\s*)(\S+)$")
+
+
+def parse_importtime(stderr):
+    """Parse -X importtime output into {module: (self_us, cumulative_us)}"""
+    modules = {}
+    for line in stderr.splitlines():
+        match = _LINE_RE.match(line)
+        if match:
+            modules[match.group(4)] = (int(match.group(1)), int(match.group(2)))
+    return modules
+
+
+def measure_import(module="fsm.cli", runs=5):
+    """Import module in fresh interpreters; return (best cumulative ms, modules of that run)"""
+    env = dict(os.environ)
+    env["PYTHONPATH"] = PROJECT_ROOT + os.pathsep + env.get("PYTHONPATH", "")
+    best = None
+    for _ in range(runs):
+        result = subprocess.run([sys.executable, "-X", "importtime", "-c", f"import {module}"],
+                                stdout=subprocess.PIPE, stderr=subprocess.PIPE, text=True, env=env)
+        if result.returncode != 0:
+            raise RuntimeError(f"import {module} failed:\n{result.stderr}")
+        modules = parse_importtime(result.stderr)
+        total_ms = modules[module][1] / 1000.0
+        if best is None or total_ms < best[0]:
+            best = (total_ms, modules)
+    return best
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Measure fsm import time")
+    parser.add_argument("--module", default="fsm.cli")
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--budget-ms", type=float, default=STARTUP_BUDGET_MS)
+    parser.add_argument("--top", type=int, default=15, help="Show the N slowest modules")
+    args = parser.parse_args(argv)
+
+    total_ms, modules = measure_import(args.module, args.runs)
+    slowest = sorted(modules.items(), key=lambda item: item[1][1], reverse=True)[:args.top]
+    print(f"{'Module':<40} {'self (ms)':>10} {'cumulative (ms)':>16}")
+    print("=" * 68)
+    for name, (self_us, cumulative_us) in slowest:
+        print(f"{name:<40} {self_us / 1000:>10.1f} {cumulative_us / 1000:>16.1f}")
+
+    eager = [name for name in LAZY_MODULES if name in modules]
+    print(f"\nimport {args.module}: {total_ms:.1f} ms (budget {args.budget_ms:.0f} ms)")
+    if eager:
+        print(f"Eagerly imported: {', '.join(eager)}")
+    return 0 if total_ms <= args.budget_ms and not eager else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
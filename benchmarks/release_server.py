@@ -0,0 +1,150 @@
+"""
+Local HTTP server that imitates the GitHub release endpoints fsm talks to.
+
+It serves synthetic `.xz` frida-server assets so downloads can be measured
+without touching the network:
+
+    GET /repos/<owner>/<repo>/releases/latest
+    GET /repos/<owner>/<repo>/releases?per_page=N&page=P
+    GET /<owner>/<repo>/releases/download/<version>/<asset>
+"""
+
+import json
+import lzma
+import re
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+
+from benchmarks.fake_adb import fake_server_script
+
+ARCHES = ["android-arm64", "android-arm", "android-x86_64", "android-x86"]
+
+
+class ReleaseServer:
+    """Serve synthetic releases for one or more repositories on 127.0.0.1"""
+
+    def __init__(self, versions=("16.1.4",), repos=("frida/frida",), asset_size=1024 * 1024, delay=0.0):
+        self.versions = list(versions)
+        self.repos = list(repos)
+        self.asset_size = asset_size
+        self.delay = delay
+        self.requests = []
+        self._assets = {}
+        self._server = None
+        self._thread = None
+
+    @property
+    def base_url(self):
+        host, port = self._server.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def asset_name(self, version, arch="android-arm64", repo="frida/frida"):
+        prefix = "florida-server" if "florida" in repo.lower() else "frida-server"
+        return f"{prefix}-{version}-{arch}.xz"
+
+    def asset_url(self, version, arch="android-arm64", repo="frida/frida"):
+        return f"{self.base_url}/{repo}/releases/download/{version}/{self.asset_name(version, arch, repo)}"
+
+    def asset_bytes(self, version):
+        if version not in self._assets:
+            self._assets[version] = lzma.compress(fake_server_script(version, padding=self.asset_size))
+        return self._assets[version]
+
+    def release_json(self, repo, version):
+        return {
+            "id": abs(hash((repo, version))) % 10 ** 9,
+            "tag_name": version,
+            "name": version,
+            "draft": False,
+            "prerelease": False,
+            "published_at": "2024-01-01T00:00:00Z",
+            "assets": [
+                {
+                    "name": self.asset_name(version, arch, repo),
+                    "size": len(self.asset_bytes(version)),
+                    "browser_download_url": self.asset_url(version, arch, repo),
+                }
+                for arch in ARCHES
+            ],
+        }
+
+    def start(self):
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def log_message(self, format, *args):
+                pass
+
+            def do_GET(self):
+                server.requests.append(self.path)
+                if server.delay:
+                    import time
+                    time.sleep(server.delay)
+                status, headers, body = server.handle(self.path, self.headers)
+                self.send_response(status)
+                for key, value in headers.items():
+                    self.send_header(key, value)
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+        self._server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+        self._server.daemon_threads = True
+        self._thread = threading.Thread(target=self._server.serve_forever, daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        if self._server:
+            self._server.shutdown()
+            self._server.server_close()
+            self._server = None
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, exc_type, exc, tb):
+        self.stop()
+
+    def handle(self, path, headers):
+        """Return (status, headers, body) for a request path"""
+        parsed = urlparse(path)
+        query = parse_qs(parsed.query)
+
+        match = re.match(r"^/repos/([^/]+/[^/]+)/releases(/latest)?$", parsed.path)
+        if match and match.group(1) in self.repos:
+            repo = match.group(1)
+            ordered = sorted(self.versions, key=_version_key, reverse=True)
+            if match.group(2):
+                return self._json(self.release_json(repo, ordered[0]))
+            per_page = int(query.get("per_page", ["30"])[0])
+            page = int(query.get("page", ["1"])[0])
+            chunk = ordered[(page - 1) * per_page:page * per_page]
+            body = [self.release_json(repo, version) for version in chunk]
+            extra = {}
+            if page * per_page < len(ordered):
+                next_url = f"{self.base_url}/repos/{repo}/releases?per_page={per_page}&page={page + 1}"
+                extra["Link"] = f'<{next_url}>; rel="next"'
+            etag = f'"{repo}-{len(ordered)}-{page}"'
+            if headers.get("If-None-Match") == etag:
+                return 304, {"ETag": etag}, b""
+            extra["ETag"] = etag
+            return self._json(body, extra)
+
+        match = re.match(r"^/([^/]+/[^/]+)/releases/download/([^/]+)/([^/]+)$", parsed.path)
+        if match and match.group(1) in self.repos and match.group(2) in self.versions:
+            return 200, {"Content-Type": "application/octet-stream"}, self.asset_bytes(match.group(2))
+
+        return 404, {"Content-Type": "text/plain"}, b"Not Found"
+
+    @staticmethod
+    def _json(data, extra_headers=None):
+        headers = {"Content-Type": "application/json"}
+        if extra_headers:
+            headers.update(extra_headers)
+        return 200, headers, json.dumps(data).encode()
+
+
+def _version_key(version):
+    return tuple(int(part) for part in re.findall(r"\d+", version))
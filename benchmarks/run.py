@@ -0,0 +1,175 @@
+#!/usr/bin/env python3
+"""
+End-to-end benchmarks for the fsm CLI against a fake adb and a local release server.
+
+Usage:
+    python -m benchmarks.run --output bench.json
+    python -m benchmarks.run --baseline benchmarks/baseline.json --threshold 0.25
+    python -m benchmarks.run --save-baseline benchmarks/baseline.json
+"""
+
+import argparse
+import json
+import os
+import platform
+import sys
+import time
+
+from benchmarks.environment import FakeEnvironment
+from fsm.stats import summarize
+
+DEFAULT_THRESHOLD = 0.25
+BENCH_VERSION = "16.1.4"
+
+
+def _measure(env, args, iterations, setup=None):
+    latencies = []
+    wall_start = time.perf_counter()
+    for _ in range(iterations):
+        if setup:
+            setup()
+        elapsed, _ = env.run_fsm(args)
+        latencies.append(elapsed)
+    wall = time.perf_counter() - wall_start
+
+    result = summarize(latencies)
+    result["throughput_ops"] = iterations / sum(latencies) if latencies else 0.0
+    result["wall"] = wall
+    return result
+
+
+def bench_install(env, device_dir, iterations):
+    url = env.server.asset_url(BENCH_VERSION)
+    # Build the asset up front so compression is not billed to the first install
+    env.server.asset_bytes(BENCH_VERSION)
+    result = _measure(env, ["install", "--url", url, "--name", "frida-server-bench"], iterations)
+    size = len(env.server.asset_bytes(BENCH_VERSION))
+    result["bytes"] = size
+    result["throughput_bytes"] = size / result["mean"]
+    return result
+
+
+def bench_list(env, device_dir, iterations, files):
+    env.add_servers(device_dir, files, BENCH_VERSION)
+    return _measure(env, ["list"], iterations)
+
+
+def bench_run(env, device_dir, iterations):
+    env.add_servers(device_dir, 1, BENCH_VERSION)
+    return _measure(env, ["run", "--version", BENCH_VERSION, "--force"], iterations)
+
+
+def bench_ps(env, device_dir, iterations):
+    return _measure(env, ["ps"], iterations)
+
+
+def bench_kill(env, device_dir, iterations):
+    env.add_servers(device_dir, 1, BENCH_VERSION)
+    server_path = f"/data/local/tmp/frida-server-{BENCH_VERSION}-000"
+
+    def start_server():
+        import subprocess
+        subprocess.run(["adb", "shell", "su", "-c", f"'nohup {server_path} > /dev/null 2>&1 &'"],
+                       env=env.env(), stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+
+    return _measure(env, ["kill"], iterations, setup=start_server)
+
+
+SCENARIOS = {
+    "install": lambda env, dev, n: bench_install(env, dev, n),
+    "list_1": lambda env, dev, n: bench_list(env, dev, n, 1),
+    "list_10": lambda env, dev, n: bench_list(env, dev, n, 10),
+    "list_100": lambda env, dev, n: bench_list(env, dev, n, 100),
+    "run": lambda env, dev, n: bench_run(env, dev, max(1, n // 3)),
+    "ps": lambda env, dev, n: bench_ps(env, dev, n),
+    "kill": lambda env, dev, n: bench_kill(env, dev, n),
+}
+
+
+def run_benchmarks(scenarios=None, iterations=5, asset_size=4 * 1024 * 1024, verbose=False):
+    """Run the selected scenarios, each on a fresh simulated device"""
+    results = {}
+    with FakeEnvironment(versions=(BENCH_VERSION,), asset_size=asset_size) as env:
+        for name in scenarios or SCENARIOS:
+            device_dir = env.add_device("emulator-5554")
+            if verbose:
+                print(f"Running {name} ({iterations} iterations)...", file=sys.stderr)
+            results[name] = SCENARIOS[name](env, device_dir, iterations)
+
+    return {
+        "meta": {
+            "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S"),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "iterations": iterations,
+            "asset_size": asset_size,
+        },
+        "results": results,
+    }
+
+
+def compare_results(current, baseline, threshold=DEFAULT_THRESHOLD, metric="p50"):
+    """Return a list of regressions where current is slower than baseline by more than threshold"""
+    regressions = []
+    for name, base in baseline.get("results", {}).items():
+        now = current.get("results", {}).get(name)
+        if not now or not base.get(metric) or now.get(metric) is None:
+            continue
+        ratio = now[metric] / base[metric]
+        if ratio > 1 + threshold:
+            regressions.append({
+                "scenario": name,
+                "metric": metric,
+                "baseline": base[metric],
+                "current": now[metric],
+                "ratio": ratio,
+            })
+    return regressions
+
+
+def _print_table(report, regressions):
+    print(f"{'Scenario':<12} {'p50 (s)':>10} {'p95 (s)':>10} {'max (s)':>10} {'ops/s':>10}")
+    print("=" * 56)
+    for name, result in report["results"].items():
+        print(f"{name:<12} {result['p50']:>10.3f} {result['p95']:>10.3f} {result['max']:>10.3f} "
+              f"{result['throughput_ops']:>10.2f}")
+    for regression in regressions:
+        print(f"REGRESSION: {regression['scenario']} {regression['metric']} "
+              f"{regression['baseline']:.3f}s -> {regression['current']:.3f}s ({regression['ratio']:.2f}x)")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark fsm against a fake adb and local release server")
+    parser.add_argument("--scenario", action="append", choices=sorted(SCENARIOS), help="Scenario to run (repeatable)")
+    parser.add_argument("--iterations", type=int, default=5, help="Iterations per scenario")
+    parser.add_argument("--asset-size", type=int, default=4 * 1024 * 1024, help="Uncompressed size of the fake server binary")
+    parser.add_argument("--output", help="Write results as JSON to this file")
+    parser.add_argument("--baseline", help="Compare against a stored baseline JSON file")
+    parser.add_argument("--threshold", type=float, default=DEFAULT_THRESHOLD,
+                        help="Allowed slowdown relative to the baseline (0.25 = 25%%)")
+    parser.add_argument("--save-baseline", help="Store the results as a new baseline")
+    parser.add_argument("--verbose", "-v", action="store_true")
+    args = parser.parse_args(argv)
+    # A regression gate without its baseline must fail rather than pass silently
+    if args.baseline and not os.path.exists(args.baseline):
+        parser.error(f"baseline file {args.baseline} does not exist")
+
+    report = run_benchmarks(args.scenario, args.iterations, args.asset_size, args.verbose)
+
+    regressions = []
+    if args.baseline:
+        with open(args.baseline) as f:
+            regressions = compare_results(report, json.load(f), args.threshold)
+        report["regressions"] = regressions
+
+    for path in (args.output, args.save_baseline):
+        if path:
+            with open(path, "w") as f:
+                json.dump(report, f, indent=2)
+
+    _print_table(report, regressions)
+    return 1 if regressions else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,168 @@
+#!/usr/bin/env python3
+"""
+Scale harness: drive fsm against hundreds of simulated devices.
+
+Each simulated device has its own latency, failure rate and process table.
+Scenarios fan out one `fsm` process per device (selected with ANDROID_SERIAL,
+exactly like the real adb) through a worker pool and record throughput, tail
+latency and host CPU/RSS as the device count grows.
+
+Usage:
+    python -m benchmarks.scale --devices 1,10,50,200 --concurrency 16
+    python -m benchmarks.scale --scenario discovery --devices 200 --latency 0.05 --failure-rate 0.01
+"""
+
+import argparse
+import json
+import random
+import resource
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from benchmarks import fake_adb
+from benchmarks.environment import FakeEnvironment
+from fsm.stats import summarize
+
+SCALE_VERSION = "16.1.4"
+
+
+def _serial(index):
+    return f"sim-{index:04d}"
+
+
+def setup_fleet(env, count, latency=0.0, jitter=0.0, failure_rate=0.0, process_count=50, seed=0):
+    """Create `count` simulated devices with randomized per-device link latency"""
+    rng = random.Random(seed)
+    serials = []
+    for index in range(count):
+        device_latency = max(0.0, latency + rng.uniform(-jitter, jitter))
+        device_dir = env.add_device(_serial(index), latency=device_latency, failure_rate=failure_rate,
+                                    process_count=process_count)
+        fake_adb.add_device_file(device_dir, f"/data/local/tmp/frida-server-{SCALE_VERSION}",
+                                 fake_adb.fake_server_script(SCALE_VERSION))
+        serials.append(_serial(index))
+    return serials
+
+
+def _fan_out(env, serials, args, concurrency):
+    def one(serial):
+        elapsed, result = env.run_fsm(args, serial=serial, check=False)
+        return elapsed, result.returncode == 0
+
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        return list(pool.map(one, serials))
+
+
+def scenario_discovery(env, serials, concurrency):
+    # A single `fsm check` enumerates every device, so latency grows with the fleet
+    elapsed, result = env.run_fsm(["check"], check=False)
+    return [(elapsed, result.returncode == 0)]
+
+
+def scenario_install(env, serials, concurrency):
+    url = env.server.asset_url(SCALE_VERSION)
+    return _fan_out(env, serials, ["install", "--url", url, "--name", "frida-server-scale"], concurrency)
+
+
+def scenario_run(env, serials, concurrency):
+    return _fan_out(env, serials, ["run", "--version", SCALE_VERSION, "--force"], concurrency)
+
+
+def scenario_kill(env, serials, concurrency):
+    return _fan_out(env, serials, ["kill"], concurrency)
+
+
+SCENARIOS = {
+    "discovery": scenario_discovery,
+    "install": scenario_install,
+    "run": scenario_run,
+    "kill": scenario_kill,
+}
+
+
+def _usage():
+    children = resource.getrusage(resource.RUSAGE_CHILDREN)
+    own = resource.getrusage(resource.RUSAGE_SELF)
+    return {
+        "cpu": children.ru_utime + children.ru_stime + own.ru_utime + own.ru_stime,
+        "child_max_rss_kb": children.ru_maxrss,
+        "self_max_rss_kb": own.ru_maxrss,
+    }
+
+
+def run_scale(device_counts, scenarios=None, concurrency=16, latency=0.0, jitter=0.0,
+              failure_rate=0.0, process_count=50, verbose=False):
+    """Run each scenario for each fleet size and return a report dict"""
+    rows = []
+    for count in device_counts:
+        with FakeEnvironment(versions=(SCALE_VERSION,), asset_size=256 * 1024) as env:
+            env.server.asset_bytes(SCALE_VERSION)
+            serials = setup_fleet(env, count, latency, jitter, failure_rate, process_count)
+            for name in scenarios or SCENARIOS:
+                if verbose:
+                    print(f"{name}: {count} device(s), concurrency {concurrency}...", file=sys.stderr)
+                before = _usage()
+                start = time.perf_counter()
+                outcomes = SCENARIOS[name](env, serials, concurrency)
+                wall = time.perf_counter() - start
+                after = _usage()
+
+                latencies = [elapsed for elapsed, _ in outcomes]
+                failures = sum(1 for _, ok in outcomes if not ok)
+                row = {"scenario": name, "devices": count, "concurrency": concurrency, "wall": wall,
+                       "throughput_devices": count / wall if wall else 0.0, "failures": failures,
+                       "host_cpu_seconds": after["cpu"] - before["cpu"],
+                       "host_cpu_utilization": (after["cpu"] - before["cpu"]) / wall if wall else 0.0,
+                       "child_max_rss_kb": after["child_max_rss_kb"],
+                       "self_max_rss_kb": after["self_max_rss_kb"]}
+                row.update({key: value for key, value in summarize(latencies).items() if key != "count"})
+                rows.append(row)
+
+    return {
+        "meta": {
+            "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S"),
+            "latency": latency,
+            "jitter": jitter,
+            "failure_rate": failure_rate,
+            "process_count": process_count,
+        },
+        "results": rows,
+    }
+
+
+def _print_table(report):
+    print(f"{'Scenario':<10} {'Devices':>7} {'dev/s':>8} {'p50 (s)':>8} {'p99 (s)':>8} {'fail':>5} "
+          f"{'CPU %':>7} {'RSS MB':>7}")
+    print("=" * 68)
+    for row in report["results"]:
+        print(f"{row['scenario']:<10} {row['devices']:>7} {row['throughput_devices']:>8.2f} {row['p50']:>8.3f} "
+              f"{row['p99']:>8.3f} {row['failures']:>5} {row['host_cpu_utilization'] * 100:>7.0f} "
+              f"{row['child_max_rss_kb'] / 1024:>7.1f}")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Measure fsm scaling against many simulated devices")
+    parser.add_argument("--devices", default="1,10,50,200", help="Comma separated fleet sizes")
+    parser.add_argument("--scenario", action="append", choices=sorted(SCENARIOS), help="Scenario to run (repeatable)")
+    parser.add_argument("--concurrency", type=int, default=16, help="Number of fsm processes run in parallel")
+    parser.add_argument("--latency", type=float, default=0.0, help="Per-command adb latency in seconds")
+    parser.add_argument("--jitter", type=float, default=0.0, help="Random +/- spread applied to the latency per device")
+    parser.add_argument("--failure-rate", type=float, default=0.0, help="Probability that an adb call fails")
+    parser.add_argument("--processes", type=int, default=50, help="Extra processes in each device's process table")
+    parser.add_argument("--output", help="Write results as JSON to this file")
+    parser.add_argument("--verbose", "-v", action="store_true")
+    args = parser.parse_args(argv)
+
+    counts = [int(value) for value in args.devices.split(",") if value.strip()]
+    report = run_scale(counts, args.scenario, args.concurrency, args.latency, args.jitter,
+                       args.failure_rate, args.processes, args.verbose)
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(report, f, indent=2)
+    _print_table(report)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
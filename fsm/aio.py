@@ -0,0 +1,400 @@
+"""
+asyncio API for fsm.
+
+Every operation takes the device serial explicitly, talks to adb through
+non-blocking subprocesses, raises the exceptions in fsm.errors instead of
+exiting, and returns plain data instead of printing. A single event loop can
+therefore drive many devices at once:
+
+    results = await fsm.aio.on_devices(serials, fsm.aio.run, version="16.1.4")
+"""
+
+import asyncio
+import contextlib
+import os
+import re
+import time
+
+from fsm import cassette, history, manifest, store
+from fsm.deadline import timeout_for
+from fsm.device import SU_PROBE, filter_server_files, parse_su_method, su_command
+from fsm.lock import device_lock
+from fsm.mirrors import configured_mirrors
+from fsm.core import (
+    DEFAULT_INSTALL_DIR,
+    fetch_frida_server,
+    get_temp_path,
+    get_latest_frida_version,
+    map_frida_arch,
+    parse_process_line,
+    resolve_release_asset,
+    resolve_remote_path,
+)
+from fsm.errors import (
+    AdbCommandError,
+    AdbNotFoundError,
+    CommandTimeoutError,
+    DeviceNotFoundError,
+    DownloadError,
+    ServerNotFoundError,
+    ServerStartError,
+    UnsupportedArchitectureError,
+    VersionLookupError,
+)
+
+VERSION_PATTERN = re.compile(r'\d+\.\d+\.\d+')
+
+
+async def adb(*args, serial=None, check=True, timeout=None):
+    """Run adb with args and return its stdout; raise AdbCommandError on failure when check is set
+
+    timeout is capped by the current fsm.deadline; CommandTimeoutError is
+    raised (after killing adb) when it runs out.
+    """
+    cmd = ['adb'] + (['-s', serial] if serial else []) + [str(arg) for arg in args]
+    timeout = timeout_for(timeout)
+    if timeout is not None and timeout <= 0:
+        raise CommandTimeoutError(' '.join(cmd), 0)
+
+    tape = cassette.current()
+    if tape is not None and tape.mode == 'replay':
+        entry = tape.replay('cmd', ' '.join(cmd))
+        await asyncio.sleep(tape.delay(entry))
+        if 'timeout' in entry:
+            raise CommandTimeoutError(' '.join(cmd), entry['timeout'])
+        returncode, stdout, stderr = entry['rc'], entry['out'], entry['err']
+    else:
+        returncode, stdout, stderr = await _run_adb(cmd, timeout, tape)
+
+    if check and returncode != 0:
+        raise AdbCommandError(' '.join(cmd), returncode, stderr)
+    return stdout
+
+
+async def _run_adb(cmd, timeout, tape=None):
+    """Run cmd and return (returncode, stdout, stderr), recording it on tape if given"""
+    start = time.monotonic()
+    try:
+        process = await asyncio.create_subprocess_exec(
+            *cmd, stdout=asyncio.subprocess.PIPE, stderr=asyncio.subprocess.PIPE)
+    except FileNotFoundError:
+        raise AdbNotFoundError("adb is not installed or not in PATH")
+
+    try:
+        stdout, stderr = await asyncio.wait_for(process.communicate(), timeout)
+    except asyncio.TimeoutError:
+        process.kill()
+        await process.wait()
+        if tape is not None:
+            tape.record('cmd', ' '.join(cmd), time.monotonic() - start, timeout=timeout)
+        raise CommandTimeoutError(' '.join(cmd), timeout)
+
+    stdout, stderr = stdout.decode(errors='replace'), stderr.decode(errors='replace')
+    if tape is not None:
+        tape.record('cmd', ' '.join(cmd), time.monotonic() - start, rc=process.returncode, out=stdout, err=stderr)
+    return process.returncode, stdout, stderr
+
+
+@contextlib.asynccontextmanager
+async def exclusive(serial=None):
+    """Hold the cross-process lock of the device (see fsm.lock.device_lock) without blocking the event loop"""
+    lock = device_lock(serial, timeout_for(None))
+    await asyncio.get_event_loop().run_in_executor(None, lock.__enter__)
+    try:
+        yield
+    finally:
+        lock.__exit__(None, None, None)
+
+
+async def shell(command, serial=None, check=False, timeout=None):
+    """Run a command in `adb shell` and return its stdout"""
+    return await adb('shell', command, serial=serial, check=check, timeout=timeout)
+
+
+# su method of each serial, probed once per process (see su_method())
+_su_methods = {}
+
+
+async def su_method(serial=None):
+    """Return how to get root on a device: 'root', 'su-c', 'su0' or None (the probe of Device.su_method)"""
+    if serial not in _su_methods:
+        _su_methods[serial] = parse_su_method(await shell(SU_PROBE, serial=serial))
+    return _su_methods[serial]
+
+
+async def root_shell(command, serial=None):
+    """Run a device command as root with the device's su method and return its stdout"""
+    return await shell(su_command(await su_method(serial), command), serial=serial)
+
+
+async def devices():
+    """Return (serial, status) pairs for every device adb knows about"""
+    output = await adb('devices')
+    result = []
+    for line in output.splitlines():
+        if 'device' in line and not line.startswith('List of'):
+            parts = line.strip().split()
+            if len(parts) >= 2:
+                result.append((parts[0], parts[1]))
+    return result
+
+
+async def check(serial=None):
+    """Return connected devices as dicts (serial, model, status); raise DeviceNotFoundError if none match"""
+    found = await devices()
+    if serial:
+        found = [(device_serial, status) for device_serial, status in found if device_serial == serial]
+    if not found:
+        raise DeviceNotFoundError(f"Device {serial} is not connected" if serial else "No devices connected via ADB")
+
+    async def describe(device_serial, status):
+        model = await shell('getprop ro.product.model', serial=device_serial)
+        return {'serial': device_serial, 'model': model.strip() or "Unknown", 'status': status}
+
+    return list(await asyncio.gather(*(describe(device_serial, status) for device_serial, status in found)))
+
+
+async def get_arch(serial=None):
+    """Return the frida-server architecture of a device"""
+    abi = (await shell('getprop ro.product.cpu.abi', serial=serial, check=True)).strip()
+    frida_arch = map_frida_arch(abi)
+    if not frida_arch:
+        raise UnsupportedArchitectureError(f"Unsupported architecture: {abi}")
+    return frida_arch
+
+
+async def latest_version(repo="frida/frida", proxy=None):
+    """Return the latest release tag of repo"""
+    loop = asyncio.get_event_loop()
+    version = await loop.run_in_executor(None, get_latest_frida_version, repo, False, proxy)
+    if not version:
+        raise VersionLookupError(f"Could not determine the latest version of {repo}")
+    return version
+
+
+async def install(serial=None, version=None, repo="frida/frida", keep_name=False, custom_name=None,
+                  url=None, proxy=None, install_dir=DEFAULT_INSTALL_DIR, mirrors=None):
+    """Download frida-server and install it on a device; return a dict describing the install"""
+    with history.operation('install', serial, version):
+        return await _install(serial, version, repo, keep_name, custom_name, url, proxy, install_dir, mirrors)
+
+
+async def _install(serial, version, repo, keep_name, custom_name, url, proxy, install_dir, mirrors):
+    history.enter('discovery')
+    # The target directory's store is read while the version and ABI are resolved
+    server_dir = os.path.dirname(resolve_remote_path(version, keep_name, custom_name, url, install_dir))
+    lookup = asyncio.ensure_future(shell(store.lookup_command(server_dir), serial=serial))
+    try:
+        if url:
+            download_url = url
+            filename = url.split('/')[-1]
+        else:
+            if version:
+                frida_arch = await get_arch(serial)
+            else:
+                version, frida_arch = await asyncio.gather(latest_version(repo, proxy), get_arch(serial))
+            download_url, filename = await asyncio.get_event_loop().run_in_executor(
+                None, resolve_release_asset, repo, version, frida_arch, False, proxy)
+    except BaseException:
+        lookup.cancel()
+        raise
+
+    history.annotate(version=version)
+    remote_path = resolve_remote_path(version, keep_name, custom_name, url, install_dir)
+    # A release already in the device's store (installed under another name) is only linked
+    stored, blobs = store.parse_lookup(await lookup)
+    entry = store.find_stored(stored, blobs, download_url)
+    local_path = None
+    if entry:
+        entry = store.alias_entry(entry, remote_path)
+    else:
+        history.enter('download')
+        loop = asyncio.get_event_loop()
+        try:
+            local_path = await loop.run_in_executor(None, fetch_frida_server, download_url, filename, False, proxy,
+                                                    None if url else configured_mirrors(mirrors), not url)
+        except Exception as e:
+            raise DownloadError(f"Could not download frida-server from {download_url}: {e}")
+        history.add_bytes(os.path.getsize(local_path))
+
+    try:
+        if local_path:
+            entry = manifest.build_entry(local_path, remote_path, version, None if url else frida_arch, download_url)
+        history.enter('lock')
+        async with exclusive(serial):
+            pushed = None
+            try:
+                if local_path and blobs.get(entry['sha256']) != os.path.getsize(local_path):
+                    history.enter('push')
+                    pushed = get_temp_path(store.get_store_path(server_dir, entry['sha256']))
+                    await adb('push', local_path, pushed, serial=serial)
+                    history.add_bytes(os.path.getsize(local_path))
+                history.enter('verify')
+                output = await shell(store.link_command(server_dir, entry['sha256'], remote_path, pushed),
+                                     serial=serial, check=True)
+            except AdbCommandError:
+                await shell(f"rm -f {get_temp_path(remote_path)} {pushed or ''}", serial=serial)
+                raise
+            try:
+                entry['size'], entry['mtime'] = (int(value) for value in output.strip().split(':', 2)[:2])
+                await shell(manifest.append_command(server_dir, entry), serial=serial)
+            except ValueError:
+                # Without a manifest entry list_servers() just probes the binary
+                pass
+    finally:
+        if local_path:
+            os.unlink(local_path)
+
+    return {'serial': serial, 'path': remote_path, 'version': version, 'url': download_url}
+
+
+async def get_server_version(remote_path, serial=None):
+    """Return the version reported by a frida-server binary, falling back to its filename"""
+    output = await shell(f"{remote_path} --version", serial=serial)
+    if output.strip():
+        return output.strip()
+    version_match = VERSION_PATTERN.search(os.path.basename(remote_path))
+    return version_match.group() if version_match else None
+
+
+async def _manifest_version(entry, remote_path, serial=None):
+    if entry and entry.get('version'):
+        return entry['version']
+    return await get_server_version(remote_path, serial)
+
+
+async def list_servers(serial=None, install_dir=DEFAULT_INSTALL_DIR, name=None):
+    """Return dicts (filename, path, version, aliases) for the frida-related server files in install_dir"""
+    output, listing = await asyncio.gather(shell(f"ls {install_dir}", serial=serial),
+                                           shell(manifest.load_command(install_dir), serial=serial))
+    # The same matching as core's `list`: a *name* wildcard, else the frida server name patterns
+    files = filter_server_files([line.strip() for line in output.splitlines() if line.strip()], name)
+    paths = [f"{install_dir}/{filename}" for filename in files]
+    # Only binaries the install manifest does not describe are executed
+    entries = manifest.current_entries(listing)
+    versions = await asyncio.gather(*(
+        _manifest_version(entries.get(filename), path, serial) for filename, path in zip(files, paths)
+    ))
+    aliases = store.aliases(entries)
+    return [
+        {'filename': filename, 'path': path, 'version': version, 'aliases': aliases.get(filename, [])}
+        for filename, path, version in zip(files, paths, versions)
+    ]
+
+
+async def ps(serial=None, name="frida-server"):
+    """Return process dicts (pid, user, memory, command) whose ps line contains name"""
+    output = await shell('ps -A', serial=serial)
+    processes = []
+    seen = set()
+    for line in output.splitlines():
+        if name not in line or line in seen:
+            continue
+        seen.add(line)
+        process = parse_process_line(line)
+        if process:
+            processes.append(process)
+    return processes
+
+
+async def _wait_for(predicate, timeout, poll_interval):
+    deadline = asyncio.get_event_loop().time() + timeout
+    while True:
+        result = await predicate()
+        if result or asyncio.get_event_loop().time() >= deadline:
+            return result
+        await asyncio.sleep(poll_interval)
+
+
+async def run(serial=None, version=None, name=None, params=None, install_dir=DEFAULT_INSTALL_DIR,
+              force=False, timeout=10.0, poll_interval=0.2):
+    """Start frida-server on a device and wait until it shows up in ps; return a dict with its pids"""
+    with history.operation('run', serial, version):
+        history.enter('lock')
+        async with exclusive(serial):
+            history.enter('discovery')
+            return await _run(serial, version, name, params, install_dir, force, timeout, poll_interval)
+
+
+async def _run(serial, version, name, params, install_dir, force, timeout, poll_interval):
+    if name:
+        server_path = f"{install_dir}/{name}"
+    else:
+        servers = await list_servers(serial, install_dir)
+        if version:
+            servers = [server for server in servers
+                       if version in server['filename'] or (server['version'] and version in server['version'])]
+        if not servers:
+            raise ServerNotFoundError(f"No frida-server{' version ' + version if version else ''} found in {install_dir}")
+        server_path = servers[0]['path']
+
+    running = await ps(serial)
+    if running and not force:
+        if all(server_path in process['command'] for process in running):
+            return {'serial': serial, 'path': server_path, 'pids': [p['pid'] for p in running],
+                    'already_running': True}
+
+    exists = await shell(f"ls {server_path}", serial=serial)
+    if not exists.strip() or 'No such file or directory' in exists:
+        raise ServerNotFoundError(f"frida-server not found at {server_path}")
+
+    if running:
+        history.enter('stop')
+        await root_shell("pkill -f frida-server; killall -9 frida-server", serial=serial)
+        await _wait_for(lambda: _none_running(serial), timeout, poll_interval)
+
+    history.enter('start')
+    start_cmd = f"nohup {server_path}{' ' + params if params else ''} < /dev/null > /dev/null 2>&1 &"
+    await root_shell(start_cmd, serial=serial)
+    history.enter('verify')
+
+    async def started():
+        return [process for process in await ps(serial) if server_path in process['command']]
+
+    processes = await _wait_for(started, timeout, poll_interval)
+    if not processes:
+        raise ServerStartError(f"frida-server at {server_path} did not start within {timeout}s")
+    return {'serial': serial, 'path': server_path, 'pids': [p['pid'] for p in processes], 'already_running': False}
+
+
+async def _none_running(serial):
+    return not await ps(serial)
+
+
+async def kill(serial=None, pid=None, name=None):
+    """Kill frida-server (or the given pid / process name); return the same dict shape as core.kill_frida_server"""
+    with history.operation('kill', serial):
+        history.enter('lock')
+        async with exclusive(serial):
+            history.enter('stop')
+            result = await _kill(serial, pid, name)
+        if not result['success'] or result['warning']:
+            history.annotate(outcome='failed')
+        return result
+
+
+async def _kill(serial, pid, name):
+    if pid:
+        await root_shell(f"kill -9 {pid}", serial=serial)
+        remaining = [process for process in await ps(serial, "") if process['pid'] == str(pid)]
+        if remaining:
+            return {'success': False, 'warning': False, 'remaining': remaining,
+                    'message': f"Error: Failed to kill process with PID {pid}"}
+        return {'success': True, 'warning': False, 'remaining': [],
+                'message': f"Success: process with PID {pid} has been killed"}
+
+    target = name if name else "frida-server"
+    await root_shell(f"pkill -f {target} || killall -9 {target}", serial=serial)
+    remaining = await ps(serial, target)
+    if remaining:
+        return {'success': True, 'warning': True, 'remaining': remaining,
+                'message': f"Warning: Some processes with name '{target}' might still be running"}
+    return {'success': True, 'warning': False, 'remaining': [],
+            'message': f"Success: All processes with name '{target}' have been killed"}
+
+
+async def on_devices(serials, operation, *args, **kwargs):
+    """Run operation(serial=..., ...) on every serial concurrently; map serial -> result or exception"""
+    results = await asyncio.gather(
+        *(operation(*args, serial=serial, **kwargs) for serial in serials), return_exceptions=True)
+    return dict(zip(serials, results))
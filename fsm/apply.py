@@ -0,0 +1,187 @@
+"""
+Declarative frida-server state for several devices.
+
+A state file (TOML, or JSON with the same layout) lists the intended state
+of each device; [defaults] applies to every device:
+
+    [defaults]
+    version = "16.1.4"
+
+    [devices.emulator-5554]
+    params = "-l 0.0.0.0:27042"
+
+    [devices."192.168.1.20:5555"]
+    version = "17.0.0"
+    running = false
+
+gather() reads the files in the install directory, the install manifest and
+the command lines of the running frida-servers with a single `adb shell` call
+per device. diff() turns the difference into an ordered list of actions
+(install, start, stop) and apply() runs them, one thread per device, so that
+devices are updated in parallel while each device's actions stay in order.
+Applying a state that already holds costs one query per device.
+"""
+
+import json
+from concurrent.futures import ThreadPoolExecutor
+
+from fsm import manifest
+from fsm.core import DEFAULT_INSTALL_DIR
+
+# Keys a device (or [defaults]) may set, with their defaults
+DEVICE_KEYS = {
+    'version': None,
+    'name': None,
+    'dir': DEFAULT_INSTALL_DIR,
+    'params': '',
+    'running': True,
+    'repo': "frida/frida",
+    'url': None,
+}
+_SEPARATOR = '@@fsm-apply@@'
+
+
+def load_state(path):
+    """Read a state file and return the desired state (a dict of DEVICE_KEYS) by serial"""
+    with open(path, 'rb') as f:
+        data = f.read().decode()
+    if path.endswith('.json'):
+        raw = json.loads(data)
+    else:
+        try:
+            import tomllib
+        except ImportError:  # Python < 3.11
+            try:
+                import tomli as tomllib
+            except ImportError:
+                # tomli is a dependency before 3.11; only a broken install gets here
+                raise RuntimeError("Reading TOML needs Python 3.11+ or the tomli package; use a .json state file")
+        raw = tomllib.loads(data)
+
+    defaults = raw.get('defaults', {})
+    devices = raw.get('devices')
+    if not devices:
+        raise ValueError(f"{path} lists no [devices.<serial>] tables")
+    state = {}
+    for serial, settings in [('defaults', defaults)] + list(devices.items()):
+        unknown = set(settings) - set(DEVICE_KEYS)
+        if unknown:
+            raise ValueError(f"Unknown key(s) for {serial}: {', '.join(sorted(unknown))}")
+        if serial == 'defaults':
+            continue
+        desired = {**DEVICE_KEYS, **defaults, **settings}
+        if not desired['version'] and not (desired['url'] and desired['name']):
+            raise ValueError(f"{serial} needs a version (or a url and a name)")
+        desired['name'] = desired['name'] or f"frida-server-{desired['version']}"
+        desired['dir'] = desired['dir'].rstrip('/') or '/'
+        desired['params'] = ' '.join(str(desired['params'] or '').split())
+        state[str(serial)] = desired
+    return state
+
+
+def gather(serial, server_dir=DEFAULT_INSTALL_DIR, verbose=False, device=None):
+    """Return the current state of serial (files, manifest entries, running command lines) in one round trip"""
+    from fsm.device import Device
+    device = device or Device(serial, verbose)
+    output = device.query(f'"{manifest.load_command(server_dir)}; echo {_SEPARATOR}; '
+                          f'ps -A -o PID,ARGS | grep frida-server | grep -v grep; true"')
+    if output is None:
+        raise RuntimeError(f"Could not query {serial}")
+    listing, _, processes = output.partition(_SEPARATOR)
+    entries, files = manifest.parse_listing(listing)
+    running = []
+    for line in processes.splitlines():
+        parts = line.split(None, 1)
+        if len(parts) == 2 and parts[0].isdigit():
+            running.append(' '.join(parts[1].split()))
+    return {'files': files, 'entries': entries, 'running': running}
+
+
+def diff(serial, desired, current):
+    """Return the actions (dicts: serial, action, detail, status) that bring current to desired, in order"""
+    path = f"{desired['dir']}/{desired['name']}"
+    entry = current['entries'].get(desired['name'])
+    recorded = entry.get('version') if entry else None
+
+    actions = []
+
+    def add(action, detail):
+        actions.append({'serial': serial, 'action': action, 'detail': detail, 'status': 'planned'})
+
+    if desired['name'] not in current['files']:
+        add('install', f"{desired['version'] or desired['url']} as {path}")
+    elif desired['version'] and recorded and recorded != desired['version']:
+        add('install', f"{desired['version']} as {path} (replacing {recorded})")
+
+    command = f"{path} {desired['params']}".strip()
+    running = current['running']
+    if desired['running']:
+        if actions or not running or any(line != command for line in running):
+            replaced = f" (replacing {len(running)} running)" if running else ""
+            add('start', command + replaced)
+    elif running:
+        add('stop', f"{len(running)} running frida-server(s)")
+    return actions
+
+
+def plan(state, verbose=False, jobs=None):
+    """Gather every device in state in parallel and return the list of actions needed"""
+    def device_actions(serial):
+        desired = state[serial]
+        try:
+            return diff(serial, desired, gather(serial, desired['dir'], verbose))
+        except Exception as e:
+            return [{'serial': serial, 'action': 'query', 'detail': str(e), 'status': 'failed'}]
+
+    with ThreadPoolExecutor(max_workers=jobs or len(state) or 1) as pool:
+        return [action for actions in pool.map(device_actions, state) for action in actions]
+
+
+def _run_action(action, desired, device, proxy, mirrors, verbose):
+    from fsm.core import install_frida_server, kill_frida_server, run_frida_server
+
+    if action['action'] == 'install':
+        install_frida_server(desired['version'], verbose, desired['repo'], False, desired['name'], desired['url'],
+                             proxy, device, mirrors, desired['dir'])
+    elif action['action'] == 'start':
+        if not run_frida_server(desired['dir'], desired['params'] or None, verbose, None, desired['name'],
+                                True, device):
+            raise RuntimeError("frida-server did not start")
+    elif action['action'] == 'stop':
+        result = kill_frida_server(None, verbose, None, device)
+        if result['warning'] or not result['success']:
+            raise RuntimeError(result['message'])
+
+
+def apply(state, actions, proxy=None, mirrors=None, verbose=False, jobs=None):
+    """Run the planned actions, devices in parallel; set each action's 'status' and return the actions"""
+    from fsm.device import Device
+
+    by_serial = {}
+    for action in actions:
+        by_serial.setdefault(action['serial'], []).append(action)
+
+    def run_device(serial):
+        device = Device(serial, verbose)
+        failed = False
+        for action in by_serial[serial]:
+            if action.get('status') == 'failed':
+                failed = True
+                continue
+            if failed:
+                action['status'] = 'skipped'
+                continue
+            try:
+                _run_action(action, state[serial], device, proxy, mirrors, verbose)
+                action['status'] = 'done'
+            except SystemExit:
+                # core has already printed the reason
+                action['status'] = 'failed'
+                failed = True
+            except Exception as e:
+                action.update(status='failed', detail=f"{action['detail']}: {e}")
+                failed = True
+
+    with ThreadPoolExecutor(max_workers=jobs or len(by_serial) or 1) as pool:
+        list(pool.map(run_device, by_serial))
+    return actions
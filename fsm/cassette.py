@@ -0,0 +1,197 @@
+"""
+Record and replay of adb commands and HTTP responses.
+
+With $FSM_RECORD (or `fsm --record FILE`) every command run through
+core.run_command() / iter_command_lines() / aio.adb() and every HTTP request
+made through fsm.http is appended to a cassette: one JSON line per
+interaction with its output, exit status and duration. With $FSM_REPLAY
+(`fsm --replay FILE`) the same interactions are served from the cassette
+instead, so a session captured on a user's machine can be rerun on any box
+without a device or network. $FSM_REPLAY_SPEED scales the recorded
+durations (1 replays them as recorded, 0 not at all), and so do the waits
+between polls of the device (see sleep()).
+
+Interactions are matched on the command line or URL, after host temporary
+paths and long base64/hex blobs (hashes, manifest entries) are masked, and
+are served in recorded order; the last one recorded for a key is repeated
+once they run out, so polling loops keep working. A cassette whose name
+ends in .gz is gzip compressed.
+"""
+
+import base64
+import json
+import os
+import re
+import tempfile
+import threading
+import time
+from collections import deque
+
+from fsm.errors import CassetteError, CommandTimeoutError
+
+RECORD_ENV = 'FSM_RECORD'
+REPLAY_ENV = 'FSM_REPLAY'
+SPEED_ENV = 'FSM_REPLAY_SPEED'
+
+_BLOB_PATTERN = re.compile(r'[A-Za-z0-9+/]{40,}={0,2}')
+
+
+def normalize(key):
+    """Mask the parts of a command line or URL that change from run to run"""
+    key = re.sub(r'(?<![\w./-])' + re.escape(tempfile.gettempdir()) + r'/[^\s\'"]*', '<tmp>', key)
+    return _BLOB_PATTERN.sub('<blob>', key)
+
+
+def _open(path, mode):
+    if path.endswith('.gz'):
+        import gzip
+        return gzip.open(path, mode + 't', encoding='utf-8')
+    return open(path, mode, encoding='utf-8')
+
+
+class Cassette:
+    """A cassette file being recorded (mode 'record') or replayed (mode 'replay')"""
+
+    def __init__(self, path, mode, speed=1.0):
+        self.path = path
+        self.mode = mode
+        self.speed = speed
+        self._lock = threading.Lock()
+        self._entries = {}
+        if mode == 'replay':
+            with _open(path, 'r') as f:
+                for line in f:
+                    if line.strip():
+                        entry = json.loads(line)
+                        self._entries.setdefault((entry['kind'], entry['key']), deque()).append(entry)
+
+    def record(self, kind, key, elapsed, **data):
+        """Append one interaction to the cassette"""
+        entry = dict(data, kind=kind, key=normalize(key), t=round(elapsed, 4))
+        with self._lock, _open(self.path, 'a') as f:
+            f.write(json.dumps(entry, separators=(',', ':')) + '\n')
+
+    def replay(self, kind, key):
+        """Return the next recorded interaction for key; raises CassetteError if there is none"""
+        with self._lock:
+            entries = self._entries.get((kind, normalize(key)))
+            if not entries:
+                raise CassetteError(f"No recorded {kind} interaction in {self.path} for: {key}")
+            return entries.popleft() if len(entries) > 1 else entries[0]
+
+    def delay(self, entry):
+        """Return how long replaying entry should take"""
+        return entry['t'] * self.speed
+
+    def command(self, cmd, run):
+        """Return run()'s (returncode, stdout, stderr) for cmd, recording or replaying it"""
+        if self.mode == 'replay':
+            entry = self.replay('cmd', cmd)
+            time.sleep(self.delay(entry))
+            if 'timeout' in entry:
+                raise CommandTimeoutError(cmd, entry['timeout'])
+            return entry['rc'], entry['out'], entry['err']
+
+        start = time.monotonic()
+        try:
+            returncode, stdout, stderr = run()
+        except CommandTimeoutError as e:
+            self.record('cmd', cmd, time.monotonic() - start, timeout=e.timeout)
+            raise
+        self.record('cmd', cmd, time.monotonic() - start, rc=returncode, out=stdout, err=stderr)
+        return returncode, stdout, stderr
+
+    def lines(self, cmd, run):
+        """Yield run()'s output lines for cmd, recording or replaying them with their timing"""
+        if self.mode == 'replay':
+            entry = self.replay('stream', cmd)
+            for offset, line in entry['lines']:
+                time.sleep(offset * self.speed)
+                yield line
+            if 'timeout' in entry:
+                raise CommandTimeoutError(cmd, entry['timeout'])
+            return
+
+        start = last = time.monotonic()
+        lines = []
+        try:
+            for line in run():
+                now = time.monotonic()
+                lines.append((round(now - last, 4), line))
+                last = now
+                yield line
+        except CommandTimeoutError as e:
+            self.record('stream', cmd, time.monotonic() - start, lines=lines, timeout=e.timeout)
+            raise
+        self.record('stream', cmd, time.monotonic() - start, lines=lines)
+
+    def http(self, url, run):
+        """Return run()'s response for url, recording or replaying it
+
+        The recorded response is read completely; HTTP errors are replayed
+        as HTTPError and connection failures as URLError.
+        """
+        import urllib.error
+
+        if self.mode == 'replay':
+            entry = self.replay('http', url)
+            time.sleep(self.delay(entry))
+            return _response(url, entry)
+
+        start = time.monotonic()
+        try:
+            with run() as response:
+                status, headers, body = response.status, response.headers.items(), response.read()
+        except urllib.error.HTTPError as e:
+            status, headers, body = e.code, e.headers.items(), e.read()
+        except (urllib.error.URLError, OSError) as e:
+            self.record('http', url, time.monotonic() - start, error=str(getattr(e, 'reason', e)))
+            raise
+        entry = {'status': status, 'headers': headers, 'body': base64.b64encode(body).decode()}
+        self.record('http', url, time.monotonic() - start, **entry)
+        return _response(url, entry)
+
+
+def _response(url, entry):
+    import email.message
+    import io
+    import urllib.error
+    import urllib.response
+
+    if 'error' in entry:
+        raise urllib.error.URLError(entry['error'])
+    headers = email.message.Message()
+    for name, value in entry['headers']:
+        headers[name] = value
+    body = io.BytesIO(base64.b64decode(entry['body']))
+    if entry['status'] >= 400 or entry['status'] == 304:
+        raise urllib.error.HTTPError(url, entry['status'], f"HTTP error {entry['status']}", headers, body)
+    return urllib.response.addinfourl(body, headers, url, entry['status'])
+
+
+def sleep(seconds):
+    """Sleep between polls of the device, scaled like the recorded durations while replaying"""
+    tape = current()
+    time.sleep(seconds * tape.speed if tape is not None and tape.mode == 'replay' else seconds)
+
+
+_current = None
+_current_key = None
+
+
+def current():
+    """Return the Cassette selected by $FSM_RECORD / $FSM_REPLAY, or None"""
+    global _current, _current_key
+    key = (os.environ.get(RECORD_ENV), os.environ.get(REPLAY_ENV), os.environ.get(SPEED_ENV))
+    if key != _current_key:
+        record, replay, speed = key
+        if record and replay:
+            raise CassetteError(f"${RECORD_ENV} and ${REPLAY_ENV} cannot both be set")
+        if record:
+            _current = Cassette(record, 'record')
+        elif replay:
+            _current = Cassette(replay, 'replay', float(speed) if speed else 1.0)
+        else:
+            _current = None
+        _current_key = key
+    return _current
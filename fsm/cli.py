@@ -1,33 +1,46 @@
 import sys
 import os
 import typer
-from typing import Optional
-from rich.console import Console
-from rich.table import Table
+from typing import List, Optional
 from rich import print as rich_print
-from rich.progress import Progress, SpinnerColumn, TextColumn
-from rich.panel import Panel
-from rich.text import Text
-
-from fsm.core import (
-    check_adb_connection as core_check_adb,
-    install_frida_server as core_install,
-    run_frida_server as core_run,
-    list_frida_server as core_list,
-    get_running_processes as core_ps,
-    kill_frida_server as core_kill
-)
+
+from fsm.output import OutputFormat, DEVICE_FIELDS, FILE_FIELDS, PROCESS_FIELDS, VERSION_FIELDS, FORWARD_FIELDS, PROBE_FIELDS, EVENT_FIELDS, GC_FIELDS, APPLY_FIELDS, HISTORY_FIELDS, HISTORY_STATS_FIELDS
+
+# Heavy modules (rich.console/table/progress/text and fsm.core with its network
+# and compression imports) are loaded inside the commands that need them, so
+# `fsm --help` and simple invocations start quickly.
 
 app = typer.Typer(
     name="fsm",
     help="frida-server manager for Android devices",
     add_completion=False,
-    rich_markup_mode="rich",
+    # Rich help rendering costs more than the rest of startup combined; only
+    # use it when a person is looking at the terminal
+    rich_markup_mode="rich" if sys.stdout.isatty() else None,
     # Ensure help option has -h short form
     context_settings={"help_option_names": ["--help", "-h"]}
 )
 
-console = Console()
+_console = None
+
+
+def get_console():
+    """Return the shared rich Console, creating it on first use"""
+    global _console
+    if _console is None:
+        from rich.console import Console
+        _console = Console()
+    return _console
+
+
+def progress_spinner():
+    """Create the spinner shown while a command talks to the device"""
+    from rich.progress import Progress, SpinnerColumn, TextColumn
+    return Progress(
+        SpinnerColumn(),
+        TextColumn("[progress.description]{task.description}"),
+        console=get_console(),
+    )
 
 
 def print_success(message: str):
@@ -50,11 +63,63 @@ def print_info(message: str):
     rich_print(f"[bold blue]ℹ {message}[/bold blue]")
 
 
+def print_machine_error(message: str):
+    """Print a plain error message to stderr so machine-readable stdout stays clean"""
+    typer.echo(f"Error: {message}", err=True)
+
+
+def output_option():
+    """The --output option shared by the listing commands"""
+    return typer.Option(OutputFormat.table, "--output", "-o", case_sensitive=False,
+                        help="Output format: table, or json/ndjson/tsv streamed without rich rendering")
+
+
+def run_in_daemon(command, verbose, machine=False, **args):
+    """Send command to a running fsm daemon and return its reply, or None to run the command directly"""
+    if verbose:
+        # Verbose output describes the adb commands fsm runs itself, so stay in-process
+        return None
+    if os.environ.get("FSM_RECORD") or os.environ.get("FSM_REPLAY"):
+        # Cassettes capture the commands of this process, not the daemon's
+        return None
+    from fsm.daemon import request
+    reply = request(command, **args)
+    if reply is None:
+        return None
+    # Replay what the daemon printed while running the command
+    if reply['output']:
+        (sys.stderr if machine else sys.stdout).write(reply['output'])
+    if not reply['ok']:
+        if reply['error']:
+            (print_machine_error if machine else print_error)(reply['error'])
+        raise typer.Exit(reply['exit_code'] or 1)
+    return reply
+
+
 @app.command()
 def check(
-    verbose: bool = typer.Option(False, "--verbose", "-v", help="Enable verbose output")
+    verbose: bool = typer.Option(False, "--verbose", "-v", help="Enable verbose output"),
+    output: OutputFormat = output_option()
 ):
     """Check ADB connection to devices"""
+    if output != OutputFormat.table:
+        from fsm.core import list_devices, iter_devices
+        from fsm.errors import CommandTimeoutError
+        from fsm.output import write_records
+
+        try:
+            devices = list_devices(verbose)
+            if devices is None:
+                print_machine_error("ADB is not installed or not in PATH")
+                raise typer.Exit(1)
+            if not write_records(iter_devices(verbose, devices), output, DEVICE_FIELDS):
+                print_machine_error("No devices connected via ADB")
+                raise typer.Exit(1)
+        except CommandTimeoutError as e:
+            print_machine_error(str(e))
+            raise typer.Exit(1)
+        return
+
     try:
         # Import core function
         from fsm.core import run_command
@@ -62,11 +127,7 @@ def check(
         devices = None
         output = None
         
-        with Progress(
-            SpinnerColumn(),
-            TextColumn("[progress.description]{task.description}"),
-            console=console,
-        ) as progress:
+        with progress_spinner() as progress:
             task = progress.add_task(description="Checking ADB connection...", total=None)
 
             output = run_command('adb devices', verbose)
@@ -89,6 +150,7 @@ def check(
         print_success(f"{len(devices)} device(s) connected")
 
         # Create a rich table to display device information
+        from rich.table import Table
         table = Table(title="Connected Devices")
         table.add_column("Serial Number", style="cyan", no_wrap=True)
         table.add_column("Model", style="green")
@@ -111,7 +173,7 @@ def check(
                 table.add_row(serial, model, status)
 
         # Print the table
-        console.print(table)
+        get_console().print(table)
 
         if verbose:
             print_info("Device details:")
@@ -125,42 +187,57 @@ def check(
 
 @app.command()
 def install(
-    version: Optional[str] = typer.Argument(None, help="Specific version of frida-server to install"),
+    versions: Optional[List[str]] = typer.Argument(None, metavar="[VERSION]...", help="Version(s) of frida-server to install; several are pushed to the device as one bundle"),
     repo: str = typer.Option("frida/frida", "--repo", "-r", help="Custom GitHub repository (owner/repo format)"),
     keep_name: bool = typer.Option(False, "--keep-name", "-k", help="Keep the original name when installing"),
     name: Optional[str] = typer.Option(None, "--name", "-n", help="Custom name for frida-server on the device"),
     url: Optional[str] = typer.Option(None, "--url", "-u", help="Custom URL to download frida-server from (supports xz, gz, tar.gz formats)"),
     proxy: Optional[str] = typer.Option(None, "--proxy", "-p", help="Proxy server to use for downloading frida-server"),
+    mirror: Optional[List[str]] = typer.Option(None, "--mirror", "-m", help="Download mirror base URL or {url} template, raced against GitHub (repeatable; also $FSM_MIRRORS)"),
     verbose: bool = typer.Option(False, "--verbose", "-v", help="Enable verbose output")
 ):
     """Install frida-server on the device"""
+    if versions and len(versions) > 1:
+        if keep_name or name or url:
+            print_error("--keep-name, --name and --url install a single frida-server")
+            raise typer.Exit(1)
+        install_bundle(versions, repo, proxy, mirror, verbose)
+        return
+    version = versions[0] if versions else None
+    reply = run_in_daemon('install', verbose, version=version, repo=repo, keep_name=keep_name,
+                          custom_name=name, url=url, proxy=proxy, mirrors=mirror)
     try:
         result = None
+        timings = None
         
-        # Check ADB connection first, outside the progress bar
-        from fsm.core import check_adb_connection
-        check_adb_connection(verbose)
-        
-        # Show progress bar while running the installation
-        with Progress(
-            SpinnerColumn(),
-            TextColumn("[progress.description]{task.description}"),
-            console=console,
-        ) as progress:
-            task = progress.add_task(description="Installing frida-server...", total=None)
+        if reply is not None:
+            result = reply['result']
+        else:
+            # The adb connection is checked by the install pipeline, alongside the version lookup
+            from fsm.device import Device
+            device = Device(verbose=verbose)
+
+            # Show progress bar while running the installation
+            with progress_spinner() as progress:
+                task = progress.add_task(description="Installing frida-server...", total=None)
             
-            # Run the actual installation
-            try:
-                result = core_install(version, verbose, repo, keep_name, name, url, proxy)
-                progress.update(task, completed=True)
-            except Exception as e:
-                # Update progress bar before raising exception
-                progress.update(task, completed=True)
-                raise
+                # Run the actual installation
+                try:
+                    from fsm.core import install_frida_server as core_install
+                    result = core_install(version, verbose, repo, keep_name, name, url, proxy, device, mirror)
+                    progress.update(task, completed=True)
+                    from fsm import history
+                    timings = history.last()
+                except Exception as e:
+                    # Update progress bar before raising exception
+                    progress.update(task, completed=True)
+                    raise
         
         # Print success messages after progress bar has finished
         print_success(f"Successfully installed frida-server")
         print_info(f"Location: {result}")
+        if timings:
+            print_info(f"Timing: {history.describe(timings)}")
 
         if version:
             print_info(f"To run this version: fsm run -V {version}")
@@ -172,6 +249,37 @@ def install(
         raise typer.Exit(1)
 
 
+def install_bundle(versions, repo, proxy, mirror, verbose):
+    """Install several versions with one push and report each of them"""
+    reply = run_in_daemon('install_bundle', verbose, versions=versions, repo=repo, proxy=proxy, mirrors=mirror)
+    try:
+        if reply is not None:
+            results = reply['result']
+        else:
+            from fsm.device import Device
+            device = Device(verbose=verbose)
+            device.ensure_connected()
+
+            with progress_spinner() as progress:
+                task = progress.add_task(description=f"Installing {len(versions)} frida-server versions...", total=None)
+                from fsm.core import install_frida_servers
+                results = install_frida_servers(versions, verbose, repo, proxy, device, mirror)
+                progress.update(task, completed=True)
+    except SystemExit as e:
+        raise typer.Exit(e.code)
+    except Exception as e:
+        print_error(f"Error installing frida-server: {e}")
+        raise typer.Exit(1)
+
+    for result in results:
+        if result['status'] == 'installed':
+            print_success(f"Installed {result['version']} at {result['path']}")
+        else:
+            print_error(f"Failed to install {result['version']}: {result['detail']}")
+    if any(result['status'] != 'installed' for result in results):
+        raise typer.Exit(1)
+
+
 @app.command()
 def run(
     dir: Optional[str] = typer.Option(None, "--dir", "-d", help="Custom directory to run frida-server from"),
@@ -179,22 +287,27 @@ def run(
     version: Optional[str] = typer.Option(None, "--version", "-V", help="Specific version of frida-server to run"),
     name: Optional[str] = typer.Option(None, "--name", "-n", help="Custom name of frida-server to run"),
     force: bool = typer.Option(False, "--force", "-f", help="Force run the specified version, stop any existing frida-server processes first"),
+    log: bool = typer.Option(False, "--log", "-l", help="Keep frida-server output in a rotating log on the device (see `fsm logs`); restarts a running frida-server"),
+    switch: bool = typer.Option(False, "--switch", "-s", help="Replace the running frida-server with one device-side script, polling for readiness, and report the downtime"),
     verbose: bool = typer.Option(False, "--verbose", "-v", help="Enable verbose output")
 ):
     """Run frida-server on the device"""
+    reply = run_in_daemon('run', verbose, dir=dir, params=params, version=version, name=name, force=force, log=log,
+                          switch=switch)
     try:
         success = False
-        with Progress(
-            SpinnerColumn(),
-            TextColumn("[progress.description]{task.description}"),
-            console=console,
-        ) as progress:
-            task = progress.add_task(description="Starting frida-server...", total=None)
+        if reply is not None:
+            success = reply['result']
+        else:
+            with progress_spinner() as progress:
+                task = progress.add_task(description="Starting frida-server...", total=None)
 
-            # Run frida-server
-            success = core_run(dir, params, verbose, version, name, force)
+                # Run frida-server
+                from fsm.core import run_frida_server as core_run
+                from fsm.device import Device
+                success = core_run(dir, params, verbose, version, name, force, Device(verbose=verbose), log, switch)
 
-            progress.update(task, completed=True)
+                progress.update(task, completed=True)
         
         # Print success message outside the Progress context manager
         if success:
@@ -212,74 +325,85 @@ def run(
 
 @app.command()
 def list(
-    dir: Optional[str] = typer.Option(None, "--dir", "-d", help="Custom directory to list frida-server files from"),
+    dirs: Optional[List[str]] = typer.Option(None, "--dir", "-d", help="Directory to list frida-server files from (repeatable)"),
     name: Optional[str] = typer.Option(None, "--name", "-n", help="Filter by specific frida-server name"),
-    verbose: bool = typer.Option(False, "--verbose", "-v", help="Enable verbose output")
+    recursive: bool = typer.Option(False, "--recursive", "-r", help="Also search the subdirectories"),
+    verbose: bool = typer.Option(False, "--verbose", "-v", help="Enable verbose output"),
+    output: OutputFormat = output_option()
 ):
     """List frida-server files on the device and show their versions"""
+    reply = run_in_daemon('list', verbose, output != OutputFormat.table, dirs=dirs, name=name, recursive=recursive)
+
+    from fsm.core import find_frida_server_files, find_frida_servers, iter_frida_server_files, DEFAULT_INSTALL_DIR
+    from fsm.device import Device
+
+    dirs = dirs or [DEFAULT_INSTALL_DIR]
+    server_dir = ", ".join(dirs)
+    # Several directories or a tree are searched with one `find`; a single directory uses the cached `ls`
+    search = len(dirs) > 1 or recursive
+    device = Device(verbose=verbose)
+
+    if output != OutputFormat.table:
+        from fsm.errors import CommandTimeoutError
+        from fsm.output import write_records
+        if reply is not None:
+            records = reply['result']
+        elif search:
+            records = find_frida_servers(dirs, name, recursive, verbose, device)
+        else:
+            records = iter_frida_server_files(dirs[0], name, verbose, device=device)
+        try:
+            write_records(records, output, FILE_FIELDS)
+        except CommandTimeoutError as e:
+            print_machine_error(str(e))
+            raise typer.Exit(1)
+        return
+
     try:
-        # Get the list of files first with progress bar
-        from fsm.core import run_command, get_frida_server_version, DEFAULT_INSTALL_DIR
-        
-        server_dir = dir if dir else DEFAULT_INSTALL_DIR
-        files = []
-            
-        with Progress(
-            SpinnerColumn(),
-            TextColumn("[progress.description]{task.description}"),
-            console=console,
-        ) as progress:
-            task = progress.add_task(description="Listing frida-server files...", total=None)
-
-            # Build the command with optional name filter
-            if name:
-                # If name is provided, search for matching files with pattern
-                output = run_command(f"adb shell ls {server_dir}/*{name}* 2>/dev/null || echo 'Not found'", verbose)
-                # Check if any files were found
-                if output.strip() == 'Not found' or 'No such file or directory' in output:
-                    progress.update(task, completed=True)
-                    print_warning(f"No frida-related server file found matching pattern '{name}' in {server_dir}")
-                    return
-                # Process the found files
-                files = output.strip().split('\n')
-                # Extract just the filenames (remove path if included)
-                files = [os.path.basename(file) for file in files]
-                # Sort files alphabetically by filename
-                files.sort()
-                # Update progress bar to completed
+        records = None
+        if reply is not None:
+            records = reply['result']
+            files = [record['filename'] for record in records]
+        else:
+            # Get the list of files first with progress bar
+            with progress_spinner() as progress:
+                task = progress.add_task(description="Listing frida-server files...", total=None)
+                if search:
+                    records = [record for record in find_frida_servers(dirs, name, recursive, verbose, device)]
+                    files = [record['path'] for record in records]
+                else:
+                    files = find_frida_server_files(dirs[0], name, verbose, device)
                 progress.update(task, completed=True)
+
+        if not files:
+            if name:
+                print_warning(f"No frida-related server file found matching pattern '{name}' in {server_dir}")
             else:
-                # Otherwise list all frida-related server files
-                output = run_command(f"adb shell ls {server_dir} | grep -E 'frida-server|florida-server|frida.*server|server.*frida'", verbose)
-                
-                progress.update(task, completed=True)
-                
-                if not output:
-                    print_warning(f"No frida-related server files found in {server_dir}")
-                    return
-                
-                # Process the files and get their versions
-                files = output.strip().split('\n')
-                # Sort files alphabetically by filename
-                files.sort()
+                print_warning(f"No frida-related server files found in {server_dir}")
+            return
 
         # Create a rich table with highlighted title
+        from rich.table import Table
         from rich.text import Text
         title_text = Text(f"Frida-Server Files in ")
         dir_text = Text(f"{server_dir}", style="bold yellow")
         title_text.append(dir_text)
+        if recursive:
+            title_text.append(" (recursive)")
         if name:
             title_text.append(f" (Filtered by: {name})")
         table = Table(title=title_text)
-        table.add_column("Filename", no_wrap=True)
+        table.add_column("Path" if search else "Filename", no_wrap=True)
         table.add_column("Version", style="green")
+        table.add_column("Aliases", style="dim")
 
         # Process each file and get its version
-        for file in files:
-            filename = file.strip()
-            remote_path = f"{server_dir}/{filename}"
-            version = get_frida_server_version(remote_path, verbose)
-            
+        if records is None:
+            records = iter_frida_server_files(dirs[0], name, verbose, files, device)
+        for record in records:
+            filename = record['path'] if search else record['filename']
+            version = record['version']
+
             # Highlight keywords in filename
             filename_text = Text(filename)
             if "frida-server" in filename:
@@ -291,9 +415,9 @@ def list(
             else:
                 filename_text = Text(filename, style="cyan")
             
-            table.add_row(filename_text, version if version else "Unknown")
+            table.add_row(filename_text, version if version else "Unknown", ", ".join(record.get('aliases') or []))
 
-        console.print(table)
+        get_console().print(table)
         # Print success message with highlighted path
         success_text = Text(f"Found {len(files)} ")
         if len(files) == 1:
@@ -304,7 +428,7 @@ def list(
         success_text.append(f" in ")
         path_text = Text(f"{server_dir}", style="bold yellow")
         success_text.append(path_text)
-        console.print(success_text)
+        get_console().print(success_text)
 
     except Exception as e:
         print_error(f"Error listing frida-server files: {e}")
@@ -314,59 +438,57 @@ def list(
 @app.command()
 def ps(
     name: Optional[str] = typer.Option(None, "--name", "-n", help="Filter processes by name"),
-    verbose: bool = typer.Option(False, "--verbose", "-v", help="Enable verbose output")
+    verbose: bool = typer.Option(False, "--verbose", "-v", help="Enable verbose output"),
+    output: OutputFormat = output_option()
 ):
     """List running processes on the device"""
-    try:
-        # Get running processes
-        from fsm.core import run_command
+    search_name = name if name else "frida-server"
+    reply = run_in_daemon('ps', verbose, output != OutputFormat.table, name=search_name)
 
-        search_name = name if name else "frida-server"
-        cmd = f"adb shell ps -A | grep {search_name}"
-        
-        # Use progress bar only for command execution
-        with Progress(
-            SpinnerColumn(),
-            TextColumn("[progress.description]{task.description}"),
-            console=console,
-        ) as progress:
-            task = progress.add_task(description="Checking running processes...", total=None)
-            output = run_command(cmd, verbose)
-            progress.update(task, completed=True)
+    if output != OutputFormat.table:
+        from fsm.errors import CommandTimeoutError
+        from fsm.output import write_records
+        if reply is not None:
+            records = reply['result']
+        else:
+            from fsm.core import iter_running_processes
+            records = iter_running_processes(search_name, verbose)
+        try:
+            write_records(records, output, PROCESS_FIELDS)
+        except CommandTimeoutError as e:
+            print_machine_error(str(e))
+            raise typer.Exit(1)
+        return
+
+    try:
+        if reply is not None:
+            processes = reply['result']
+        else:
+            from fsm.core import iter_running_processes
+            # Use progress bar only for command execution
+            with progress_spinner() as progress:
+                task = progress.add_task(description="Checking running processes...", total=None)
+                # Parsed and deduplicated in the same order as the device reports them
+                processes = [process for process in iter_running_processes(search_name, verbose)]
+                progress.update(task, completed=True)
 
         # Process output after progress bar ends
-        if not output:
+        if not processes:
             print_warning(f"No running processes found matching '{search_name}'")
             return
 
-        # Process the output - remove duplicates
-        lines = output.strip().split('\n')
-        # Deduplicate lines while preserving order
-        seen = set()
-        unique_lines = []
-        for line in lines:
-            stripped_line = line.strip()
-            if stripped_line and stripped_line not in seen:
-                seen.add(stripped_line)
-                unique_lines.append(stripped_line)
-
         # Create a rich table
+        from rich.table import Table
         table = Table(title=f"Running Processes matching '{search_name}'")
         table.add_column("PID", style="cyan", no_wrap=True)
         table.add_column("User", style="yellow")
         table.add_column("Memory", style="blue")
         table.add_column("Command", style="green")
 
-        for line in unique_lines:
-            parts = line.strip().split()
-            if len(parts) >= 9:  # Need at least 9 parts to include command
-                pid = parts[1]
-                user = parts[0]
-                memory = parts[4]
-                command = ' '.join(parts[8:])  # Command starts from 9th field (index 8), not 8th field
-                table.add_row(pid, user, memory, command)
+        for process in processes:
+            table.add_row(process['pid'], process['user'], process['memory'], process['command'])
 
-        console.print(table)
+        get_console().print(table)
 
     except Exception as e:
         print_error(f"Error checking processes: {e}")
@@ -380,25 +502,27 @@ def kill(
     verbose: bool = typer.Option(False, "--verbose", "-v", help="Enable verbose output")
 ):
     """Kill frida-server process(es) on the device"""
+    reply = run_in_daemon('kill', verbose, pid=pid, name=name)
     try:
-        # Check ADB connection first, outside the progress bar
-        from fsm.core import check_adb_connection
-        check_adb_connection(verbose)
-        
         result = None
         
-        # Show progress bar while killing processes
-        with Progress(
-            SpinnerColumn(),
-            TextColumn("[progress.description]{task.description}"),
-            console=console,
-        ) as progress:
-            task = progress.add_task(description="Killing processes...", total=None)
+        if reply is not None:
+            result = reply['result']
+        else:
+            # Check ADB connection first, outside the progress bar
+            from fsm.device import Device
+            device = Device(verbose=verbose)
+            device.ensure_connected()
+        
+            # Show progress bar while killing processes
+            with progress_spinner() as progress:
+                task = progress.add_task(description="Killing processes...", total=None)
 
-            # Kill processes
-            result = core_kill(pid, verbose, name)
+                # Kill processes
+                from fsm.core import kill_frida_server as core_kill
+                result = core_kill(pid, verbose, name, device)
 
-            progress.update(task, completed=True)
+                progress.update(task, completed=True)
         
         # Print result after progress bar ends
         if result:
@@ -416,9 +540,601 @@ def kill(
         raise typer.Exit(1)
 
 
+@app.command()
+def logs(
+    follow: bool = typer.Option(False, "--follow", "-f", help="Keep printing new output as frida-server writes it"),
+    lines: int = typer.Option(50, "--lines", "-n", min=0, help="Number of recent lines to show"),
+    verbose: bool = typer.Option(False, "--verbose", "-v", help="Enable verbose output")
+):
+    """Show frida-server output captured with `fsm run --log`"""
+    from fsm import logs as server_logs
+
+    reply = run_in_daemon('logs', verbose, lines=lines)
+    try:
+        log = None
+        if reply is not None:
+            recent = reply['result']
+        else:
+            from fsm.device import Device
+            device = Device(verbose=verbose)
+            device.ensure_connected()
+            log = server_logs.DeviceLog(device)
+            # Only the bytes written since the last pull cross adb; None means someone else is following
+            log.pull()
+            recent = server_logs.tail_lines(log.path, lines)
+
+        if not recent and not follow:
+            print_warning("No frida-server output captured yet, start it with `fsm run --log`")
+            return
+        for line in recent:
+            typer.echo(line)
+        if not follow:
+            return
+
+        # Let `kill` end the follow like Ctrl-C does, so the adb stream is torn down too
+        import signal
+        signal.signal(signal.SIGTERM, signal.default_int_handler)
+        if log is not None:
+            try:
+                for line in log.follow():
+                    typer.echo(line)
+                return
+            except TimeoutError:
+                # The daemon or another `fsm logs -f` is already following the device, read its copy
+                pass
+        for line in server_logs.follow_file(server_logs.get_log_path()):
+            typer.echo(line)
+    except KeyboardInterrupt:
+        return
+    except SystemExit as e:
+        raise typer.Exit(e.code)
+    except Exception as e:
+        print_error(f"Error reading frida-server logs: {e}")
+        raise typer.Exit(1)
+
+
+@app.command()
+def events(
+    serial: Optional[List[str]] = typer.Option(None, "--serial", "-s", help="Device to watch, can be repeated (default: $ANDROID_SERIAL or the only device)"),
+    all_devices: bool = typer.Option(False, "--all", "-a", help="Watch every connected device"),
+    pid: Optional[int] = typer.Option(None, "--pid", help="Only logcat lines written by this process"),
+    process: str = typer.Option("frida", "--process", "-P", help="Only events about processes whose name contains this ('' for any)"),
+    since: Optional[float] = typer.Option(None, "--since", help="Include events from this many seconds ago"),
+    dump: bool = typer.Option(False, "--dump", "-d", help="Print buffered events and exit instead of following"),
+    verbose: bool = typer.Option(False, "--verbose", "-v", help="Enable verbose output"),
+    output: OutputFormat = output_option()
+):
+    """Stream frida-server crash, low-memory kill and SELinux denial events from logcat"""
+    from fsm import events as logcat_events
+
+    machine = output != OutputFormat.table
+    try:
+        if serial:
+            serials = serial
+        else:
+            from fsm.forward import select_serials
+            serials = select_serials(all_devices, verbose)
+        stream = logcat_events.watch(serials, pid, since, dump, process, verbose)
+
+        if machine:
+            from fsm.output import write_records
+            write_records(stream, output, EVENT_FIELDS)
+            return
+
+        styles = {'lmk_kill': "bold red", 'crash': "bold red", 'tombstone': "red",
+                  'selinux_denial': "yellow", 'log': "dim"}
+        if not dump:
+            print_info(f"Watching {', '.join(serials)} for frida-server events (Ctrl-C to stop)")
+        from rich.markup import escape
+        for event in stream:
+            who = f"{event['process']}({event['pid']})" if event['process'] else str(event['pid'])
+            style = styles.get(event['kind'], "")
+            rich_print(f"{event['time']} [cyan]{event['serial']}[/cyan] [{style}]{event['kind']:<14}[/{style}] "
+                       f"{escape(who)} {escape(event['message'])}")
+    except KeyboardInterrupt:
+        return
+    except Exception as e:
+        (print_machine_error if machine else print_error)(f"Error watching events: {e}")
+        raise typer.Exit(1)
+
+
+@app.command()
+def gc(
+    dir: Optional[str] = typer.Option(None, "--dir", "-d", help="Directory holding the frida-server binaries (default: /data/local/tmp)"),
+    keep: int = typer.Option(3, "--keep", "-k", min=0, help="Number of most recently used versions to keep"),
+    pin: Optional[List[str]] = typer.Option(None, "--pin", "-p", help="Version or file name to keep regardless of use, can be repeated"),
+    dry_run: bool = typer.Option(False, "--dry-run", "-n", help="Only show what would be deleted"),
+    verbose: bool = typer.Option(False, "--verbose", "-v", help="Enable verbose output"),
+    output: OutputFormat = output_option()
+):
+    """Delete old frida-server binaries, keeping the most recently used versions"""
+    from fsm.storage import gc as collect_garbage
+
+    machine = output != OutputFormat.table
+    try:
+        from fsm.core import DEFAULT_INSTALL_DIR
+        from fsm.device import Device
+        files = collect_garbage(dir or DEFAULT_INSTALL_DIR, keep, pin or (), dry_run, verbose, Device(verbose=verbose))
+    except SystemExit as e:
+        raise typer.Exit(e.code)
+    except Exception as e:
+        (print_machine_error if machine else print_error)(f"Error collecting garbage: {e}")
+        raise typer.Exit(1)
+
+    if machine:
+        from fsm.output import write_records
+        write_records(files, output, GC_FIELDS)
+        return
+
+    deleted = [record for record in files if record['action'] == 'delete']
+    if files:
+        import time
+        from rich.table import Table
+        table = Table(title=f"frida-server binaries in {dir or '/data/local/tmp'}")
+        table.add_column("File", style="cyan", overflow="fold")
+        table.add_column("Version", style="green", no_wrap=True)
+        table.add_column("Size", justify="right", no_wrap=True)
+        table.add_column("Last used", no_wrap=True)
+        table.add_column("Action", no_wrap=True)
+        for record in files:
+            action = (f"[red]{'would delete' if dry_run else 'deleted'}[/red]" if record['action'] == 'delete'
+                      else f"keep ({record['reason']})")
+            table.add_row(record['name'], record['version'] or "", f"{record['size'] / (1024 * 1024):.1f} MiB",
+                          time.strftime("%Y-%m-%d %H:%M", time.localtime(record['last_used'])), action)
+        get_console().print(table)
+
+    if not deleted:
+        print_info(f"Nothing to delete, {len(files)} file(s) kept")
+        return
+    # Aliases of one stored binary free its data once, and only with the last of them
+    reclaimed = sum(record['freed'] for record in deleted) / (1024 * 1024)
+    if dry_run:
+        print_warning(f"Dry run: would reclaim {reclaimed:.1f} MiB by deleting {len(deleted)} file(s)")
+    else:
+        print_success(f"Reclaimed {reclaimed:.1f} MiB by deleting {len(deleted)} file(s)")
+
+
+@app.command()
+def apply(
+    state: str = typer.Argument(..., help="State file (TOML, or JSON) with a [devices.<serial>] table per device"),
+    plan: bool = typer.Option(False, "--plan", help="Only print the actions needed, without running them"),
+    jobs: Optional[int] = typer.Option(None, "--jobs", "-j", min=1, help="Devices handled at once (default: all)"),
+    proxy: Optional[str] = typer.Option(None, "--proxy", "-p", help="Proxy server to use for downloading frida-server"),
+    mirror: Optional[List[str]] = typer.Option(None, "--mirror", "-m", help="Download mirror base URL or {url} template (repeatable; also $FSM_MIRRORS)"),
+    verbose: bool = typer.Option(False, "--verbose", "-v", help="Enable verbose output"),
+    output: OutputFormat = output_option()
+):
+    """Bring devices to the state described in a state file, running only the actions needed"""
+    from fsm import apply as desired_state
+
+    machine = output != OutputFormat.table
+    try:
+        devices = desired_state.load_state(state)
+        if machine or plan:
+            actions = desired_state.plan(devices, verbose, jobs)
+        else:
+            with progress_spinner() as progress:
+                task = progress.add_task(description=f"Checking {len(devices)} device(s)...", total=None)
+                actions = desired_state.plan(devices, verbose, jobs)
+                progress.update(task, completed=True)
+        if not plan and actions:
+            actions = desired_state.apply(devices, actions, proxy, mirror, verbose, jobs)
+    except Exception as e:
+        (print_machine_error if machine else print_error)(f"Error applying {state}: {e}")
+        raise typer.Exit(1)
+
+    failed = [action for action in actions if action['status'] in ('failed', 'skipped')]
+    if machine:
+        from fsm.output import write_records
+        write_records(actions, output, APPLY_FIELDS)
+    elif actions:
+        from rich.table import Table
+        table = Table(title="Planned actions" if plan else "Applied actions")
+        table.add_column("Device", style="cyan", no_wrap=True)
+        table.add_column("Action", style="green", no_wrap=True)
+        table.add_column("Detail", overflow="fold")
+        table.add_column("Status", no_wrap=True)
+        colors = {'done': 'green', 'failed': 'red', 'skipped': 'yellow', 'planned': 'blue'}
+        for action in actions:
+            color = colors.get(action['status'], 'white')
+            table.add_row(action['serial'], action['action'], action['detail'],
+                          f"[{color}]{action['status']}[/{color}]")
+        get_console().print(table)
+
+    if failed:
+        if not machine:
+            print_error(f"{len(failed)} of {len(actions)} action(s) failed or were skipped")
+        raise typer.Exit(1)
+    if not machine:
+        if not actions:
+            print_success(f"Nothing to do, {len(devices)} device(s) already match {state}")
+        elif plan:
+            print_info(f"{len(actions)} action(s) needed; run without --plan to apply them")
+        else:
+            print_success(f"Applied {len(actions)} action(s) on {len({a['serial'] for a in actions})} device(s)")
+
+
+@app.command()
+def versions(
+    repo: Optional[List[str]] = typer.Option(None, "--repo", "-r", help="Repository to query (owner/repo), can be repeated"),
+    version_range: Optional[str] = typer.Option(None, "--range", help="Version range, e.g. '>=16,<17', '16.1' or '16.*'"),
+    arch: Optional[str] = typer.Option(None, "--arch", "-a", help="Architecture, e.g. android-arm64 or arm64"),
+    sync: bool = typer.Option(False, "--sync", "-s", help="Update the local release index from GitHub before querying"),
+    proxy: Optional[str] = typer.Option(None, "--proxy", "-p", help="Proxy server to use when syncing"),
+    verbose: bool = typer.Option(False, "--verbose", "-v", help="Enable verbose output"),
+    output: OutputFormat = output_option()
+):
+    """Search the local index of frida-server releases (offline unless --sync)"""
+    from fsm import index
+
+    repos = repo or None
+    try:
+        if sync:
+            targets = repos or sorted(set(index.DEFAULT_REPOS) | set(index.indexed_repos()))
+            for target in targets:
+                # One unreachable repository should not prevent querying the others
+                try:
+                    if output == OutputFormat.table:
+                        with progress_spinner() as progress:
+                            task = progress.add_task(description=f"Syncing {target}...", total=None)
+                            new_releases = index.sync_repo(target, verbose, proxy)
+                            progress.update(task, completed=True)
+                        print_info(f"{target}: {new_releases} new release(s)")
+                    else:
+                        index.sync_repo(target, verbose, proxy)
+                except Exception as e:
+                    if output != OutputFormat.table:
+                        print_machine_error(f"Could not sync {target}: {e}")
+                    else:
+                        print_warning(f"Could not sync {target}: {e}")
+
+        records = index.search(repos, version_range, arch)
+    except Exception as e:
+        if output != OutputFormat.table:
+            print_machine_error(f"Error querying the release index: {e}")
+        else:
+            print_error(f"Error querying the release index: {e}")
+        raise typer.Exit(1)
+
+    if output != OutputFormat.table:
+        from fsm.output import write_records
+        write_records(records, output, VERSION_FIELDS)
+        return
+
+    if not records:
+        if not index.indexed_repos():
+            print_warning("The release index is empty, run `fsm versions --sync` to build it")
+        else:
+            print_warning("No indexed release matches the given filters")
+        return
+
+    from rich.table import Table
+    table = Table(title="Indexed frida-server releases")
+    table.add_column("Repository", style="cyan", no_wrap=True)
+    table.add_column("Version", style="green", no_wrap=True)
+    table.add_column("Arch", style="yellow", no_wrap=True)
+    table.add_column("Asset")
+    table.add_column("Size", justify="right", no_wrap=True)
+    for record in records:
+        size = f"{record['size'] / (1024 * 1024):.1f} MiB" if record['size'] else ""
+        table.add_row(record['repo'], record['version'], record['arch'] or "", record['asset'], size)
+    get_console().print(table)
+
+
+@app.command()
+def forward(
+    all_devices: bool = typer.Option(False, "--all", "-a", help="Forward every connected device"),
+    device_port: int = typer.Option(27042, "--device-port", "-P", help="frida-server port on the device"),
+    port_range: Optional[str] = typer.Option(None, "--port-range", help="Host port pool, e.g. 27100-27999 (default: $FSM_FORWARD_PORTS or 27100-27999)"),
+    list_forwards: bool = typer.Option(False, "--list", "-l", help="Show the tracked forwards instead of creating any"),
+    prune: bool = typer.Option(False, "--prune", help="Tear down forwards of disconnected devices and forget stale mappings"),
+    remove: bool = typer.Option(False, "--remove", help="Remove the forward of the selected device(s)"),
+    verbose: bool = typer.Option(False, "--verbose", "-v", help="Enable verbose output"),
+    output: OutputFormat = output_option()
+):
+    """Forward a host port from a shared pool to frida-server on each device"""
+    from fsm import forward as port_pool
+
+    machine = output != OutputFormat.table
+    try:
+        if list_forwards:
+            records = port_pool.forwards(verbose)
+        elif prune:
+            records = port_pool.prune(port_range, verbose)
+        else:
+            serials = port_pool.select_serials(all_devices, verbose)
+            if remove:
+                records = [record for record in (port_pool.remove_forward(serial, device_port, verbose)
+                                                 for serial in serials) if record]
+            else:
+                records = [port_pool.ensure_forward(serial, device_port, port_range, verbose) for serial in serials]
+    except Exception as e:
+        (print_machine_error if machine else print_error)(f"Error managing forwards: {e}")
+        raise typer.Exit(1)
+
+    if machine:
+        from fsm.output import write_records
+        write_records(records, output, FORWARD_FIELDS)
+        return
+
+    if not records:
+        print_warning("Nothing to remove" if prune or remove else "No forwards are tracked")
+        return
+
+    from rich.table import Table
+    title = "Removed forwards" if prune or remove else "frida-server forwards"
+    table = Table(title=title)
+    table.add_column("Serial", style="cyan", no_wrap=True)
+    table.add_column("Endpoint", style="green", no_wrap=True)
+    table.add_column("Device port", style="yellow")
+    for record in records:
+        table.add_row(record['serial'], record['endpoint'], record['remote'])
+    get_console().print(table)
+
+
+@app.command()
+def probe(
+    count: int = typer.Option(10, "--count", "-n", min=1, help="Number of handshakes to measure"),
+    endpoint: Optional[str] = typer.Option(None, "--endpoint", "-e", help="host:port to probe instead of the device's managed forward"),
+    device_port: int = typer.Option(27042, "--device-port", "-P", help="frida-server port on the device"),
+    wait: Optional[float] = typer.Option(None, "--wait", "-w", help="First wait up to this many seconds for frida-server to accept the handshake"),
+    timeout: float = typer.Option(2.0, "--timeout", "-t", help="Timeout of each connection attempt in seconds"),
+    interval: float = typer.Option(0.0, "--interval", "-i", help="Pause between handshakes in seconds"),
+    verbose: bool = typer.Option(False, "--verbose", "-v", help="Enable verbose output"),
+    output: OutputFormat = output_option()
+):
+    """Measure frida-server connect and handshake latency (exit 1 if any handshake fails)"""
+    from fsm import probe as latency
+
+    machine = output != OutputFormat.table
+    report_error = print_machine_error if machine else print_error
+    try:
+        if endpoint:
+            host, port = latency.parse_endpoint(endpoint)
+        else:
+            from fsm import forward as port_pool
+            serial = port_pool.select_serials(False, verbose)[0]
+            record = port_pool.ensure_forward(serial, device_port, None, verbose)
+            host, port = latency.parse_endpoint(record['endpoint'])
+            if verbose:
+                print_info(f"Probing {serial} through {record['endpoint']}")
+
+        if wait is not None:
+            waited = latency.wait_until_ready(host, port, wait, handshake_timeout=timeout)
+            if not machine:
+                print_success(f"frida-server at {host}:{port} is ready after {waited:.2f}s")
+
+        if machine:
+            from fsm.output import write_records
+            samples = []
+
+            def collect():
+                # Stream each sample as it is measured while keeping them for the exit status
+                for sample in latency.probe(host, port, count, timeout, interval):
+                    samples.append(sample)
+                    yield sample
+
+            write_records(collect(), output, PROBE_FIELDS)
+        else:
+            with progress_spinner() as progress:
+                task = progress.add_task(description=f"Probing {host}:{port}...", total=None)
+                samples = [sample for sample in latency.probe(host, port, count, timeout, interval)]
+                progress.update(task, completed=True)
+    except TimeoutError as e:
+        report_error(str(e))
+        raise typer.Exit(1)
+    except Exception as e:
+        report_error(f"Error probing frida-server: {e}")
+        raise typer.Exit(1)
+
+    failures = [sample for sample in samples if not sample['ok']]
+    if machine:
+        if failures:
+            print_machine_error(f"{len(failures)} of {len(samples)} handshakes failed: {failures[-1]['error']}")
+            raise typer.Exit(1)
+        return
+
+    if len(failures) < len(samples):
+        from rich.table import Table
+        summary = latency.summarize(samples)
+        table = Table(title=f"frida-server latency at {host}:{port} (ms)")
+        table.add_column("Metric", style="cyan", no_wrap=True)
+        columns = ['min'] + [f"p{pct}" for pct in latency.PERCENTILES] + ['max']
+        for column in columns:
+            table.add_column(column, justify="right")
+        for metric, label in (('connect_ms', "TCP connect"), ('response_ms', "Handshake response")):
+            table.add_row(label, *(f"{summary[metric][column]:.2f}" for column in columns))
+        get_console().print(table)
+
+    if failures:
+        print_error(f"{len(failures)} of {len(samples)} handshakes failed: {failures[-1]['error']}")
+        raise typer.Exit(1)
+    print_success(f"{len(samples)} of {len(samples)} handshakes completed")
+
+
+history_app = typer.Typer(help="Timings of past install, run and kill operations")
+app.add_typer(history_app, name="history")
+
+
+@history_app.command("list")
+def history_list(
+    limit: int = typer.Option(20, "--limit", "-n", min=1, help="Number of operations to show"),
+    serial: Optional[str] = typer.Option(None, "--serial", "-s", help="Only operations on this device"),
+    command: Optional[str] = typer.Option(None, "--command", "-c", help="Only this command (install, run, kill)"),
+    output: OutputFormat = output_option()
+):
+    """Show the most recent operations with their phase timings"""
+    import time
+    from fsm import history
+
+    machine = output != OutputFormat.table
+    try:
+        operations = history.recent(limit, serial, command)
+    except Exception as e:
+        (print_machine_error if machine else print_error)(f"Error reading the history: {e}")
+        raise typer.Exit(1)
+
+    records = [{
+        'time': time.strftime("%Y-%m-%d %H:%M:%S", time.localtime(operation['started_at'])),
+        'command': operation['command'],
+        'serial': operation['serial'] or "default",
+        'version': operation['version'],
+        'outcome': operation['outcome'],
+        'duration_ms': round(operation['duration'] * 1000, 1),
+        'bytes': operation['bytes'],
+        'phases': ' '.join(f"{phase}={seconds * 1000:.0f}ms" for phase, seconds in operation['phases'].items()),
+    } for operation in operations]
+    if machine:
+        from fsm.output import write_records
+        write_records(records, output, HISTORY_FIELDS)
+        return
+    if not records:
+        print_info("No operations recorded yet")
+        return
+
+    from rich.table import Table
+    table = Table(title="Recent operations")
+    table.add_column("Time", no_wrap=True)
+    table.add_column("Command", style="cyan", no_wrap=True)
+    table.add_column("Device", no_wrap=True)
+    table.add_column("Version", style="green", no_wrap=True)
+    table.add_column("Outcome", no_wrap=True)
+    table.add_column("Duration", justify="right", no_wrap=True)
+    table.add_column("Phases", no_wrap=True)
+    for record in records:
+        outcome = record['outcome'] if record['outcome'] == 'ok' else f"[red]{record['outcome']}[/red]"
+        table.add_row(record['time'], record['command'], record['serial'], record['version'] or "", outcome,
+                      f"{record['duration_ms']:.0f} ms", record['phases'].replace(' ', '\n'))
+    get_console().print(table)
+
+
+@history_app.command("stats")
+def history_stats(
+    serial: Optional[str] = typer.Option(None, "--serial", "-s", help="Only operations on this device"),
+    command: Optional[str] = typer.Option(None, "--command", "-c", help="Only this command (install, run, kill)"),
+    since: Optional[float] = typer.Option(None, "--since", help="Only the last N days"),
+    interval: Optional[str] = typer.Option(None, "--interval", "-i", help="Split into periods to show trends: hour, day or week"),
+    all_devices: bool = typer.Option(False, "--all-devices", "-a", help="Combine all devices instead of one row per device"),
+    output: OutputFormat = output_option()
+):
+    """Show p50/p95/p99 latency per phase and device"""
+    from fsm import history
+
+    machine = output != OutputFormat.table
+    if interval and interval not in history.INTERVALS:
+        (print_machine_error if machine else print_error)(f"--interval must be one of: {', '.join(history.INTERVALS)}")
+        raise typer.Exit(1)
+    try:
+        records = history.stats(serial, command, since, interval, not all_devices)
+    except Exception as e:
+        (print_machine_error if machine else print_error)(f"Error reading the history: {e}")
+        raise typer.Exit(1)
+
+    if machine:
+        from fsm.output import write_records
+        write_records(records, output, HISTORY_STATS_FIELDS)
+        return
+    if not records:
+        print_info("No operations recorded yet")
+        return
+
+    from rich.table import Table
+    table = Table(title="Operation latency (ms)")
+    if interval:
+        table.add_column("Period", no_wrap=True)
+    table.add_column("Device", no_wrap=True)
+    table.add_column("Command", style="cyan", no_wrap=True)
+    table.add_column("Phase", style="green", no_wrap=True)
+    for column in ("Count", "p50", "p95", "p99", "Max"):
+        table.add_column(column, justify="right", no_wrap=True)
+    for record in records:
+        row = [record['serial'], record['command'], record['phase'], str(record['count'])]
+        row += [f"{record[key]:.0f}" for key in ('p50_ms', 'p95_ms', 'p99_ms', 'max_ms')]
+        table.add_row(*([record['period']] if interval else []) + row)
+    get_console().print(table)
+
+
+daemon_app = typer.Typer(help="Optional background daemon that keeps device sessions warm between commands")
+app.add_typer(daemon_app, name="daemon")
+
+
+@daemon_app.command("start")
+def daemon_start(
+    detach: bool = typer.Option(False, "--detach", "-d", help="Run the daemon in the background")
+):
+    """Start the daemon; list, ps, run, kill and install then go through it"""
+    from fsm import daemon
+
+    status = daemon.ping()
+    if status:
+        print_warning(f"fsm daemon is already running (pid {status['pid']})")
+        return
+
+    if detach:
+        import subprocess
+        import time
+        from fsm.core import get_cache_dir
+
+        log_path = os.path.join(get_cache_dir(), 'daemon.log')
+        with open(log_path, 'ab') as log:
+            subprocess.Popen([sys.executable, '-m', 'fsm', 'daemon', 'start'], stdin=subprocess.DEVNULL,
+                             stdout=log, stderr=subprocess.STDOUT, start_new_session=True)
+        # Wait until the socket accepts requests
+        deadline = time.monotonic() + 5
+        while not status and time.monotonic() < deadline:
+            time.sleep(0.05)
+            status = daemon.ping()
+        if not status:
+            print_error(f"fsm daemon did not start, see {log_path}")
+            raise typer.Exit(1)
+        print_success(f"fsm daemon started (pid {status['pid']})")
+        return
+
+    # Plain echo: rich output printed now would fix the console's colours for captured requests too
+    typer.echo(f"fsm daemon listening on {daemon.get_socket_path()} (pid {os.getpid()})")
+    try:
+        daemon.serve()
+    except KeyboardInterrupt:
+        pass
+    except RuntimeError as e:
+        print_error(str(e))
+        raise typer.Exit(1)
+
+
+@daemon_app.command("stop")
+def daemon_stop():
+    """Stop the running daemon"""
+    from fsm import daemon
+
+    if daemon.stop():
+        print_success("fsm daemon stopped")
+    else:
+        print_warning("No fsm daemon is running")
+
+
+@daemon_app.command("status")
+def daemon_status():
+    """Show whether the daemon is running (exit code 1 if not)"""
+    from fsm import daemon
+
+    status = daemon.ping()
+    if not status:
+        print_warning("No fsm daemon is running")
+        raise typer.Exit(1)
+    sessions = ', '.join(serial if serial != 'None' else 'default' for serial in status['sessions']) or 'none'
+    print_success(f"fsm daemon is running (pid {status['pid']})")
+    print_info(f"Socket: {daemon.get_socket_path()}")
+    print_info(f"Uptime: {status['uptime']:.0f}s, requests served: {status['requests']}, sessions: {sessions}")
+
+
 @app.callback(invoke_without_command=True)
 def main(
     ctx: typer.Context,
+    timeout: Optional[float] = typer.Option(None, "--timeout", envvar="FSM_TIMEOUT", help="Give up on the command after this many seconds, killing the adb processes it started"),
+    retries: Optional[int] = typer.Option(None, "--retries", envvar="FSM_RETRIES", help="Retries of idempotent device queries (ls, ps, getprop) after transient adb errors (default: 2)"),
+    record: Optional[str] = typer.Option(None, "--record", envvar="FSM_RECORD", help="Record every adb command and HTTP response to this cassette file (.gz to compress)"),
+    replay: Optional[str] = typer.Option(None, "--replay", envvar="FSM_REPLAY", help="Serve adb commands and HTTP responses from this cassette file instead of the device and network"),
+    replay_speed: Optional[float] = typer.Option(None, "--replay-speed", envvar="FSM_REPLAY_SPEED", help="Scale the recorded durations when replaying (1: as recorded, 0: no waiting)"),
     verbose: bool = typer.Option(False, "--verbose", "-v", help="Enable verbose output")
 ):
     """
@@ -426,9 +1142,22 @@ def main(
 
     When called without a command, checks ADB connection.
     """
+    if retries is not None:
+        # Read by every Device session created for this command
+        os.environ["FSM_RETRIES"] = str(retries)
+    if timeout is not None:
+        from fsm.deadline import deadline
+        ctx.with_resource(deadline(timeout))
+    if record and replay:
+        print_error("--record and --replay cannot be combined")
+        raise typer.Exit(1)
+    # Read by fsm.cassette whenever a command or HTTP request is made
+    for name, value in (("FSM_RECORD", record), ("FSM_REPLAY", replay), ("FSM_REPLAY_SPEED", replay_speed)):
+        if value is not None:
+            os.environ[name] = str(value)
     if ctx.invoked_subcommand is None:
         # No command provided, check ADB connection
-        check(verbose)
+        check(verbose, OutputFormat.table)
 
 
 if __name__ == "__main__":
@@ -1,45 +1,221 @@
 import sys
 import os
-import urllib.request
-import json
-import lzma
-import tempfile
-import shutil
-from pathlib import Path
 import subprocess
+import time
 from rich import print as rich_print
 
+# urllib.request, json, lzma and tempfile are imported where they are used so
+# that commands which never download anything don't pay for them at startup.
+
 # GitHub API URL for Frida releases
 GITHUB_RELEASES_URL = "https://api.github.com/repos/frida/frida/releases"
 DEFAULT_INSTALL_DIR = '/data/local/tmp'
+# How long `run --switch` waits for the old server to exit and the new one to appear, and how often it looks
+SWITCH_TIMEOUT = 5.0
+SWITCH_POLL_INTERVAL = 0.02
+# How long plain `run` waits for the stopped servers to exit and the new one to appear, and how often it asks adb
+RUN_TIMEOUT = 5.0
+RUN_POLL_INTERVAL = 0.25
+# Extracted release binaries kept in the download cache
+DOWNLOAD_CACHE_ENTRIES = 8
 
 
-def run_command(cmd, verbose=False, return_error=False):
-    """Run a shell command and return the output"""
-    if verbose:
-        rich_print(f"Running command: {cmd}")
+def get_cache_dir():
+    """Return fsm's cache directory ($FSM_CACHE_DIR, else $XDG_CACHE_HOME/fsm or ~/.cache/fsm), creating it"""
+    cache_dir = os.environ.get('FSM_CACHE_DIR')
+    if not cache_dir:
+        base = os.environ.get('XDG_CACHE_HOME') or os.path.join(os.path.expanduser('~'), '.cache')
+        cache_dir = os.path.join(base, 'fsm')
+    os.makedirs(cache_dir, exist_ok=True)
+    return cache_dir
+
+
+# stderr of adb failures worth retrying: the device dropped off USB or the transport is not ready yet
+ADB_TRANSIENT_ERRORS = ('device offline', 'error: closed', 'protocol fault', 'connection reset',
+                        'device still authorizing', 'device still connecting')
+
+
+def _kill_process_group(process):
+    import signal
+    try:
+        os.killpg(process.pid, signal.SIGKILL)
+    except (ProcessLookupError, PermissionError, AttributeError):
+        process.kill()
+
+
+def _communicate(cmd, timeout):
+    """Run cmd, or replay it from the active fsm.cassette; return (returncode, stdout, stderr)"""
+    from fsm import cassette
+
+    tape = cassette.current()
+    if tape is not None:
+        return tape.command(cmd, lambda: _run_process(cmd, timeout))
+    return _run_process(cmd, timeout)
+
+
+def _run_process(cmd, timeout):
+    """Run cmd in a session of its own; return (returncode, stdout, stderr), killing it all on timeout"""
+    from fsm.errors import CommandTimeoutError
 
+    if timeout is not None and timeout <= 0:
+        raise CommandTimeoutError(cmd, 0)
+    process = subprocess.Popen(cmd, shell=True, stdout=subprocess.PIPE, stderr=subprocess.PIPE,
+                               text=True, start_new_session=True)
     try:
-        result = subprocess.run(cmd, shell=True, check=True,
-            stdout=subprocess.PIPE, stderr=subprocess.PIPE,
-            text=True)
+        stdout, stderr = process.communicate(timeout=timeout)
+    except subprocess.TimeoutExpired:
+        # adb, su and anything else the shell started go down together
+        _kill_process_group(process)
+        process.communicate()
+        raise CommandTimeoutError(cmd, timeout)
+    except BaseException:
+        _kill_process_group(process)
+        process.wait()
+        raise
+    return process.returncode, stdout, stderr
+
+
+def run_command(cmd, verbose=False, return_error=False, timeout=None, retries=0):
+    """Run a shell command and return the output
+
+    The command gets at most timeout seconds, capped by the current
+    fsm.deadline, and raises CommandTimeoutError when it runs out. Only
+    idempotent commands should pass retries: they are run again after a
+    transient adb error or a timeout, with jittered backoff, while the
+    deadline allows.
+    """
+    from fsm import deadline
+    from fsm.errors import CommandTimeoutError
+
+    if verbose:
+        rich_print(f"Running command: {cmd}")
 
-        if return_error:
+    delays = deadline.backoff_delays(retries)
+    while True:
+        try:
+            returncode, stdout, stderr = _communicate(cmd, deadline.timeout_for(timeout))
+        except CommandTimeoutError:
+            delay = next(delays, None)
+            if delay is None or deadline.timeout_for() == 0:
+                raise
             if verbose:
-                rich_print(f"Command output: {result.stderr}")
-            return result.stderr
-        else:
+                rich_print(f"Command timed out, retrying in {delay:.2f}s")
+            time.sleep(min(delay, deadline.timeout_for(delay)))
+            continue
+
+        if returncode == 0:
+            break
+        transient = any(error in stderr for error in ADB_TRANSIENT_ERRORS)
+        delay = next(delays, None) if transient else None
+        if delay is None or deadline.timeout_for() == 0:
             if verbose:
-                rich_print(f"Command output: {result.stdout}")
-            return result.stdout
-    except subprocess.CalledProcessError as e:
+                rich_print(f"Command failed: {stderr}")
+            return None
         if verbose:
-            rich_print(f"Command failed: {e.stderr}")
-        return None
+            rich_print(f"Command failed: {stderr.strip()}, retrying in {delay:.2f}s")
+        time.sleep(min(delay, deadline.timeout_for(delay)))
 
+    if return_error:
+        if verbose:
+            rich_print(f"Command output: {stderr}")
+        return stderr
+    else:
+        if verbose:
+            rich_print(f"Command output: {stdout}")
+        return stdout
 
-def check_adb_connection(verbose=False):
-    """Check if ADB is connected to any device"""
+
+def iter_command_lines(cmd, verbose=False, timeout=None):
+    """Run a shell command and yield its output line by line as it is produced
+
+    Like run_command(), the command is killed when timeout or the current
+    fsm.deadline runs out, and CommandTimeoutError is raised.
+    """
+    from fsm import cassette
+
+    if verbose:
+        rich_print(f"Running command: {cmd}")
+
+    tape = cassette.current()
+    if tape is not None:
+        yield from tape.lines(cmd, lambda: _iter_process_lines(cmd, timeout))
+    else:
+        yield from _iter_process_lines(cmd, timeout)
+
+
+def _iter_process_lines(cmd, timeout):
+    import threading
+    from fsm import deadline
+    from fsm.errors import CommandTimeoutError
+
+    limit = deadline.timeout_for(timeout)
+    if limit is not None and limit <= 0:
+        raise CommandTimeoutError(cmd, 0)
+    process = subprocess.Popen(cmd, shell=True, stdout=subprocess.PIPE, stderr=subprocess.DEVNULL, text=True,
+                               start_new_session=True)
+    expired = threading.Event()
+
+    def expire():
+        expired.set()
+        _kill_process_group(process)
+
+    timer = None
+    if limit is not None:
+        timer = threading.Timer(limit, expire)
+        timer.daemon = True
+        timer.start()
+    try:
+        for line in process.stdout:
+            yield line.rstrip('\n')
+    finally:
+        if timer:
+            timer.cancel()
+        process.stdout.close()
+        if process.poll() is None:
+            _kill_process_group(process)
+        process.wait()
+    if expired.is_set():
+        raise CommandTimeoutError(cmd, limit)
+
+
+def list_devices(verbose=False):
+    """Return (serial, status) pairs from `adb devices`, or None if adb is not available"""
+    output = run_command('adb devices', verbose)
+    if output is None:
+        return None
+
+    devices = []
+    for line in output.splitlines():
+        if 'device' in line and not line.startswith('List of'):
+            parts = line.strip().split()
+            if len(parts) >= 2:
+                devices.append((parts[0], parts[1]))
+    return devices
+
+
+def iter_devices(verbose=False, devices=None):
+    """Yield a dict (serial, model, status) for each connected device"""
+    if devices is None:
+        devices = list_devices(verbose) or []
+    for serial, status in devices:
+        model_output = run_command(f"adb -s {serial} shell getprop ro.product.model", verbose)
+        yield {
+            'serial': serial,
+            'model': model_output.strip() if model_output else "Unknown",
+            'status': status
+        }
+
+
+def get_device(device=None, verbose=False):
+    """Return the given Device session, or a fresh one for the default device"""
+    if device is None:
+        from fsm.device import Device
+        device = Device(verbose=verbose)
+    return device
+
+
+def check_adb_connection(verbose=False, serial=None):
+    """Check if ADB is connected to any device (or to the given serial)"""
     rich_print("Checking ADB connection...")
     output = run_command('adb devices', verbose)
 
@@ -54,6 +230,10 @@ def check_adb_connection(verbose=False):
         rich_print("Error: No devices connected via ADB")
         sys.exit(1)
 
+    if serial and not any(line.split()[0] == serial for line in devices if line.split()):
+        rich_print(f"Error: Device {serial} is not connected via ADB")
+        sys.exit(1)
+
     rich_print(f"Success: {len(devices)} device(s) connected")
     if verbose:
         for device in devices:
@@ -65,19 +245,17 @@ def get_latest_frida_version(repo="frida/frida", verbose=False, proxy=None):
     if verbose:
         rich_print(f"Fetching latest version from GitHub repository: {repo}")
 
+    import json
+    from fsm.http import open_url
+    from fsm.index import get_api_url
+
     try:
-        url = f"https://api.github.com/repos/{repo}/releases/latest"
-        
-        # Create opener with proxy if provided
-        if proxy:
-            if verbose:
-                rich_print(f"Using proxy: {proxy}")
-            proxy_handler = urllib.request.ProxyHandler({'https': proxy, 'http': proxy})
-            opener = urllib.request.build_opener(proxy_handler)
-            urllib.request.install_opener(opener)
-        
+        url = f"{get_api_url()}/repos/{repo}/releases/latest"
+        if proxy and verbose:
+            rich_print(f"Using proxy: {proxy}")
+
         # Set a timeout for the request
-        with urllib.request.urlopen(url, timeout=10) as response:
+        with open_url(url, proxy, timeout=10) as response:
             # Check if the request was successful
             if response.status != 200:
                 raise Exception(f"HTTP error {response.status}")
@@ -93,30 +271,33 @@ def get_latest_frida_version(repo="frida/frida", verbose=False, proxy=None):
         return None
 
 
-def get_frida_server_arch(verbose=False):
+def map_frida_arch(abi):
+    """Map an Android ABI (ro.product.cpu.abi) to a frida-server architecture, or None"""
+    if 'arm64' in abi:
+        return "android-arm64"
+    elif 'armeabi' in abi:
+        return "android-arm"
+    elif 'x86_64' in abi:
+        return "android-x86_64"
+    elif 'x86' in abi:
+        return "android-x86"
+    return None
+
+
+def get_frida_server_arch(verbose=False, device=None):
     """Determine the architecture of the Android device for frida-server"""
     if verbose:
         rich_print("Determining Android device architecture...")
 
-    # Get the architecture info from the device
-    arch_info = run_command("adb shell getprop ro.product.cpu.abi", verbose)
+    # Get the architecture info from the device (cached by the session)
+    arch_info = get_device(device, verbose).abi
 
     if not arch_info:
         rich_print("Error: Could not determine device architecture")
         sys.exit(1)
 
-    arch_info = arch_info.strip()
-
-    # Map Android architecture to frida-server architecture
-    if 'arm64' in arch_info:
-        frida_arch = "android-arm64"
-    elif 'armeabi' in arch_info:
-        frida_arch = "android-arm"
-    elif 'x86_64' in arch_info:
-        frida_arch = "android-x86_64"
-    elif 'x86' in arch_info:
-        frida_arch = "android-x86"
-    else:
+    frida_arch = map_frida_arch(arch_info)
+    if not frida_arch:
         rich_print(f"Error: Unsupported architecture: {arch_info}")
         sys.exit(1)
 
@@ -126,62 +307,126 @@ def get_frida_server_arch(verbose=False):
     return frida_arch
 
 
-def download_frida_server(version=None, repo="frida/frida", verbose=False, url=None, proxy=None):
-    """Download frida-server for Android using temporary files"""
-    # Get the latest version if not specified and no URL provided
-    if not url and not version:
-        version = get_latest_frida_version(repo, verbose, proxy)
-        if not version:
-            rich_print("Error: Could not determine the latest version")
-            sys.exit(1)
+def get_download_cache_path(download_url):
+    """Return the path the extracted frida-server from download_url is cached at"""
+    import hashlib
+    cache_dir = os.path.join(get_cache_dir(), 'downloads')
+    os.makedirs(cache_dir, exist_ok=True)
+    name = download_url.rsplit('/', 1)[-1]
+    for extension in ('.tar.gz', '.xz', '.gz'):
+        if name.endswith(extension):
+            name = name[:-len(extension)]
+            break
+    return os.path.join(cache_dir, f"{hashlib.sha256(download_url.encode()).hexdigest()[:16]}-{name}")
+
+
+def prune_download_cache(keep=DOWNLOAD_CACHE_ENTRIES):
+    """Delete all but the keep most recently used cached downloads, skipping ones in use"""
+    from fsm.lock import file_lock, get_lock_path
+    cache_dir = os.path.join(get_cache_dir(), 'downloads')
+    paths = sorted((os.path.join(cache_dir, name) for name in os.listdir(cache_dir) if not name.startswith('.')),
+                   key=os.path.getmtime, reverse=True)
+    for path in paths[keep:]:
+        try:
+            with file_lock(get_lock_path(f"download-{os.path.basename(path)}"), timeout=0):
+                os.unlink(path)
+        except (TimeoutError, OSError):
+            pass
+
+
+def fetch_frida_server(download_url, filename, verbose=False, proxy=None, mirrors=None, cache=False):
+    """Download and extract a frida-server archive into a temporary executable file (raises on failure)
+
+    With mirrors (see fsm.mirrors), download_url is raced against the same
+    asset on each mirror and the fastest one is used. With cache, the
+    extracted binary is kept in the download cache: concurrent fsm processes
+    fetching the same URL wait for the one download in flight instead of
+    starting their own, and later fetches are served from the cache.
+    """
+    if not cache:
+        return _download_frida_server(download_url, filename, verbose, proxy, mirrors)
+
+    import shutil
+    import tempfile
+    from fsm.deadline import timeout_for
+    from fsm.lock import atomic_path, file_lock, get_lock_path
+
+    cached_path = get_download_cache_path(download_url)
+    downloaded = False
+    with file_lock(get_lock_path(f"download-{os.path.basename(cached_path)}"), timeout=timeout_for(None)):
+        if os.path.exists(cached_path):
+            if verbose:
+                rich_print(f"Using cached download {cached_path}")
+            os.utime(cached_path)
+        else:
+            local_path = _download_frida_server(download_url, filename, verbose, proxy, mirrors)
+            try:
+                with atomic_path(cached_path) as tmp_path:
+                    shutil.copyfile(local_path, tmp_path)
+                    os.chmod(tmp_path, 0o755)
+            finally:
+                os.unlink(local_path)
+            downloaded = True
+
+        # Callers own (and delete) the returned file, so hand out a private copy
+        final_temp = tempfile.NamedTemporaryFile(delete=False)
+        final_temp.close()
+        shutil.copyfile(cached_path, final_temp.name)
+        os.chmod(final_temp.name, 0o755)
+    if downloaded:
+        prune_download_cache()
+    return final_temp.name
 
-    # Determine the architecture if not using URL
-    if not url:
-        frida_arch = get_frida_server_arch(verbose)
-        download_url = f"https://github.com/{repo}/releases/download/{version}/frida-server-{version}-{frida_arch}.xz"
-    else:
-        download_url = url
 
+def _download_frida_server(download_url, filename, verbose=False, proxy=None, mirrors=None):
     if verbose:
         rich_print(f"Downloading from {download_url}")
 
-    try:
-        # Download the compressed file
-        # Set headers to mimic a browser to avoid GitHub API rate limiting
-        req = urllib.request.Request(download_url, headers={
-            'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36'
-        })
-
-        # Use tempfile to handle temporary files
-        # Create a temporary directory for our files
-        with tempfile.TemporaryDirectory() as temp_dir:
-            temp_path = Path(temp_dir)
-            
-            # Determine filename based on URL
-            if url:
-                filename = download_url.split('/')[-1]
-            else:
-                filename = f"frida-server-{version}-{frida_arch}.xz"
-            
-            # Path for compressed file
-            compressed_file = temp_path / filename
-            
-            # Save the downloaded content
-            # For large files, we'll read in chunks to avoid memory issues
-            
-            # Create opener with proxy if provided
-            if proxy:
-                if verbose:
-                    rich_print(f"Using proxy: {proxy}")
-                proxy_handler = urllib.request.ProxyHandler({'https': proxy, 'http': proxy})
-                opener = urllib.request.build_opener(proxy_handler)
-                urllib.request.install_opener(opener)
-            
-            with urllib.request.urlopen(req, timeout=30) as response:
+    import lzma
+    import shutil
+    import tempfile
+    from pathlib import Path
+    from fsm.http import open_url
+
+    # Use tempfile to handle temporary files
+    # Create a temporary directory for our files
+    with tempfile.TemporaryDirectory() as temp_dir:
+        temp_path = Path(temp_dir)
+        
+        # Path for compressed file
+        compressed_file = temp_path / filename
+        
+        # Save the downloaded content
+        # For large files, we'll read in chunks to avoid memory issues
+        
+        if proxy and verbose:
+            rich_print(f"Using proxy: {proxy}")
+
+        candidates = {}
+        if mirrors:
+            from fsm import mirrors as mirror_pool
+            candidates = {download_url: mirror_pool.origin(download_url)}
+            for mirror in mirrors:
+                candidates.setdefault(mirror_pool.mirror_url(mirror, download_url), mirror)
+
+        if len(candidates) > 1:
+            attempt = mirror_pool.race([(mirror, url) for url, mirror in candidates.items()], proxy, verbose)
+            if verbose:
+                rich_print(f"Downloading from {attempt.url}")
+            with attempt.response as response, open(compressed_file, 'wb') as f:
+                f.write(attempt.head)
+                while True:
+                    chunk = response.read(8192)
+                    if not chunk:
+                        break
+                    f.write(chunk)
+        else:
+            # open_url sends a browser User-Agent to avoid GitHub API rate limiting
+            with open_url(download_url, proxy, timeout=30) as response:
                 # Check if the request was successful
                 if response.status != 200:
                     raise Exception(f"HTTP error {response.status}")
-                
+
                 with open(compressed_file, 'wb') as f:
                     while True:
                         chunk = response.read(8192)
@@ -189,77 +434,142 @@ def download_frida_server(version=None, repo="frida/frida", verbose=False, url=N
                             break
                         f.write(chunk)
 
-            if verbose:
-                rich_print(f"Download completed: {compressed_file}")
+        if verbose:
+            rich_print(f"Download completed: {compressed_file}")
 
-            # Determine file extension and use appropriate extraction method
-            file_extension = compressed_file.suffix.lower()
-            
-            # Create a temporary file for the extracted content
-            # We need to close it here and reopen because we need to change its permissions
-            extracted_temp = tempfile.NamedTemporaryFile(delete=False, dir=temp_dir)
-            extracted_temp.close()
-            extracted_file = Path(extracted_temp.name)
-            
-            if verbose:
-                rich_print(f"Extracting to {extracted_file}")
-
-            if file_extension == '.xz':
-                # Extract .xz file
-                with lzma.open(compressed_file, 'rb') as f_in:
-                    with open(extracted_file, 'wb') as f_out:
-                        f_out.write(f_in.read())
-            elif file_extension == '.gz':
-                # Extract .gz file
-                import gzip
-                with gzip.open(compressed_file, 'rb') as f_in:
-                    with open(extracted_file, 'wb') as f_out:
-                        f_out.write(f_in.read())
-            elif file_extension == '.tar' and str(compressed_file).endswith('.tar.gz'):
-                # Extract .tar.gz file
-                import tarfile
-                with tarfile.open(compressed_file, 'r:gz') as tar:
-                    # Find the first executable file in the tar archive
-                    for member in tar.getmembers():
-                        if member.isfile():
-                            # Extract to our temporary file
-                            tar.extract(member, temp_dir)
-                            # Move the extracted file to our named temporary file
-                            os.rename(temp_path / member.name, extracted_file)
-                            break
-            else:
-                # If it's not a recognized compressed format, assume it's already extracted
-                # Just copy the file
-                import shutil
-                shutil.copy2(compressed_file, extracted_file)
+        # Determine file extension and use appropriate extraction method
+        file_extension = compressed_file.suffix.lower()
+        
+        # Create a temporary file for the extracted content
+        # We need to close it here and reopen because we need to change its permissions
+        extracted_temp = tempfile.NamedTemporaryFile(delete=False, dir=temp_dir)
+        extracted_temp.close()
+        extracted_file = Path(extracted_temp.name)
+        
+        if verbose:
+            rich_print(f"Extracting to {extracted_file}")
+
+        if file_extension == '.xz':
+            # Extract .xz file
+            with lzma.open(compressed_file, 'rb') as f_in:
+                with open(extracted_file, 'wb') as f_out:
+                    f_out.write(f_in.read())
+        elif file_extension == '.gz':
+            # Extract .gz file
+            import gzip
+            with gzip.open(compressed_file, 'rb') as f_in:
+                with open(extracted_file, 'wb') as f_out:
+                    f_out.write(f_in.read())
+        elif file_extension == '.tar' and str(compressed_file).endswith('.tar.gz'):
+            # Extract .tar.gz file
+            import tarfile
+            with tarfile.open(compressed_file, 'r:gz') as tar:
+                # Find the first executable file in the tar archive
+                for member in tar.getmembers():
+                    if member.isfile():
+                        # Extract to our temporary file
+                        tar.extract(member, temp_dir)
+                        # Move the extracted file to our named temporary file
+                        os.rename(temp_path / member.name, extracted_file)
+                        break
+        else:
+            # If it's not a recognized compressed format, assume it's already extracted
+            # Just copy the file
+            shutil.copy2(compressed_file, extracted_file)
 
-            if verbose:
-                rich_print(f"Extraction completed: {extracted_file}")
+        if verbose:
+            rich_print(f"Extraction completed: {extracted_file}")
 
-            # Make the extracted file executable
-            os.chmod(extracted_file, 0o755)
-            if verbose:
-                rich_print(f"Made the file executable")
-
-            # The temporary directory will be automatically deleted when exiting the context manager
-            # But we need to return the path to the extracted file which will be deleted
-            # So we need to create a final temporary file outside the context manager
-            # to return to the caller
-            final_temp = tempfile.NamedTemporaryFile(delete=False)
-            final_temp.close()
-            
-            # Copy the extracted file to the final temporary file
-            import shutil
-            shutil.copy2(extracted_file, final_temp.name)
-            os.chmod(final_temp.name, 0o755)
-            
-            if verbose:
-                rich_print(f"Created final temporary file: {final_temp.name}")
-            
-            # Return the path to the final temporary file
-            # The caller is responsible for deleting this file when done
-            return final_temp.name
-            
+        # Make the extracted file executable
+        os.chmod(extracted_file, 0o755)
+        if verbose:
+            rich_print(f"Made the file executable")
+
+        # The temporary directory will be automatically deleted when exiting the context manager
+        # But we need to return the path to the extracted file which will be deleted
+        # So we need to create a final temporary file outside the context manager
+        # to return to the caller
+        final_temp = tempfile.NamedTemporaryFile(delete=False)
+        final_temp.close()
+        
+        # Copy the extracted file to the final temporary file
+        shutil.copy2(extracted_file, final_temp.name)
+        os.chmod(final_temp.name, 0o755)
+        
+        if verbose:
+            rich_print(f"Created final temporary file: {final_temp.name}")
+        
+        # Return the path to the final temporary file
+        # The caller is responsible for deleting this file when done
+        return final_temp.name
+
+
+def resolve_release_asset(repo, version, frida_arch, verbose=False, proxy=None):
+    """Return (download_url, filename) of the frida-server asset for version and arch in repo's releases
+
+    Callers validate the device ABI first (get_frida_server_arch()); a missing arch raises ValueError.
+    """
+    from fsm import index
+
+    if not frida_arch:
+        raise ValueError(f"No frida-server architecture given for {repo} {version}")
+
+    # Look the asset up in the local release index, syncing it once if the release is not known yet
+    asset = None
+    try:
+        asset = index.resolve_asset(repo, version, frida_arch)
+        if asset is None:
+            index.sync_repo(repo, verbose, proxy)
+            asset = index.resolve_asset(repo, version, frida_arch)
+    except Exception as e:
+        if verbose:
+            rich_print(f"Release index unavailable: {e}")
+
+    if asset:
+        if verbose:
+            rich_print(f"Resolved {asset['asset']} from the release index")
+        return asset['url'], asset['asset']
+
+    # Not indexed (offline, or the release lists no matching asset): fall back to frida's naming scheme
+    if verbose:
+        rich_print(f"No indexed asset for {repo} {version} {frida_arch}, using the default asset name")
+    filename = f"frida-server-{version}-{frida_arch}.xz"
+    return f"https://github.com/{repo}/releases/download/{version}/{filename}", filename
+
+
+def download_frida_server(version=None, repo="frida/frida", verbose=False, url=None, proxy=None, device=None,
+                          mirrors=None, asset=None):
+    """Download frida-server for Android using temporary files
+
+    asset is the (download_url, filename) of the release asset when the
+    caller already resolved it; the version lookup and ABI probe are skipped then.
+    """
+    # Get the latest version if not specified and no URL provided
+    if not url and not asset and not version:
+        version = get_latest_frida_version(repo, verbose, proxy)
+        if not version:
+            rich_print("Error: Could not determine the latest version")
+            sys.exit(1)
+
+    # Determine the architecture and the release asset if not using URL
+    if asset:
+        download_url, filename = asset
+    elif not url:
+        frida_arch = get_frida_server_arch(verbose, device)
+        download_url, filename = resolve_release_asset(repo, version, frida_arch, verbose, proxy)
+    else:
+        download_url = url
+        filename = download_url.split('/')[-1]
+
+    try:
+        # Release assets may come from a mirror and are cached; an explicit --url is always fetched as given
+        from fsm import history
+        from fsm.mirrors import configured_mirrors
+        history.enter('download')
+        local_path = fetch_frida_server(download_url, filename, verbose, proxy,
+                                        None if url else configured_mirrors(mirrors), cache=not url)
+        history.add_bytes(os.path.getsize(local_path))
+        return local_path
     except Exception as e:
         if verbose:
             rich_print(f"Error downloading frida-server: {e}")
@@ -268,42 +578,148 @@ def download_frida_server(version=None, repo="frida/frida", verbose=False, url=N
         raise Exception(error_msg)
 
 
-def install_frida_server(version=None, verbose=False, repo="frida/frida", keep_name=False, custom_name=None, url=None, proxy=None):
+def get_temp_path(remote_path):
+    """Return the hidden device path a file for remote_path is pushed to before being renamed into place"""
+    directory, _, name = remote_path.rpartition('/')
+    return f"{directory}/.{name}.fsm-tmp"
+
+
+def resolve_remote_path(version=None, keep_name=False, custom_name=None, url=None, install_dir=DEFAULT_INSTALL_DIR):
+    """Return the device path a frida-server download should be installed to"""
+    if version and not keep_name and not custom_name:
+        remote_path = f"{install_dir}/frida-server-{version}"
+    elif custom_name:
+        remote_path = f"{install_dir}/{custom_name}"
+    elif url and keep_name:
+        # Use original filename from URL when --keep-name is specified
+        original_filename = url.split('/')[-1]
+        # Remove file extension if it's a compressed file
+        if original_filename.endswith('.xz') or original_filename.endswith('.gz') or original_filename.endswith('.tar.gz'):
+            original_filename = original_filename.split('.')[0]  # Remove the first extension
+            # If it still has .tar extension, remove that too
+            if original_filename.endswith('.tar'):
+                original_filename = original_filename[:-4]
+        remote_path = f"{install_dir}/{original_filename}"
+    else:
+        remote_path = f"{install_dir}/frida-server"
+    return remote_path
+
+
+def install_frida_server(version=None, verbose=False, repo="frida/frida", keep_name=False, custom_name=None, url=None, proxy=None, device=None,
+                         mirrors=None, install_dir=DEFAULT_INSTALL_DIR):
     """Install frida-server on the Android device"""
-    # Download frida-server
+    from fsm import history
+
+    device = get_device(device, verbose)
+    with history.operation('install', device.serial, version):
+        return _install_frida_server(version, verbose, repo, keep_name, custom_name, url, proxy, device, mirrors,
+                                     install_dir)
+
+
+def _submit(pool, function, *args):
+    """Submit function to an executor in a copy of the current context, so fsm.deadline and fsm.history apply"""
+    import contextvars
+    return pool.submit(contextvars.copy_context().run, function, *args)
+
+
+def _install_frida_server(version, verbose, repo, keep_name, custom_name, url, proxy, device, mirrors, install_dir):
+    from concurrent.futures import ThreadPoolExecutor
+    from fsm import history, manifest, store
+
+    # Discovery: the adb connection check, latest-version lookup, ABI probe and the check of the
+    # target directory's store are independent round trips, so they run concurrently; each is
+    # timed on its own and the time saved is recorded as the 'overlap' phase
+    history.enter('discovery')
     local_path = None
     try:
-        local_path = download_frida_server(version, repo, verbose, url, proxy)
-
-        # Determine the remote path
-        if version and not keep_name and not custom_name:
-            remote_path = f"{DEFAULT_INSTALL_DIR}/frida-server-{version}"
-        elif custom_name:
-            remote_path = f"{DEFAULT_INSTALL_DIR}/{custom_name}"
-        elif url and keep_name:
-            # Use original filename from URL when --keep-name is specified
-            original_filename = url.split('/')[-1]
-            # Remove file extension if it's a compressed file
-            if original_filename.endswith('.xz') or original_filename.endswith('.gz') or original_filename.endswith('.tar.gz'):
-                original_filename = original_filename.split('.')[0]  # Remove the first extension
-                # If it still has .tar extension, remove that too
-                if original_filename.endswith('.tar'):
-                    original_filename = original_filename[:-4]
-            remote_path = f"{DEFAULT_INSTALL_DIR}/{original_filename}"
+        remote_path = resolve_remote_path(version, keep_name, custom_name, url, install_dir)
+        server_dir = os.path.dirname(remote_path)
+        timings = {}
+
+        def timed(phase, function, *args):
+            start = time.monotonic()
+            try:
+                return function(*args)
+            finally:
+                timings[phase] = time.monotonic() - start
+
+        def after_connect(phase, function, *args):
+            connected.result()
+            return timed(phase, function, *args)
+
+        started = time.monotonic()
+        with ThreadPoolExecutor(max_workers=4) as pool:
+            connected = _submit(pool, timed, 'connect', device.ensure_connected)
+            # Resolve "latest" here so the manifest can record which release was installed
+            latest = _submit(pool, timed, 'version', get_latest_frida_version, repo, verbose, proxy) \
+                if not url and not version else None
+            # get_frida_server_arch() exits on an ABI frida has no build for, before anything is resolved
+            arch = None if url else _submit(pool, after_connect, 'arch', get_frida_server_arch, verbose, device)
+            lookup = _submit(pool, after_connect, 'lookup', store.lookup, server_dir, device)
+
+            release_version = latest.result() if latest else version
+            if not url and not release_version:
+                rich_print("Error: Could not determine the latest version")
+                sys.exit(1)
+            history.annotate(version=release_version)
+            if url:
+                source, arch, asset = url, None, None
+            else:
+                # The asset is resolved as soon as the version and the ABI are known; the store check
+                # runs alongside the ABI probe, so the download seldom waits for it
+                arch = arch.result()
+                asset = timed('resolve', resolve_release_asset, repo, release_version, arch, verbose, proxy)
+                source = asset[0]
+            entries, blobs = lookup.result()
+        for phase, seconds in timings.items():
+            history.add_phase(phase, seconds)
+        history.add_phase('overlap', max(0.0, sum(timings.values()) - (time.monotonic() - started)))
+
+        # A release already in the device's store (installed under another name) is only linked
+        entry = store.find_stored(entries, blobs, source)
+        if entry:
+            entry = store.alias_entry(entry, remote_path)
+            if verbose:
+                rich_print(f"{source} is already on the device, linking it as {remote_path}")
         else:
-            remote_path = f"{DEFAULT_INSTALL_DIR}/frida-server"
+            # The asset resolved above is fetched as is, without probing the ABI or resolving it again
+            local_path = download_frida_server(release_version, repo, verbose, url, proxy, device, mirrors, asset)
+            entry = manifest.build_entry(local_path, remote_path, release_version, arch, source)
 
         if verbose:
             rich_print(f"Installing frida-server to {remote_path}")
 
-        # Push the file to the device
-        output = run_command(f"adb push {local_path} {remote_path}", verbose, return_error=False)
-        if not output or "1 file pushed" not in output:
-            rich_print("Error: Failed to push frida-server to the device")
-            sys.exit(1)
-
-        # Make the file executable on the device
-        output = run_command(f"adb shell chmod 755 {remote_path}", verbose)
+        history.enter('lock')
+        with device.exclusive():
+            # A binary new to the store is pushed to a hidden temporary name in it; the name is then
+            # linked next to the target and renamed over it, so the target (possibly a running
+            # frida-server) is only ever replaced by the complete file
+            pushed = None
+            if local_path and blobs.get(entry['sha256']) != os.path.getsize(local_path):
+                history.enter('push')
+                pushed = get_temp_path(store.get_store_path(server_dir, entry['sha256']))
+                output = run_command(f"{device.adb} push {local_path} {pushed}", verbose, return_error=False)
+                history.add_bytes(os.path.getsize(local_path))
+                if not output or "1 file pushed" not in output:
+                    device.shell(f"rm -f {pushed}")
+                    rich_print("Error: Failed to push frida-server to the device")
+                    sys.exit(1)
+
+            # Link the name into place and record it in the install dir's manifest
+            history.enter('verify')
+            output = device.shell(f'"{store.link_command(server_dir, entry["sha256"], remote_path, pushed)}"')
+            device.invalidate('listings')
+            if output is None:
+                device.shell(f"rm -f {get_temp_path(remote_path)} {pushed or ''}")
+                rich_print(f"Error: Failed to move frida-server into place at {remote_path}")
+                sys.exit(1)
+            try:
+                entry['size'], entry['mtime'] = (int(value) for value in output.strip().split(':', 2)[:2])
+                device.shell(f'"{manifest.append_command(server_dir, entry)}"')
+            except (AttributeError, ValueError):
+                # The binary is installed; without a manifest entry `list` just probes it
+                if verbose:
+                    rich_print(f"Warning: Could not record {remote_path} in the manifest")
 
         if verbose:
             rich_print("Successfully installed frida-server")
@@ -325,18 +741,163 @@ def install_frida_server(version=None, verbose=False, repo="frida/frida", keep_n
                     rich_print(f"Warning: Could not clean up temporary file: {cleanup_error}")
 
 
-def get_frida_server_version(remote_path, verbose=False):
+def install_frida_servers(versions, verbose=False, repo="frida/frida", proxy=None, device=None, mirrors=None,
+                          install_dir=DEFAULT_INSTALL_DIR, jobs=None):
+    """Install several frida-server versions with a single push; return a result dict per version
+
+    The versions are downloaded in parallel and packed into one tar bundle,
+    which is pushed once and unpacked, made executable and renamed into place
+    with one shell call; their manifest entries are written with one more.
+    Each result has version, path, status ('installed' or 'failed') and detail.
+    """
+    from fsm import history
+
+    device = get_device(device, verbose)
+    with history.operation('install', device.serial, ','.join(dict.fromkeys(versions))):
+        results = _install_frida_servers(versions, verbose, repo, proxy, device, mirrors, install_dir, jobs)
+        installed = sum(result['status'] == 'installed' for result in results)
+        if installed < len(results):
+            history.annotate(outcome='partial' if installed else 'failed')
+        return results
+
+
+def _install_frida_servers(versions, verbose, repo, proxy, device, mirrors, install_dir, jobs):
+    import tarfile
+    import tempfile
+    from concurrent.futures import ThreadPoolExecutor
+    from fsm import history, manifest, store
+    from fsm.mirrors import configured_mirrors
+
+    history.enter('discovery')
+    results = [{'version': version, 'path': resolve_remote_path(version, install_dir=install_dir),
+                'status': 'failed', 'detail': ''} for version in dict.fromkeys(versions)]
+    # Exits on an ABI frida has no build for, before anything is downloaded or pushed
+    arch = get_frida_server_arch(verbose, device)
+    mirrors = configured_mirrors(mirrors)
+    # Resolve the assets one by one, so the release index is synced at most once
+    sources = {}
+    for result in results:
+        sources[result['version']] = resolve_release_asset(repo, result['version'], arch, verbose, proxy)
+
+    # Releases already in the device's store are only linked under their name
+    stored, blobs = store.lookup(install_dir, device)
+    entries = {}
+    for result in results:
+        entry = store.find_stored(stored, blobs, sources[result['version']][0])
+        if entry:
+            entries[result['version']] = store.alias_entry(entry, result['path'])
+
+    def fetch(result):
+        url, filename = sources[result['version']]
+        try:
+            return fetch_frida_server(url, filename, verbose, proxy, mirrors, cache=True)
+        except Exception as e:
+            result['detail'] = f"Could not download {url}: {e}"
+            return None
+
+    local_paths = {}
+    try:
+        history.enter('download')
+        missing = [result for result in results if result['version'] not in entries]
+        with ThreadPoolExecutor(max_workers=jobs or len(missing) or 1) as pool:
+            futures = [_submit(pool, fetch, result) for result in missing]
+            for result, future in zip(missing, futures):
+                local_path = future.result()
+                if local_path:
+                    local_paths[result['version']] = local_path
+                    entries[result['version']] = manifest.build_entry(
+                        local_path, result['path'], result['version'], arch, sources[result['version']][0])
+        linked = [result for result in results if result['version'] in entries]
+        history.add_bytes(sum(os.path.getsize(path) for path in local_paths.values()))
+        if not linked:
+            return results
+
+        # Only binaries the store does not hold yet go into the bundle, each once
+        pushed = {}
+        for version, local_path in local_paths.items():
+            sha256 = entries[version]['sha256']
+            if blobs.get(sha256) != os.path.getsize(local_path) and sha256 not in pushed:
+                pushed[sha256] = local_path
+        bundle_path = f"{install_dir}/.fsm-bundle.tar"
+        with tempfile.TemporaryDirectory() as temp_dir:
+            history.enter('lock')
+            with device.exclusive():
+                if pushed:
+                    local_bundle = os.path.join(temp_dir, 'bundle.tar')
+                    with tarfile.open(local_bundle, 'w') as bundle:
+                        for sha256, local_path in pushed.items():
+                            info = bundle.gettarinfo(local_path, f"{store.STORE_NAME}/.{sha256}.fsm-tmp")
+                            info.mode = 0o755
+                            with open(local_path, 'rb') as f:
+                                bundle.addfile(info, f)
+                    if verbose:
+                        rich_print(f"Pushing {len(pushed)} frida-server(s) as one {os.path.getsize(local_bundle)} byte bundle")
+                    history.enter('push')
+                    output = run_command(f"{device.adb} push {local_bundle} {bundle_path}", verbose)
+                    history.add_bytes(os.path.getsize(local_bundle))
+                    if not output or "1 file pushed" not in output:
+                        device.shell(f"rm -f {bundle_path}")
+                        for result in linked:
+                            result['detail'] = "Failed to push the bundle to the device"
+                        return results
+
+                # One link per name, each reporting its path only if it succeeded
+                history.enter('verify')
+                links = []
+                for result in linked:
+                    sha256 = entries[result['version']]['sha256']
+                    temp_blob = get_temp_path(store.get_store_path(install_dir, sha256))
+                    links.append(f"{store.link_command(install_dir, sha256, result['path'], pushed.pop(sha256, None) and temp_blob)};")
+                unpack = f"tar -xf {bundle_path} -C {install_dir}; " if local_paths else ""
+                output = device.shell(f'"{unpack}{" ".join(links)} rm -f {bundle_path} '
+                                      f'{install_dir}/{store.STORE_NAME}/.*.fsm-tmp"') or ''
+                device.invalidate('listings')
+                placed = {}
+                for line in output.splitlines():
+                    size, _, rest = line.strip().partition(':')
+                    mtime, _, path = rest.partition(':')
+                    if size.isdigit() and mtime.isdigit():
+                        placed[path] = (int(size), int(mtime))
+
+                appends = []
+                for result in linked:
+                    entry = entries[result['version']]
+                    local_path = local_paths.get(result['version'])
+                    expected = os.path.getsize(local_path) if local_path else blobs.get(entry['sha256'])
+                    if placed.get(result['path'], (None,))[0] != expected:
+                        result['detail'] = f"Failed to unpack {result['path']} on the device"
+                        continue
+                    result.update(status='installed', detail=sources[result['version']][1])
+                    entry['size'], entry['mtime'] = placed[result['path']]
+                    appends.append(manifest.append_command(install_dir, entry))
+                if appends and device.shell(f'"{"; ".join(appends)}"') is None and verbose:
+                    # The binaries are installed; without manifest entries `list` just probes them
+                    rich_print("Warning: Could not record the bundle in the manifest")
+        return results
+    finally:
+        for local_path in local_paths.values():
+            if os.path.exists(local_path):
+                os.unlink(local_path)
+
+
+def get_frida_server_version(remote_path, verbose=False, device=None):
     """Get the version of frida-server from the device"""
+    device = get_device(device, verbose)
     if verbose:
         rich_print(f"Checking version of frida-server at {remote_path}")
 
+    import shlex
+    target = shlex.quote(remote_path)
+    # Paths with spaces are quoted for the device shell; the outer quotes get them past the host shell
+    outer = '"' if target != remote_path else ''
+
     # First try: Run the file with --version
-    version_output = run_command(f"adb shell {remote_path} --version", verbose)
+    version_output = device.shell(f"{outer}{target} --version{outer}")
     if version_output:
         return version_output.strip()
     
     # Second try: Check if file exists and is executable
-    check_output = run_command(f"adb shell ls -la {remote_path}", verbose)
+    check_output = device.shell(f"{outer}ls -la {target}{outer}")
     if check_output and '-rwx' in check_output:
         # File exists and is executable, try alternative version check
         try:
@@ -357,12 +918,35 @@ def get_frida_server_version(remote_path, verbose=False):
     return None
 
 
-def run_frida_server(custom_dir=None, custom_params=None, verbose=False, version=None, name=None, force=False):
-    """Run frida-server on the Android device"""
+def run_frida_server(custom_dir=None, custom_params=None, verbose=False, version=None, name=None, force=False, device=None, log=False,
+                     switch=False):
+    """Run frida-server on the Android device, appending its output to the device log when log is set
+
+    With switch, the running frida-servers are replaced by one device-side
+    script (see switch_script()) instead of being stopped and started with
+    fixed sleeps in between, and the measured downtime is reported. Other
+    fsm processes cannot change the device while it runs (see Device.exclusive()).
+    """
+    from fsm import history
+
+    device = get_device(device, verbose)
+    with history.operation('run', device.serial, version):
+        history.enter('lock')
+        with device.exclusive():
+            started = _run_frida_server(custom_dir, custom_params, verbose, version, name, force, device, log, switch)
+        if not started:
+            history.annotate(outcome='failed')
+        return started
+
+
+def _run_frida_server(custom_dir, custom_params, verbose, version, name, force, device, log, switch):
+    from fsm import history
+
     if verbose:
         rich_print(f"DEBUG: run_frida_server called with version={version}, name={name}")
     
-    check_adb_connection(verbose)
+    history.enter('discovery')
+    device.ensure_connected()
 
     # Determine the directory to use
     server_dir = custom_dir if custom_dir else DEFAULT_INSTALL_DIR
@@ -392,18 +976,17 @@ def run_frida_server(custom_dir=None, custom_params=None, verbose=False, version
             rich_print(f"DEBUG: Server directory: {server_dir}")
         
         # List all frida-server files in the directory
-        output = run_command(f"adb shell ls {server_dir} | grep frida-server", verbose)
-        if not output:
+        files = [file for file in device.list_dir(server_dir) if 'frida-server' in file]
+        if not files:
             rich_print(f"Error: No frida-server found in {server_dir}")
             rich_print("Please install it first")
             sys.exit(1)
         
         if verbose:
-            rich_print(f"DEBUG: Found files: {output}")
+            rich_print(f"DEBUG: Found files: {files}")
         
         # Find the file that contains the version number
         import re
-        files = output.strip().split('\n')
         matching_file = None
         
         # First try: Find file with version in filename
@@ -413,12 +996,17 @@ def run_frida_server(custom_dir=None, custom_params=None, verbose=False, version
                 matching_file = filename
                 break
         
-        # Second try: If no file has version in filename, check each file's actual version
+        # Second try: If no file has version in filename, check each file's actual version,
+        # taking it from the install manifest before executing the binary
         if not matching_file:
+            from fsm import manifest
+            entries = manifest.load(server_dir, device)
             for file in files:
                 filename = file.strip()
                 remote_path = f"{server_dir}/{filename}"
-                file_version = get_frida_server_version(remote_path, verbose)
+                entry = entries.get(filename)
+                file_version = entry.get('version') if entry else None
+                file_version = file_version or get_frida_server_version(remote_path, verbose, device)
                 # Extract just the version number from the output (e.g., "17.4.0" from "Frida 17.4.0")
                 if file_version:
                     import re
@@ -449,25 +1037,22 @@ def run_frida_server(custom_dir=None, custom_params=None, verbose=False, version
         if version_match:
             target_version = version_match.group()
     else:
-        # First check if any frida-server is already running
-        verify_cmd = "adb shell ps | grep frida-server"
-        verify_output = run_command(verify_cmd, verbose)
-        if verify_output:
+        # First check if any frida-server is already running; --log needs a restart to capture its output
+        if device.running_servers() and not log:
             # If any frida-server is running, use it
             if verbose:
                 rich_print("frida-server is already running")
             return True
         
         # No frida-server is running, check if any exists in the directory
-        output = run_command(f"adb shell ls {server_dir} | grep frida-server", verbose)
-        if not output:
+        files = [file for file in device.list_dir(server_dir) if 'frida-server' in file]
+        if not files:
             rich_print(f"Error: No frida-server found in {server_dir}")
             rich_print("Please install it first")
             sys.exit(1)
 
         # Use the first frida-server file found
-        files = output.strip().split('\n')
-        server_path = f"{server_dir}/{files[0].split()[-1]}"
+        server_path = f"{server_dir}/{files[0]}"
         target_name = os.path.basename(server_path)
         # Extract version from name if possible
         import re
@@ -475,14 +1060,10 @@ def run_frida_server(custom_dir=None, custom_params=None, verbose=False, version
         if version_match:
             target_version = version_match.group()
 
-    # Check if any frida-server is running
-    verify_cmd = "adb shell ps | grep frida-server"
-    verify_output = run_command(verify_cmd, verbose)
+    # Check if any frida-server is running (deduplicated by the session)
+    unique_lines = device.running_servers()
     
-    if verify_output and not force:
-        # Clean up duplicate lines in output
-        lines = [line.strip() for line in verify_output.strip().split('\n') if line.strip()]
-        unique_lines = list(dict.fromkeys(lines))
+    if unique_lines and not force and not log:
         
         # Check if the exact version we want is already running, and no other versions
         same_version_running = False
@@ -506,9 +1087,12 @@ def run_frida_server(custom_dir=None, custom_params=None, verbose=False, version
     elif force:
         if verbose:
             rich_print("Force option specified, will stop all existing processes and start the requested version")
+    elif log and unique_lines:
+        if verbose:
+            rich_print("Log option specified, will restart frida-server with its output captured")
     
     # Now check if the file exists
-    output = run_command(f'adb shell ls {server_path}', verbose)
+    output = device.shell(f"ls {server_path}")
     if not output or 'No such file or directory' in output:
         if version:
             rich_print(f"Error: frida-server version {version} not found at {server_path}")
@@ -519,11 +1103,21 @@ def run_frida_server(custom_dir=None, custom_params=None, verbose=False, version
         rich_print("Please install it first")
         sys.exit(1)
 
-    # Construct the command to run frida-server
-    cmd = f"adb shell su -c 'nohup {server_path}"
+    # Construct the command to run frida-server; refreshing the access time records the last run for `fsm gc`
+    start_cmd = f"touch -a {server_path}; nohup {server_path}"
     if custom_params and not custom_params.startswith('/'):
-        cmd += f" {custom_params}"
-    cmd += " < /dev/null > /dev/null 2>&1 &'"
+        start_cmd += f" {custom_params}"
+    if log:
+        from fsm.logs import DEVICE_LOG_PATH, device_log_setup
+        start_cmd = f"{device_log_setup()}; {start_cmd} < /dev/null >> {DEVICE_LOG_PATH} 2>&1 &"
+    else:
+        start_cmd += " < /dev/null > /dev/null 2>&1 &"
+    cmd = device.root_command(start_cmd)
+    history.annotate(version=target_version)
+
+    if switch:
+        history.enter('start')
+        return switch_frida_server(server_path, start_cmd, verbose, device)
 
     if verbose:
         rich_print(f"Running frida-server with command: {cmd}")
@@ -533,42 +1127,32 @@ def run_frida_server(custom_dir=None, custom_params=None, verbose=False, version
         rich_print("Stopping existing frida-server processes...")
     
     # Use multiple methods to ensure all frida-server processes are stopped
+    history.enter('stop')
     stop_commands = [
-        "adb shell su -c 'pkill -f frida-server'",
-        "adb shell su -c 'killall -9 frida-server'",
-        "adb shell su -c 'pkill -9 -f frida-server'"  # Force kill with -9
+        device.root_command('pkill -f frida-server'),
+        device.root_command('killall -9 frida-server'),
+        device.root_command('pkill -9 -f frida-server')  # Force kill with -9
     ]
     
+    from fsm import deadline
     for stop_cmd in stop_commands:
-        # Run each stop command but don't check for errors
-        subprocess.run(stop_cmd, shell=True, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL, text=True)
-    
-    # Longer delay to ensure all processes are completely stopped
-    import time
-    time.sleep(1.5)
+        # Run each stop command but don't check for errors; killing is idempotent, so transient
+        # adb errors are retried, and a hanging su prompt cannot outlive the deadline
+        run_command(stop_cmd, verbose, timeout=deadline.QUERY_TIMEOUT, retries=device.retries)
+
+    # Wait until all processes are completely stopped
+    _wait_for_servers(device, running=False)
 
     # Run frida-server - don't wait for output since it's backgrounded
-    try:
-        # The start command should use check=True to catch errors
-        subprocess.run(cmd, shell=True, check=True,
-            stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
-    except subprocess.CalledProcessError as e:
-        rich_print(f"Error starting frida-server: {e}")
+    history.enter('start')
+    if run_command(cmd, verbose, timeout=deadline.QUERY_TIMEOUT) is None:
+        rich_print(f"Error starting frida-server with: {cmd}")
         sys.exit(1)
 
-    # Small delay to allow process to start
-    time.sleep(2)  # Increased delay for more reliable startup
-
-    # Verify it's running
-    verify_cmd = "adb shell ps | grep frida-server"
-    verify_output = run_command(verify_cmd, verbose)
-
-    # Clean up duplicate lines in output
-    if verify_output:
-        # Split by lines, remove empty lines, then deduplicate
-        lines = [line.strip() for line in verify_output.strip().split('\n') if line.strip()]
-        unique_lines = list(dict.fromkeys(lines))
-        verify_output = '\n'.join(unique_lines)
+    # Verify it's running: the server is started in the background, so give it time to show up
+    history.enter('verify')
+    _wait_for_servers(device, running=True)
+    verify_output = '\n'.join(device.running_servers())
 
     if not verify_output:
         rich_print("Warning: Could not verify that frida-server is running")
@@ -581,9 +1165,169 @@ def run_frida_server(custom_dir=None, custom_params=None, verbose=False, version
     return True
 
 
-def list_frida_server(custom_dir=None, verbose=False):
+def _wait_for_servers(device, running, timeout=RUN_TIMEOUT, interval=RUN_POLL_INTERVAL):
+    """Poll until frida-servers are running (running=True) or all gone; return whether that happened in time"""
+    from fsm import cassette, deadline
+
+    end = time.monotonic() + deadline.timeout_for(timeout)
+    while True:
+        device.invalidate('servers')
+        if bool(device.running_servers()) == running:
+            return True
+        if time.monotonic() + interval > end:
+            return False
+        # Replayed sessions wait as long as --replay-speed says
+        cassette.sleep(interval)
+
+
+def switch_script(server_path, start_cmd, timeout=SWITCH_TIMEOUT, interval=SWITCH_POLL_INTERVAL):
+    """Return the device script that replaces the running frida-servers with server_path
+
+    The script refuses to touch anything unless server_path is an executable
+    file, kills the old servers by PID (matching names, so the script's own
+    shell is spared), polls until they are gone, runs start_cmd (which ends
+    with `&`) and polls until the new server shows up. Each wait ends after
+    timeout seconds by the device clock (`date +%s`), however long the polls
+    themselves take. It prints a `fsm-switch:<state>` line at each step. `$`
+    is escaped because the script reaches the device inside the host shell's
+    double quotes.
+    """
+    import math
+
+    seconds = max(1, math.ceil(timeout))
+    set_end = f"end=\\$((\\$(date +%s)+{seconds})); "
+    before_deadline = "[ \\$(date +%s) -le \\$end ]"
+    name = os.path.basename(server_path)
+    running = "ps -A -o PID,NAME | grep frida-server"
+    return (
+        f"[ -f {server_path} ] && [ -x {server_path} ] || {{ echo fsm-switch:not-executable; exit 3; }}; "
+        f"echo fsm-switch:checked; "
+        f"{running} | while read pid rest; do kill -9 \\$pid; done; "
+        f"{set_end}while {running} > /dev/null && {before_deadline}; do sleep {interval}; done; "
+        f"echo fsm-switch:stopped; "
+        f"{start_cmd} "
+        f"{set_end}until ps -A -o PID,NAME | grep -F {name} > /dev/null; do "
+        f"{before_deadline} || {{ echo fsm-switch:timeout; exit 4; }}; sleep {interval}; done; "
+        f"echo fsm-switch:ready"
+    )
+
+
+def switch_frida_server(server_path, start_cmd, verbose=False, device=None):
+    """Replace the running frida-servers with server_path in one device round trip; print the downtime
+
+    Returns True once the new server is running; exits if server_path is not
+    an executable file (nothing is stopped then) or the new server does not
+    show up in time.
+    """
+    device = get_device(device, verbose)
+    marks = {}
+    for line in iter_command_lines(device.root_command(switch_script(server_path, start_cmd)), verbose):
+        if line.startswith('fsm-switch:'):
+            marks[line.split(':', 1)[1].strip()] = time.monotonic()
+    device.invalidate('servers')
+
+    if 'checked' not in marks:
+        rich_print(f"Error: {server_path} is not an executable file on the device, nothing was stopped")
+        sys.exit(1)
+    if 'ready' not in marks:
+        rich_print(f"Error: {server_path} did not start within {SWITCH_TIMEOUT:.0f}s")
+        sys.exit(1)
+    downtime = (marks['ready'] - marks.get('stopped', marks['ready'])) * 1000
+    rich_print(f"Switched to {server_path}, downtime {downtime:.0f} ms")
+    return True
+
+
+def find_frida_server_files(server_dir=DEFAULT_INSTALL_DIR, name=None, verbose=False, device=None):
+    """Return the sorted names of frida-related server files in server_dir"""
+    # A single `ls` per directory is cached by the session and filtered locally,
+    # either by the *name* wildcard or by the frida-related server name patterns
+    return get_device(device, verbose).server_files(server_dir, name)
+
+
+SERVER_NAME_GLOBS = ('*frida*server*', '*server*frida*', '*florida-server*')
+
+
+def find_servers_command(dirs, name=None, recursive=False):
+    """Return the device shell command listing the server files and manifests under dirs
+
+    Two `find` runs in one shell: the first prints every manifest line
+    prefixed with its path (`grep -H`), the second `size:mtime:path` of each
+    matching file. `-exec ... {} +` batches the paths, so neither the number
+    of entries nor odd file names run into shell argument or glob limits.
+    """
+    import shlex
+    from fsm.manifest import MANIFEST_NAME
+
+    roots = ' '.join(shlex.quote(directory) for directory in dirs)
+    depth = '' if recursive else ' -maxdepth 1'
+    names = ' -o '.join(f"-name {shlex.quote(glob)}" for glob in ([f"*{name}*"] if name else SERVER_NAME_GLOBS))
+    return (f"find {roots}{depth} -type f -name {MANIFEST_NAME} -exec grep -H '' {{}} + 2>/dev/null; "
+            f"find {roots}{depth} -type f ! -name '.*' \\( {names} \\) -exec stat -c %s:%Y:%n {{}} + 2>/dev/null; "
+            f"true")
+
+
+def find_frida_servers(dirs, name=None, recursive=False, verbose=False, device=None):
+    """Yield a dict (filename, path, version, aliases) for each server file under dirs, as one `find` streams them back"""
+    from fsm import manifest, store
+
+    device = get_device(device, verbose)
+    marker = f"/{manifest.MANIFEST_NAME}:"
+    manifest_lines = {}
+    entries = aliases = None
+    cmd = f'{device.adb} shell "{find_servers_command(dirs, name, recursive)}"'
+    for line in iter_command_lines(cmd, verbose):
+        line = line.rstrip('\n')
+        if marker in line:
+            directory, _, text = line.partition(marker)
+            manifest_lines.setdefault(directory, []).append(text)
+            continue
+        parts = line.split(':', 2)
+        if len(parts) != 3 or not parts[0].isdigit() or not parts[1].isdigit():
+            continue
+        if entries is None:
+            # All manifests are printed before the first file
+            entries = {directory: manifest.parse('\n'.join(text)) for directory, text in manifest_lines.items()}
+            aliases = {directory: store.aliases(described) for directory, described in entries.items()}
+        remote_path = parts[2]
+        directory, _, filename = remote_path.rpartition('/')
+        entry = entries.get(directory, {}).get(filename)
+        # An entry whose size or mtime no longer match describes a file that has since been replaced
+        if entry and (entry.get('size'), entry.get('mtime')) != (int(parts[0]), int(parts[1])):
+            entry = None
+        yield _server_record(remote_path, entry, aliases.get(directory, {}), verbose, device)
+
+
+def _server_record(remote_path, entry, aliases, verbose, device):
+    """Return the dict (filename, path, version, aliases) of a server file, probing it unless entry has its version"""
+    filename = remote_path.rsplit('/', 1)[-1]
+    return {
+        'filename': filename,
+        'path': remote_path,
+        'version': entry['version'] if entry and entry.get('version')
+        else get_frida_server_version(remote_path, verbose, device),
+        'aliases': aliases.get(filename, []) if entry else [],
+    }
+
+
+def iter_frida_server_files(server_dir=DEFAULT_INSTALL_DIR, name=None, verbose=False, files=None, device=None):
+    """Yield a dict (filename, path, version, aliases) for each frida-related server file"""
+    from fsm import manifest, store
+
+    device = get_device(device, verbose)
+    if files is None:
+        files = find_frida_server_files(server_dir, name, verbose, device)
+    # Versions recorded at install time; only files the manifest does not describe are executed
+    entries = manifest.load(server_dir, device) if files else {}
+    # Names installed from the same binary (hard links into fsm.store)
+    aliases = store.aliases(entries)
+    for filename in files:
+        yield _server_record(f"{server_dir}/{filename}", entries.get(filename), aliases, verbose, device)
+
+
+def list_frida_server(custom_dir=None, verbose=False, device=None):
     """List frida-server files in the specified directory and show their versions"""
-    check_adb_connection(verbose)
+    device = get_device(device, verbose)
+    device.ensure_connected()
 
     # Determine the directory to use
     server_dir = custom_dir if custom_dir else DEFAULT_INSTALL_DIR
@@ -591,37 +1335,65 @@ def list_frida_server(custom_dir=None, verbose=False):
     if verbose:
         rich_print(f"Listing frida-server files in {server_dir}")
 
-    # List all files in the directory containing 'frida-server'
-    output = run_command(f"adb shell ls {server_dir} | grep frida-server", verbose)
+    files = find_frida_server_files(server_dir, verbose=verbose, device=device)
 
-    if not output:
+    if not files:
         rich_print(f"No frida-server files found in {server_dir}")
         sys.exit(0)
 
     # Process the files and get their versions
-    files = output.strip().split('\n')
     rich_print(f"Found {len(files)} frida-server file(s) in {server_dir}:")
     rich_print("=" * 80)
     rich_print(f"{'Filename':<40} {'Version':<40}")
     rich_print("=" * 80)
 
     # Process each file and get its version
-    for file in files:
-        filename = file.strip()
-        remote_path = f"{server_dir}/{filename}"
-        version = get_frida_server_version(remote_path, verbose)
-        rich_print(f"{filename:<40} {version if version else 'Unknown':<40}")
+    records = []
+    for record in iter_frida_server_files(server_dir, verbose=verbose, files=files, device=device):
+        records.append(record)
+        rich_print(f"{record['filename']:<40} {record['version'] if record['version'] else 'Unknown':<40}")
+    return records
 
 
-def get_running_processes(verbose=False, process_name=None):
+def parse_process_line(line):
+    """Parse one line of `ps -A` output into a process dict, or None for headers and short lines"""
+    parts = line.strip().split()
+    if len(parts) < 9 or not parts[1].isdigit():
+        return None
+
+    return {
+        'pid': parts[1],
+        'user': parts[0],
+        'memory': parts[4],
+        'command': ' '.join(parts[8:])  # Command starts from 9th field (index 8)
+    }
+
+
+def iter_running_processes(process_name=None, verbose=False, device=None):
+    """Yield process dicts matching process_name as `ps -A` output is streamed back"""
+    device = get_device(device, verbose)
+    search_name = process_name if process_name else "frida-server"
+    seen = set()
+    for line in iter_command_lines(f"{device.adb} shell ps -A | grep {search_name}", verbose):
+        stripped_line = line.strip()
+        if not stripped_line or stripped_line in seen:
+            continue
+        seen.add(stripped_line)
+        process = parse_process_line(stripped_line)
+        if process:
+            yield process
+
+
+def get_running_processes(verbose=False, process_name=None, device=None):
     """Check and list running processes on the Android device"""
-    check_adb_connection(verbose)
+    device = get_device(device, verbose)
+    device.ensure_connected()
     
     # Use custom process name if provided, default to frida-server
     search_name = process_name if process_name else "frida-server"
     
     # Command to list all running processes with more details
-    cmd = f"adb shell ps -A | grep {search_name}"
+    cmd = f"{device.adb} shell ps -A | grep {search_name}"
     
     if verbose:
         rich_print(f"Checking for running processes with command: {cmd}")
@@ -642,26 +1414,15 @@ def get_running_processes(verbose=False, process_name=None):
     rich_print("=" * 80)
     
     for line in lines:
-            parts = line.strip().split()
-            if len(parts) < 9:
+            process = parse_process_line(line)
+            if not process:
                 continue
             
-            # Extract process information
-            pid = parts[1]
-            user = parts[0]
-            memory = parts[4]
-            command = ' '.join(parts[8:])  # Command starts from 9th field (index 8)
-            
             # Store process info for potential use
-            processes.append({
-                'pid': pid,
-                'user': user,
-                'memory': memory,
-                'command': command
-            })
+            processes.append(process)
             
             # Print formatted process info
-            rich_print(f"{pid:<10} {user:<15} {memory:<10} {command:<40}")
+            rich_print(f"{process['pid']:<10} {process['user']:<15} {process['memory']:<10} {process['command']:<40}")
     
     rich_print("=" * 80)
     return processes
@@ -672,8 +1433,24 @@ def get_running_frida_servers(verbose=False):
     return get_running_processes(verbose, "frida-server")
 
 
-def kill_frida_server(pid=None, verbose=False, name=None):
+def kill_frida_server(pid=None, verbose=False, name=None, device=None):
     """Kill frida-server process on the Android device"""
+    from fsm import history
+
+    device = get_device(device, verbose)
+    with history.operation('kill', device.serial):
+        history.enter('lock')
+        with device.exclusive():
+            history.enter('stop')
+            result = _kill_frida_server(pid, verbose, name, device)
+        if not result['success'] or result['warning']:
+            history.annotate(outcome='failed')
+        return result
+
+
+def _kill_frida_server(pid, verbose, name, device):
+    from fsm import history
+
     result = {
         "success": True,
         "message": "",
@@ -682,14 +1459,16 @@ def kill_frida_server(pid=None, verbose=False, name=None):
     
     if name:
         # Kill processes by name
-        cmd = f"adb shell su -c 'pkill -f {name} || killall -9 {name}'"
+        cmd = device.root_command(f'pkill -f {name} || killall -9 {name}')
         if verbose:
             rich_print(f"Killing processes with name '{name}'")
         
         output = run_command(cmd, verbose)
+        device.invalidate('servers')
         
         # Verify no processes with the name are running
-        verify_cmd = f"adb shell ps -A | grep {name}"
+        history.enter('verify')
+        verify_cmd = f"{device.adb} shell ps -A | grep {name}"
         verify_output = run_command(verify_cmd, verbose)
         
         if not verify_output:
@@ -701,14 +1480,16 @@ def kill_frida_server(pid=None, verbose=False, name=None):
                 result["message"] += f"\n{verify_output}"
     elif pid:
         # Kill specific process by PID
-        cmd = f"adb shell su -c 'kill -9 {pid}'"
+        cmd = device.root_command(f'kill -9 {pid}')
         if verbose:
             rich_print(f"Killing frida-server process with PID {pid}")
         
         output = run_command(cmd, verbose)
+        device.invalidate('servers')
         
         # Verify the process is killed
-        verify_cmd = f"adb shell ps -p {pid}"
+        history.enter('verify')
+        verify_cmd = f"{device.adb} shell ps -p {pid}"
         verify_output = run_command(verify_cmd, verbose)
         
         if not verify_output or "No such process" in verify_output:
@@ -718,15 +1499,16 @@ def kill_frida_server(pid=None, verbose=False, name=None):
             result["success"] = False
     else:
         # Kill all frida-server processes
-        cmd = "adb shell su -c 'pkill -f frida-server || killall -9 frida-server'"
+        cmd = device.root_command('pkill -f frida-server || killall -9 frida-server')
         if verbose:
             rich_print("Killing all running frida-server processes")
         
         output = run_command(cmd, verbose)
         
         # Verify no frida-server processes are running
-        verify_cmd = "adb shell ps -A | grep frida-server"
-        verify_output = run_command(verify_cmd, verbose)
+        history.enter('verify')
+        device.invalidate('servers')
+        verify_output = '\n'.join(device.running_servers())
         
         if not verify_output:
             result["message"] = "Success: All frida-server processes have been killed"
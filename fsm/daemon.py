@@ -0,0 +1,341 @@
+"""
+Optional host-wide daemon that keeps device sessions warm.
+
+`fsm daemon start` listens on a Unix domain socket and runs list, ps, run,
+kill, install and logs on behalf of the CLI, reusing one Device session
+(connection check, ABI, su method) per serial and the latest release tag per
+repository between calls, and following the device log of frida-servers
+started with --log. The CLI sends one JSON request per connection and falls
+back to running the command itself when no daemon is listening, so the
+daemon is purely an accelerator. The optional timeout is what is left of the
+caller's deadline (fsm.deadline).
+
+Requests and replies are single JSON lines:
+
+    {"command": "ps", "serial": "emulator-5554", "args": {"name": "frida-server"}, "timeout": 29.5}
+    {"ok": true, "result": [...], "output": "", "exit_code": null, "error": ""}
+"""
+
+import os
+import sys
+import threading
+import time
+
+SOCKET_ENV = "FSM_DAEMON_SOCKET"
+DISABLE_ENV = "FSM_NO_DAEMON"
+
+# Re-check the adb connection of a session after this many idle seconds
+SESSION_TTL = 30.0
+# How long a looked up "latest" release tag is reused
+LATEST_VERSION_TTL = 300.0
+
+
+def get_socket_path():
+    """Return the daemon socket path ($FSM_DAEMON_SOCKET, else daemon.sock in the fsm cache directory)"""
+    path = os.environ.get(SOCKET_ENV)
+    if path:
+        return path
+    from fsm.core import get_cache_dir
+    return os.path.join(get_cache_dir(), 'daemon.sock')
+
+
+def _send(request, socket_path=None, timeout=None):
+    """Send one request; return the reply, or None if no daemon accepted the connection"""
+    import json
+    import socket
+
+    path = socket_path or get_socket_path()
+    if not hasattr(socket, 'AF_UNIX') or not os.path.exists(path):
+        return None
+
+    sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    try:
+        sock.settimeout(timeout)
+        try:
+            sock.connect(path)
+        except OSError:
+            return None
+        # From here on the daemon may have started the operation, so never fall back silently
+        try:
+            sock.sendall(json.dumps(request).encode() + b'\n')
+            with sock.makefile('rb') as reply:
+                line = reply.readline()
+        except OSError as e:
+            line = b''
+            error = str(e)
+        else:
+            error = "the daemon closed the connection"
+        if not line:
+            return {'ok': False, 'result': None, 'output': '', 'exit_code': 1,
+                    'error': f"Lost connection to the fsm daemon: {error}"}
+        return json.loads(line.decode())
+    finally:
+        sock.close()
+
+
+def request(command, **args):
+    """Run command in the daemon; return its reply, or None when no daemon is running ($FSM_NO_DAEMON disables it)"""
+    if os.environ.get(DISABLE_ENV):
+        return None
+    from fsm.deadline import remaining
+    # The daemon applies what is left of the caller's deadline to the operation
+    return _send({'command': command, 'serial': os.environ.get('ANDROID_SERIAL'), 'args': args,
+                  'timeout': remaining()})
+
+
+def ping(socket_path=None):
+    """Return the daemon status (pid, uptime, sessions, requests), or None if it is not running"""
+    reply = _send({'command': 'ping'}, socket_path, timeout=2)
+    return reply['result'] if reply and reply.get('ok') else None
+
+
+def stop(socket_path=None):
+    """Ask a running daemon to exit; return False if none was running"""
+    return _send({'command': 'shutdown'}, socket_path, timeout=5) is not None
+
+
+class _RequestStdout:
+    """sys.stdout replacement that sends each request's output to its own buffer
+
+    The buffer lives in a context variable, so worker threads that core runs
+    in a copy of the request's context (core._submit) write to it as well.
+    """
+
+    def __init__(self, default):
+        import contextvars
+        self._default = default
+        self._buffer = contextvars.ContextVar('fsm_daemon_stdout', default=None)
+
+    def _target(self):
+        return self._buffer.get() or self._default
+
+    def capture(self, buffer):
+        """Send this context's output to buffer; returns the token release() takes"""
+        return self._buffer.set(buffer)
+
+    def release(self, token):
+        self._buffer.reset(token)
+
+    def write(self, text):
+        return self._target().write(text)
+
+    def flush(self):
+        self._target().flush()
+
+    def isatty(self):
+        # Captured output is replayed by the client, so never emit terminal control codes
+        return False
+
+    def __getattr__(self, name):
+        return getattr(self._target(), name)
+
+
+class _Session:
+    def __init__(self, serial):
+        from fsm.device import Device
+        self.device = Device(serial)
+        self.lock = threading.Lock()
+        self.used_at = time.monotonic()
+
+    def refresh(self):
+        """Drop facts another process may have changed since the last request"""
+        if time.monotonic() - self.used_at > SESSION_TTL:
+            self.device.invalidate()
+        else:
+            self.device.invalidate('listings', 'servers')
+        self.used_at = time.monotonic()
+
+
+class Daemon:
+    """Request dispatcher holding the warm per-serial sessions"""
+
+    def __init__(self):
+        self.started_at = time.time()
+        self.requests = 0
+        self._sessions = {}
+        self._sessions_lock = threading.Lock()
+        self._latest_versions = {}
+        self._logs = {}
+        self.server = None
+
+    def session(self, serial):
+        with self._sessions_lock:
+            if serial not in self._sessions:
+                self._sessions[serial] = _Session(serial)
+            return self._sessions[serial]
+
+    def latest_version(self, repo, proxy=None):
+        from fsm.core import get_latest_frida_version
+        cached = self._latest_versions.get(repo)
+        if cached and time.monotonic() - cached[1] < LATEST_VERSION_TTL:
+            return cached[0]
+        version = get_latest_frida_version(repo, False, proxy)
+        if version:
+            self._latest_versions[repo] = (version, time.monotonic())
+        return version
+
+    def follow_log(self, device, restart=False):
+        """Return the DeviceLog of device, making sure a background thread copies it to the host"""
+        from fsm.logs import DeviceLog
+        with self._sessions_lock:
+            log, thread = self._logs.get(device.serial) or (DeviceLog(device), None)
+            if restart and thread and thread.is_alive():
+                # `tail -f` keeps reading the rotated file, so start over on the new one
+                log.stop()
+                thread.join(5)
+            if not (thread and thread.is_alive()):
+                log.pull()
+                thread = threading.Thread(target=self._follow, args=(log,), daemon=True)
+                thread.start()
+            self._logs[device.serial] = (log, thread)
+        return log
+
+    @staticmethod
+    def _follow(log):
+        try:
+            for _ in log.follow():
+                pass
+        except TimeoutError:
+            # Another process is following this device's log
+            pass
+
+    def close(self):
+        """Stop the log followers"""
+        for log, _ in self._logs.values():
+            log.stop()
+
+    # Operations return JSON-serialisable results; core's printed output is captured separately
+
+    def op_list(self, device, args):
+        from fsm.core import DEFAULT_INSTALL_DIR, find_frida_servers, iter_frida_server_files
+        dirs = args.get('dirs') or [args.get('dir') or DEFAULT_INSTALL_DIR]
+        if len(dirs) > 1 or args.get('recursive'):
+            return [record for record in find_frida_servers(dirs, args.get('name'), args.get('recursive', False),
+                                                            device=device)]
+        return [record for record in iter_frida_server_files(dirs[0], args.get('name'), device=device)]
+
+    def op_ps(self, device, args):
+        from fsm.core import iter_running_processes
+        return [process for process in iter_running_processes(args.get('name'), device=device)]
+
+    def op_run(self, device, args):
+        from fsm.core import run_frida_server
+        result = run_frida_server(args.get('dir'), args.get('params'), False, args.get('version'),
+                                  args.get('name'), args.get('force', False), device, args.get('log', False),
+                                  args.get('switch', False))
+        if args.get('log'):
+            self.follow_log(device, restart=True)
+        return result
+
+    def op_logs(self, device, args):
+        device.ensure_connected()
+        return self.follow_log(device).recent(args.get('lines', 50))
+
+    def op_kill(self, device, args):
+        from fsm.core import kill_frida_server
+        device.ensure_connected()
+        return kill_frida_server(args.get('pid'), False, args.get('name'), device)
+
+    def op_install(self, device, args):
+        from fsm.core import install_frida_server
+        # The install pipeline checks the connection itself, alongside the other discovery steps
+        repo = args.get('repo') or "frida/frida"
+        version = args.get('version')
+        if not version and not args.get('url'):
+            version = self.latest_version(repo, args.get('proxy'))
+            if not version:
+                raise RuntimeError("Could not determine the latest version")
+        return install_frida_server(version, False, repo, args.get('keep_name', False), args.get('custom_name'),
+                                    args.get('url'), args.get('proxy'), device, args.get('mirrors'))
+
+    def op_install_bundle(self, device, args):
+        from fsm.core import install_frida_servers
+        device.ensure_connected()
+        return install_frida_servers(args['versions'], False, args.get('repo') or "frida/frida", args.get('proxy'),
+                                     device, args.get('mirrors'))
+
+    def dispatch(self, request):
+        """Handle one request and return the reply dict"""
+        import io
+
+        command = request.get('command')
+        with self._sessions_lock:
+            self.requests += 1
+        if command == 'ping':
+            return self._reply(True, {'pid': os.getpid(), 'uptime': time.time() - self.started_at,
+                                      'sessions': sorted(str(serial) for serial in self._sessions),
+                                      'requests': self.requests})
+        if command == 'shutdown':
+            threading.Thread(target=self.server.shutdown, daemon=True).start()
+            return self._reply(True, None)
+
+        operation = getattr(self, f"op_{command}", None)
+        if operation is None:
+            return self._reply(False, None, error=f"Unknown command: {command}")
+
+        from fsm.deadline import deadline
+
+        session = self.session(request.get('serial'))
+        buffer = io.StringIO()
+        with session.lock, deadline(request.get('timeout')):
+            session.refresh()
+            token = sys.stdout.capture(buffer)
+            try:
+                result = operation(session.device, request.get('args') or {})
+            except SystemExit as e:
+                # core reports errors by printing them and exiting
+                return self._reply(not e.code, None, buffer.getvalue(), e.code or None)
+            except Exception as e:
+                return self._reply(False, None, buffer.getvalue(), 1, str(e))
+            finally:
+                sys.stdout.release(token)
+        return self._reply(True, result, buffer.getvalue())
+
+    @staticmethod
+    def _reply(ok, result, output='', exit_code=None, error=''):
+        return {'ok': ok, 'result': result, 'output': output, 'exit_code': exit_code, 'error': error}
+
+
+def serve(socket_path=None):
+    """Run the daemon in the foreground until it is stopped"""
+    import json
+    import socketserver
+
+    path = socket_path or get_socket_path()
+    if ping(path):
+        raise RuntimeError(f"An fsm daemon is already listening on {path}")
+    if os.path.exists(path):
+        # Left behind by a daemon that did not exit cleanly
+        os.unlink(path)
+
+    daemon = Daemon()
+
+    class Handler(socketserver.StreamRequestHandler):
+        def handle(self):
+            line = self.rfile.readline()
+            if not line:
+                return
+            try:
+                reply = daemon.dispatch(json.loads(line.decode()))
+            except Exception as e:
+                reply = Daemon._reply(False, None, exit_code=1, error=f"Bad request: {e}")
+            self.wfile.write(json.dumps(reply).encode() + b'\n')
+
+    class Server(socketserver.ThreadingMixIn, socketserver.UnixStreamServer):
+        daemon_threads = True
+
+    sys.stdout = _RequestStdout(sys.stdout)
+    old_umask = os.umask(0o077)
+    try:
+        server = Server(path, Handler)
+    finally:
+        os.umask(old_umask)
+    daemon.server = server
+    try:
+        server.serve_forever()
+    finally:
+        daemon.close()
+        server.server_close()
+        if os.path.exists(path):
+            os.unlink(path)
+        sys.stdout = sys.stdout._default
@@ -0,0 +1,75 @@
+"""
+Operation deadlines and retry backoff for the commands fsm runs.
+
+deadline() sets an absolute deadline for everything run inside the block;
+nested blocks can only shorten it. run_command() and the asyncio API limit
+each child process to the time that is left and kill it (with everything it
+spawned) when it expires, raising CommandTimeoutError. The deadline lives in
+a context variable, so it follows the operation through its sub-steps and
+into asyncio tasks without being passed around.
+
+Idempotent queries (ls, ps, getprop) may be retried after transient adb
+errors; backoff_delays() spaces the attempts with full jitter so that
+devices sharing a flaky USB hub do not retry in lockstep.
+"""
+
+import contextlib
+import contextvars
+import os
+import random
+import time
+
+TIMEOUT_ENV = 'FSM_TIMEOUT'
+RETRIES_ENV = 'FSM_RETRIES'
+
+# Retries of an idempotent query after a transient adb failure
+DEFAULT_RETRIES = 2
+# Upper bound for a single idempotent query, so a wedged device cannot stall it forever
+QUERY_TIMEOUT = 30.0
+BACKOFF_BASE = 0.2
+BACKOFF_CAP = 2.0
+
+_deadline = contextvars.ContextVar('fsm_deadline', default=None)
+
+
+@contextlib.contextmanager
+def deadline(seconds):
+    """Run the block with at most seconds left for it (None leaves the current deadline alone)"""
+    if seconds is None:
+        yield
+        return
+    new = time.monotonic() + seconds
+    current = _deadline.get()
+    token = _deadline.set(new if current is None else min(current, new))
+    try:
+        yield
+    finally:
+        _deadline.reset(token)
+
+
+def remaining():
+    """Return the seconds left until the current deadline, or None when there is none"""
+    current = _deadline.get()
+    return None if current is None else max(0.0, current - time.monotonic())
+
+
+def timeout_for(timeout=None):
+    """Return the timeout for one command: timeout capped by the current deadline (None for no limit)"""
+    left = remaining()
+    if left is None:
+        return timeout
+    return left if timeout is None else min(timeout, left)
+
+
+def default_retries():
+    """Return the retry count for idempotent queries ($FSM_RETRIES, else DEFAULT_RETRIES)"""
+    try:
+        return max(0, int(os.environ.get(RETRIES_ENV, DEFAULT_RETRIES)))
+    except ValueError:
+        return DEFAULT_RETRIES
+
+
+def backoff_delays(retries, base=BACKOFF_BASE, cap=BACKOFF_CAP):
+    """Yield the sleep before each retry: uniform in [0, min(cap, base * 2**attempt)]"""
+    for attempt in range(retries):
+        yield random.uniform(0, min(cap, base * 2 ** attempt))
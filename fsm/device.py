@@ -0,0 +1,175 @@
+import contextlib
+import fnmatch
+import re
+import threading
+
+from fsm import core, deadline
+
+SERVER_FILE_PATTERN = re.compile(r'frida-server|florida-server|frida.*server|server.*frida')
+
+
+def filter_server_files(files, name=None):
+    """Return the sorted frida-related server file names among files, or those matching the wildcard *name*"""
+    if name:
+        return sorted(file for file in files if fnmatch.fnmatch(file, f"*{name}*"))
+    return sorted(file for file in files if SERVER_FILE_PATTERN.search(file))
+
+
+# Device script printing how to get root: 'root' (adbd runs as root), 'su-c' (Magisk/SuperSU style),
+# 'su0' (AOSP `su 0 <command>`) or 'none'
+SU_PROBE = ("id | grep -q uid=0 && echo root || "
+            "(su -c id 2>/dev/null | grep -q uid=0 && echo su-c) || "
+            "(su 0 id 2>/dev/null | grep -q uid=0 && echo su0) || echo none")
+
+
+def parse_su_method(output):
+    """Return the su method printed by SU_PROBE, or None when there is no way to get root"""
+    method = output.strip().splitlines()[-1] if output and output.strip() else 'none'
+    return None if method == 'none' else method
+
+
+def su_command(method, command):
+    """Wrap a device command so it runs as root with su method (see SU_PROBE)"""
+    if method == 'su-c':
+        return f"su -c '{command}'"
+    if method == 'su0':
+        return f"su 0 sh -c '{command}'"
+    # Already root, or no su available: run it directly and let it fail if it needs root
+    return f"sh -c '{command}'"
+
+
+class Device:
+    """A session bound to one device serial that caches facts discovered over adb.
+
+    Cached facts (connection state, ABI, su method, directory listings and
+    running frida-server processes) are reused by every core function the
+    session is passed to. Operations that change the device invalidate the
+    affected entries; call invalidate() after changing the device yourself.
+
+    Idempotent queries are retried up to retries times after transient adb
+    errors (default: $FSM_RETRIES, else 2).
+    """
+
+    def __init__(self, serial=None, verbose=False, retries=None):
+        self.serial = serial
+        self.verbose = verbose
+        self.retries = deadline.default_retries() if retries is None else retries
+        self._facts = {}
+        self._listings = {}
+        self._exclusive = threading.RLock()
+        self._exclusive_depth = 0
+
+    def __repr__(self):
+        return f"Device(serial={self.serial!r})"
+
+    @property
+    def adb(self):
+        """The adb command prefix that targets this device"""
+        return f"adb -s {self.serial}" if self.serial else "adb"
+
+    def shell(self, command, return_error=False, timeout=None, retries=0):
+        """Run a command with `adb shell` on this device"""
+        return core.run_command(f"{self.adb} shell {command}", self.verbose, return_error, timeout, retries)
+
+    def query(self, command):
+        """Run an idempotent command with `adb shell`, retrying transient failures"""
+        return self.shell(command, timeout=deadline.QUERY_TIMEOUT, retries=self.retries)
+
+    @contextlib.contextmanager
+    def exclusive(self):
+        """Hold the device's cross-process lock (see fsm.lock.device_lock); nested calls reuse it"""
+        from fsm.lock import device_lock
+        with self._exclusive:
+            if self._exclusive_depth:
+                self._exclusive_depth += 1
+                try:
+                    yield
+                finally:
+                    self._exclusive_depth -= 1
+                return
+            if 'serialno' not in self._facts:
+                # Name the lock after the device adb picks when no serial was given
+                from fsm.lock import resolve_serial
+                self._facts['serialno'] = resolve_serial(self.serial)
+            with device_lock(self._facts['serialno'], deadline.timeout_for(None)):
+                # Another process may have changed the device while we waited
+                self.invalidate('listings', 'servers')
+                self._exclusive_depth = 1
+                try:
+                    yield
+                finally:
+                    self._exclusive_depth = 0
+
+    def invalidate(self, *facts):
+        """Forget cached facts ('connected', 'abi', 'su', 'listings', 'servers'); everything if none given"""
+        if not facts:
+            self._facts.clear()
+            self._listings.clear()
+            return
+        for fact in facts:
+            if fact == 'listings':
+                self._listings.clear()
+            else:
+                self._facts.pop(fact, None)
+
+    def ensure_connected(self):
+        """Check the adb connection once per session"""
+        if not self._facts.get('connected'):
+            core.check_adb_connection(self.verbose, self.serial)
+            self._facts['connected'] = True
+
+    @property
+    def abi(self):
+        """ro.product.cpu.abi of the device, or None if it could not be read"""
+        if 'abi' not in self._facts:
+            output = self.query("getprop ro.product.cpu.abi")
+            self._facts['abi'] = output.strip() if output else None
+        return self._facts['abi']
+
+    @property
+    def frida_arch(self):
+        """frida-server architecture matching the device ABI, or None"""
+        return core.map_frida_arch(self.abi) if self.abi else None
+
+    @property
+    def su_method(self):
+        """How to get root: 'root' (adbd runs as root), 'su-c', 'su0' or None"""
+        if 'su' not in self._facts:
+            self._facts['su'] = parse_su_method(self.query(f'"{SU_PROBE}"'))
+        return self._facts['su']
+
+    def su(self, command):
+        """Wrap a device command so it runs as root with the detected su method"""
+        return su_command(self.su_method, command)
+
+    def root_command(self, command):
+        """Return the host command line that runs a device command as root.
+
+        The device command is double-quoted so that adb, which joins its
+        arguments with spaces, hands it to su as a single script.
+        """
+        return f'{self.adb} shell "{self.su(command)}"'
+
+    def list_dir(self, directory):
+        """Return the file names in a device directory, cached per session"""
+        if directory not in self._listings:
+            output = self.query(f"ls {directory}")
+            self._listings[directory] = [line.strip() for line in output.splitlines() if line.strip()] if output else []
+        return self._listings[directory]
+
+    def server_files(self, directory, name=None):
+        """Return sorted frida-related server file names in directory, optionally filtered by a name pattern"""
+        return filter_server_files(self.list_dir(directory), name)
+
+    def running_servers(self):
+        """Return unique `ps` lines of running frida-server processes, cached until invalidated"""
+        if 'servers' not in self._facts:
+            output = core.run_command(f"{self.adb} shell ps -A | grep frida-server", self.verbose,
+                                      timeout=deadline.QUERY_TIMEOUT, retries=self.retries)
+            lines = [line.strip() for line in output.strip().split('\n') if line.strip()] if output else []
+            self._facts['servers'] = list(dict.fromkeys(lines))
+        return self._facts['servers']
+
+    def running_pids(self):
+        """Return the PIDs of running frida-server processes"""
+        return [process['pid'] for process in map(core.parse_process_line, self.running_servers()) if process]
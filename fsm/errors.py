@@ -0,0 +1,53 @@
+class FsmError(Exception):
+    """Base class for errors raised by the fsm library APIs"""
+
+
+class AdbNotFoundError(FsmError):
+    """adb is not installed or not in PATH"""
+
+
+class DeviceNotFoundError(FsmError):
+    """No device (or not the requested one) is connected"""
+
+
+class AdbCommandError(FsmError):
+    """An adb invocation exited with a non-zero status"""
+
+    def __init__(self, cmd, returncode, stderr=""):
+        self.cmd = cmd
+        self.returncode = returncode
+        self.stderr = stderr
+        super().__init__(f"Command failed ({returncode}): {cmd}: {stderr.strip()}")
+
+
+class UnsupportedArchitectureError(FsmError):
+    """The device ABI has no matching frida-server build"""
+
+
+class VersionLookupError(FsmError):
+    """The latest frida version could not be determined"""
+
+
+class DownloadError(FsmError):
+    """frida-server could not be downloaded or extracted"""
+
+
+class ServerNotFoundError(FsmError):
+    """No matching frida-server binary exists on the device"""
+
+
+class ServerStartError(FsmError):
+    """frida-server was started but could not be seen running"""
+
+
+class CommandTimeoutError(FsmError):
+    """A command did not finish before its timeout or the operation's deadline"""
+
+    def __init__(self, cmd, timeout):
+        self.cmd = cmd
+        self.timeout = timeout
+        super().__init__(f"Timed out after {timeout:.1f}s: {cmd}")
+
+
+class CassetteError(FsmError):
+    """A replayed cassette holds no recorded response for a request"""
@@ -0,0 +1,157 @@
+"""
+Structured frida-server crash and kill events from `adb logcat`.
+
+logcat runs with a device-side filter (a message regex for the markers
+below and optionally --pid), so only candidate lines cross adb. Each line is
+parsed as it arrives into an event dict:
+
+    lmk_kill        lowmemorykiller / lmkd killed a process
+    selinux_denial  an `avc: denied` record
+    crash           a `Fatal signal` report from the crashing process
+    tombstone       debuggerd wrote a tombstone
+    log             any other line mentioning frida
+
+watch() follows several devices at once, one logcat stream per serial, and
+yields events in arrival order.
+"""
+
+import os
+import queue
+import re
+import signal
+import subprocess
+import threading
+from datetime import datetime, timezone
+
+# Device-side message filter passed to `logcat -e` (\x27 is a quote, which cannot appear in the shell quoting)
+DEVICE_FILTER = r"frida|[Kk]ill(ing)? \x27|avc: +denied|Fatal signal|Tombstone written"
+LMK_TAGS = ('lowmemorykiller', 'lmkd')
+
+_LINE_RE = re.compile(r'^\s*(\d+\.\d+)\s+(?:\d+\s+)?(\d+)\s+(\d+)\s+([VDIWEFA])\s+(.*?)\s*: (.*)$')
+_LMK_RE = re.compile(r"[Kk]ill(?:ing)? '([^']+)' \((\d+)\)")
+_AVC_PID_RE = re.compile(r'\bpid=(\d+)')
+_AVC_COMM_RE = re.compile(r'\bcomm="([^"]*)"')
+_CRASH_RE = re.compile(r'Fatal signal \d+ \(\w+\).*?\bpid (\d+) \(([^)]*)\)')
+_TOMBSTONE_RE = re.compile(r'Tombstone written to: (\S+)')
+
+
+def logcat_command(serial, pid=None, since=None, dump=False):
+    """Return the adb logcat command line with the device-side filter"""
+    command = f"adb -s {serial} logcat -v epoch -b main -b system -b crash"
+    if dump:
+        command += " -d"
+    if since is not None:
+        command += f" -T {since:.3f}"
+    elif not dump:
+        # Start at the end of the buffer instead of replaying it
+        command += " -T 1"
+    if pid:
+        command += f" --pid={pid}"
+    # Quoted twice: once for the host shell and once for the device shell running logcat
+    return command + f" -e \"'{DEVICE_FILTER}'\""
+
+
+def parse_line(line, serial=None):
+    """Parse one `logcat -v epoch` line into an event dict, or None if it is not an event"""
+    match = _LINE_RE.match(line)
+    if not match:
+        return None
+    timestamp, pid, _, priority, tag, message = match.groups()
+    event = {
+        'serial': serial,
+        'time': datetime.fromtimestamp(float(timestamp), timezone.utc).isoformat(timespec='milliseconds'),
+        'timestamp': float(timestamp),
+        'kind': None,
+        'pid': int(pid),
+        'process': None,
+        'tag': tag,
+        'priority': priority,
+        'message': message,
+    }
+
+    lmk = _LMK_RE.search(message)
+    crash = _CRASH_RE.search(message)
+    tombstone = _TOMBSTONE_RE.search(message)
+    if lmk and (tag in LMK_TAGS or 'frida' in lmk.group(1)):
+        event.update(kind='lmk_kill', process=lmk.group(1), pid=int(lmk.group(2)))
+    elif re.search(r'avc: +denied', message):
+        avc_pid = _AVC_PID_RE.search(message)
+        avc_comm = _AVC_COMM_RE.search(message)
+        event.update(kind='selinux_denial', process=avc_comm.group(1) if avc_comm else None,
+                     pid=int(avc_pid.group(1)) if avc_pid else event['pid'])
+    elif crash:
+        event.update(kind='crash', process=crash.group(2), pid=int(crash.group(1)))
+    elif tombstone:
+        event.update(kind='tombstone')
+    elif 'frida' in message or 'frida' in tag:
+        event.update(kind='log')
+    else:
+        return None
+    return event
+
+
+def matches_process(event, process):
+    """Whether event concerns process (substring match); events without a process always match"""
+    return not process or event['process'] is None or process in event['process']
+
+
+def device_time(serial, verbose=False):
+    """Return the device clock as epoch seconds, or None if it cannot be read"""
+    from fsm.core import run_command
+    output = run_command(f"adb -s {serial} shell date +%s", verbose)
+    try:
+        return float(output.strip())
+    except (AttributeError, ValueError):
+        return None
+
+
+def _pump(serial, process, events, process_filter):
+    try:
+        for raw in process.stdout:
+            event = parse_line(raw.decode(errors='replace').rstrip('\n'), serial)
+            if event and matches_process(event, process_filter):
+                events.put(event)
+    finally:
+        # One sentinel per stream tells watch() that this device is done
+        events.put(serial)
+
+
+def watch(serials, pid=None, since=None, dump=False, process='frida', verbose=False):
+    """Yield events from the logcat of every serial as they arrive
+
+    since is a number of seconds of history to include (measured on each
+    device's clock); dump stops once the buffered lines have been read
+    instead of following the log.
+    """
+    events = queue.Queue()
+    streams = []
+    try:
+        for serial in serials:
+            start = None
+            if since is not None:
+                now = device_time(serial, verbose)
+                start = now - since if now is not None else None
+            command = logcat_command(serial, pid, start, dump)
+            if verbose:
+                from rich import print as rich_print
+                rich_print(f"Running command: {command}")
+            stream = subprocess.Popen(command, shell=True, stdout=subprocess.PIPE,
+                                      stderr=subprocess.DEVNULL, start_new_session=True)
+            streams.append(stream)
+            threading.Thread(target=_pump, args=(serial, stream, events, process), daemon=True).start()
+
+        remaining = len(streams)
+        while remaining:
+            event = events.get()
+            if isinstance(event, str):
+                remaining -= 1
+                continue
+            yield event
+    finally:
+        for stream in streams:
+            if stream.poll() is None:
+                try:
+                    os.killpg(stream.pid, signal.SIGKILL)
+                except (ProcessLookupError, PermissionError, AttributeError):
+                    stream.kill()
+            stream.wait()
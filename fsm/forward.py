@@ -0,0 +1,191 @@
+"""
+Host port pool for `adb forward` to frida-server.
+
+Each device serial gets one host port from a pool (27100-27999 by default,
+$FSM_FORWARD_PORTS or --port-range to change it) forwarded to frida-server's
+port on the device. Mappings are kept in forwards.json in the fsm cache
+directory so parallel test workers can look up their device's endpoint with
+lookup() without calling adb. Every change happens under a file lock and
+starts from a single `adb forward --list`, which also drops mappings whose
+forward no longer exists.
+"""
+
+import json
+import os
+import time
+
+from fsm.core import get_cache_dir, list_devices, run_command
+from fsm.lock import atomic_write, file_lock
+
+DEFAULT_DEVICE_PORT = 27042
+DEFAULT_PORT_RANGE = (27100, 27999)
+PORT_RANGE_ENV = 'FSM_FORWARD_PORTS'
+HOST = '127.0.0.1'
+
+
+def get_state_path():
+    """Return the path of the persisted forward mapping"""
+    return os.path.join(get_cache_dir(), 'forwards.json')
+
+
+def parse_port_range(spec=None):
+    """Parse 'FIRST-LAST' (default: $FSM_FORWARD_PORTS, else 27100-27999) into a (first, last) tuple"""
+    spec = spec or os.environ.get(PORT_RANGE_ENV)
+    if not spec:
+        return DEFAULT_PORT_RANGE
+    first, _, last = spec.partition('-')
+    first, last = int(first), int(last or first)
+    if not 0 < first <= last < 65536:
+        raise ValueError(f"Invalid port range: {spec}")
+    return first, last
+
+
+def _tcp_port(spec):
+    return int(spec[4:]) if spec.startswith('tcp:') and spec[4:].isdigit() else None
+
+
+def list_adb_forwards(verbose=False):
+    """Return the forwards adb currently has as dicts (serial, local, remote)"""
+    output = run_command('adb forward --list', verbose)
+    if output is None:
+        raise RuntimeError("Could not list adb forwards")
+    forwards = []
+    for line in output.splitlines():
+        parts = line.split()
+        if len(parts) == 3:
+            forwards.append({'serial': parts[0], 'local': parts[1], 'remote': parts[2]})
+    return forwards
+
+
+def _record(serial, port, remote):
+    return {'serial': serial, 'endpoint': f"{HOST}:{port}", 'port': port, 'remote': remote}
+
+
+def _load_state():
+    path = get_state_path()
+    if not os.path.exists(path):
+        return []
+    with open(path) as f:
+        return json.load(f).get('forwards', [])
+
+
+def _save_state(records):
+    atomic_write(get_state_path(), json.dumps({'forwards': records, 'updated_at': time.time()}, indent=2))
+
+
+def _reconcile(adb_forwards):
+    """Keep only the tracked records whose forward adb still has"""
+    live = {(forward['serial'], forward['local'], forward['remote']) for forward in adb_forwards}
+    return [record for record in _load_state() if (record['serial'], f"tcp:{record['port']}", record['remote']) in live]
+
+
+def _port_is_free(port):
+    import socket
+    with socket.socket(socket.AF_INET, socket.SOCK_STREAM) as sock:
+        try:
+            sock.bind((HOST, port))
+        except OSError:
+            return False
+    return True
+
+
+def _locked():
+    return file_lock(get_state_path() + '.lock')
+
+
+def ensure_forward(serial, device_port=DEFAULT_DEVICE_PORT, port_range=None, verbose=False):
+    """Return the forward record for serial, reusing an existing forward or allocating a pool port"""
+    first, last = parse_port_range(port_range)
+    remote = f"tcp:{device_port}"
+    with _locked():
+        adb_forwards = list_adb_forwards(verbose)
+        records = _reconcile(adb_forwards)
+
+        # Reuse any forward adb already has for this device port, even one made outside fsm
+        existing = next((forward for forward in adb_forwards
+                         if forward['serial'] == serial and forward['remote'] == remote
+                         and _tcp_port(forward['local'])), None)
+        if existing:
+            record = _record(serial, _tcp_port(existing['local']), remote)
+        else:
+            used = {_tcp_port(forward['local']) for forward in adb_forwards}
+            port = next((port for port in range(first, last + 1)
+                         if port not in used and _port_is_free(port)), None)
+            if port is None:
+                raise RuntimeError(f"No free host port left in {first}-{last}")
+            if run_command(f"adb -s {serial} forward --no-rebind tcp:{port} {remote}", verbose) is None:
+                raise RuntimeError(f"adb could not forward tcp:{port} to {remote} on {serial}")
+            record = _record(serial, port, remote)
+
+        records = [r for r in records if not (r['serial'] == serial and r['remote'] == remote)] + [record]
+        _save_state(records)
+        return record
+
+
+def remove_forward(serial, device_port=DEFAULT_DEVICE_PORT, verbose=False):
+    """Remove the forward of serial to device_port; return the removed record or None"""
+    remote = f"tcp:{device_port}"
+    with _locked():
+        adb_forwards = list_adb_forwards(verbose)
+        removed = None
+        for forward in adb_forwards:
+            if forward['serial'] == serial and forward['remote'] == remote:
+                run_command(f"adb -s {serial} forward --remove {forward['local']}", verbose)
+                removed = _record(serial, _tcp_port(forward['local']), remote)
+        records = [r for r in _reconcile(adb_forwards) if not (r['serial'] == serial and r['remote'] == remote)]
+        _save_state(records)
+        return removed
+
+
+def prune(port_range=None, verbose=False):
+    """Tear down pool forwards of disconnected devices and forget mappings adb no longer has; return the removed records"""
+    first, last = parse_port_range(port_range)
+    with _locked():
+        adb_forwards = list_adb_forwards(verbose)
+        connected = {serial for serial, status in (list_devices(verbose) or []) if status == 'device'}
+        tracked = _load_state()
+        tracked_keys = {(record['serial'], record['port']) for record in tracked}
+        removed = []
+        for forward in adb_forwards:
+            port = _tcp_port(forward['local'])
+            if forward['serial'] in connected or not port:
+                continue
+            if first <= port <= last or (forward['serial'], port) in tracked_keys:
+                run_command(f"adb forward --remove {forward['local']}", verbose)
+                removed.append(_record(forward['serial'], port, forward['remote']))
+
+        live = _reconcile(adb_forwards)
+        removed.extend(record for record in tracked if record not in live)
+        _save_state([record for record in live if record['serial'] in connected])
+        return removed
+
+
+def forwards(verbose=False):
+    """Return the tracked forwards after checking them against `adb forward --list`"""
+    with _locked():
+        records = _reconcile(list_adb_forwards(verbose))
+        _save_state(records)
+        return records
+
+
+def lookup(serial, device_port=DEFAULT_DEVICE_PORT):
+    """Return the tracked forward record of serial without calling adb, or None"""
+    # The state file is replaced atomically, so reading it needs no lock
+    records = _load_state()
+    return next((record for record in records
+                 if record['serial'] == serial and record['remote'] == f"tcp:{device_port}"), None)
+
+
+def select_serials(all_devices=False, verbose=False):
+    """Return the serials a command applies to: every device, $ANDROID_SERIAL, or the only connected one"""
+    connected = [serial for serial, status in (list_devices(verbose) or []) if status == 'device']
+    if all_devices:
+        return connected
+    serial = os.environ.get('ANDROID_SERIAL')
+    if serial:
+        return [serial]
+    if len(connected) > 1:
+        raise RuntimeError("More than one device connected, set ANDROID_SERIAL or use --all")
+    if not connected:
+        raise RuntimeError("No devices connected via ADB")
+    return connected
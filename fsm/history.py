@@ -0,0 +1,301 @@
+"""
+Local history of the operations fsm runs, with per-phase timings.
+
+install, run and kill (from the CLI, the daemon or `fsm apply`) are each
+recorded as one operation: command, device serial, version, outcome, bytes
+moved and the time spent in each phase (discovery, download, push, start,
+verify, ...). Core code marks phase boundaries with enter(); the operation
+in progress is kept in a context variable, so nothing has to be passed
+around and the calls are no-ops outside an operation. Steps that run
+concurrently are timed on their own and added with add_phase(), and the
+time the concurrency saved is recorded as the 'overlap' phase.
+
+Recording must not slow the commands down, so a finished operation is only
+appended as one JSON line to a spool file next to the database. The spool is
+ingested into SQLite in a single transaction whenever the history is read
+(`fsm history`), and records older than RETENTION_DAYS are dropped then.
+Set $FSM_HISTORY=0 to turn recording off.
+"""
+
+import contextlib
+import contextvars
+import json
+import os
+import sqlite3
+import time
+import uuid
+
+from fsm.core import get_cache_dir
+
+HISTORY_ENV = 'FSM_HISTORY'
+RETENTION_DAYS = 180
+# Spool size (about ten thousand operations) at which the recording process ingests it itself
+SPOOL_LIMIT = 4 * 1024 * 1024
+# Steps of the discovery phase that install runs concurrently (plus the asset resolution that follows them)
+DISCOVERY_STEPS = ('connect', 'version', 'arch', 'lookup', 'resolve')
+# Lengths of the periods `fsm history stats --interval` groups by
+INTERVALS = {'hour': 3600, 'day': 86400, 'week': 7 * 86400}
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS operations (
+    id TEXT PRIMARY KEY,
+    started_at REAL NOT NULL,
+    command TEXT NOT NULL,
+    serial TEXT,
+    version TEXT,
+    outcome TEXT NOT NULL,
+    duration REAL NOT NULL,
+    bytes INTEGER NOT NULL DEFAULT 0
+);
+CREATE TABLE IF NOT EXISTS phases (
+    operation TEXT NOT NULL,
+    phase TEXT NOT NULL,
+    seconds REAL NOT NULL,
+    PRIMARY KEY (operation, phase)
+);
+CREATE INDEX IF NOT EXISTS operations_started_at ON operations (started_at);
+"""
+
+_current = contextvars.ContextVar('fsm_history_operation', default=None)
+_last = None
+
+
+def get_history_path():
+    """Return the path of the history database"""
+    return os.path.join(get_cache_dir(), 'history.db')
+
+
+def get_spool_path():
+    """Return the path of the spool finished operations are appended to"""
+    return os.path.join(get_cache_dir(), 'history.jsonl')
+
+
+def enabled():
+    """Return whether operations are recorded ($FSM_HISTORY=0 turns it off)"""
+    return os.environ.get(HISTORY_ENV, '1').lower() not in ('0', 'false', 'no', 'off')
+
+
+class Operation:
+    """An operation being timed; phases are laps between enter() calls"""
+
+    def __init__(self, command, serial=None, version=None):
+        serial = serial or os.environ.get('ANDROID_SERIAL')
+        self.record = {'id': uuid.uuid4().hex, 'started_at': time.time(), 'command': command, 'serial': serial,
+                       'version': version, 'outcome': 'ok', 'duration': 0.0, 'bytes': 0, 'phases': {}}
+        self._start = self._lap = time.monotonic()
+        self._phase = None
+
+    def enter(self, phase):
+        now = time.monotonic()
+        if self._phase:
+            phases = self.record['phases']
+            phases[self._phase] = phases.get(self._phase, 0.0) + now - self._lap
+        self._phase, self._lap = phase, now
+
+    def finish(self):
+        self.enter(None)
+        self.record['duration'] = time.monotonic() - self._start
+        return self.record
+
+
+@contextlib.contextmanager
+def operation(command, serial=None, version=None):
+    """Time the block as one operation and record it unless recording is off; yield the Operation"""
+    global _last
+    op = Operation(command, serial, version)
+    token = _current.set(op)
+    try:
+        yield op
+    except SystemExit as e:
+        # core reports failures by printing them and exiting
+        if e.code:
+            op.record['outcome'] = 'failed'
+        raise
+    except BaseException as e:
+        op.record['outcome'] = f"error: {type(e).__name__}"
+        raise
+    finally:
+        _current.reset(token)
+        _last = op.finish()
+        try:
+            if enabled():
+                _spool(_last)
+        except OSError:
+            pass
+
+
+def last():
+    """Return the record of the operation this process finished last, or None"""
+    return _last
+
+
+def enter(phase):
+    """Start timing phase in the current operation, ending the previous phase"""
+    op = _current.get()
+    if op is not None:
+        op.enter(phase)
+
+
+def add_phase(phase, seconds):
+    """Add a phase timed outside the enter() laps, e.g. one that overlapped others"""
+    op = _current.get()
+    if op is not None:
+        phases = op.record['phases']
+        phases[phase] = phases.get(phase, 0.0) + seconds
+
+
+def annotate(**fields):
+    """Set fields (version, outcome, serial) of the current operation"""
+    op = _current.get()
+    if op is not None:
+        op.record.update({key: value for key, value in fields.items() if value is not None})
+
+
+def add_bytes(count):
+    """Count bytes moved (downloaded or pushed) by the current operation"""
+    op = _current.get()
+    if op is not None:
+        op.record['bytes'] += count
+
+
+def describe(record):
+    """Return a one-line summary of an operation's phase timings and the overlap it achieved"""
+    phases = record['phases']
+    steps = [phase for phase in DISCOVERY_STEPS if phase in phases]
+    parts = []
+    for phase, seconds in phases.items():
+        if phase in steps or phase == 'overlap':
+            continue
+        text = f"{phase} {seconds * 1000:.0f} ms"
+        if phase == 'discovery' and steps:
+            text += (f" ({', '.join(f'{step} {phases[step] * 1000:.0f} ms' for step in steps)}; "
+                     f"{phases.get('overlap', 0.0) * 1000:.0f} ms overlapped)")
+        parts.append(text)
+    return f"{', '.join(parts)}; total {record['duration'] * 1000:.0f} ms"
+
+
+def _spool(record):
+    # One O_APPEND write per operation; the shared lock only excludes a concurrent ingest
+    fd = os.open(get_spool_path(), os.O_WRONLY | os.O_APPEND | os.O_CREAT, 0o644)
+    try:
+        _flock(fd, shared=True)
+        os.write(fd, (json.dumps(record, separators=(',', ':')) + '\n').encode())
+        size = os.fstat(fd).st_size
+    finally:
+        os.close(fd)
+    if size > SPOOL_LIMIT:
+        # Nobody has read the history for a long time; move the batch into the database now
+        open_history().close()
+
+
+def _flock(fd, shared=False):
+    try:
+        import fcntl
+    except ImportError:  # Windows
+        return
+    fcntl.flock(fd, fcntl.LOCK_SH if shared else fcntl.LOCK_EX)
+
+
+def ingest(conn):
+    """Move the spooled operations into the database in one transaction; return how many were added"""
+    path = get_spool_path()
+    try:
+        fd = os.open(path, os.O_RDWR)
+    except FileNotFoundError:
+        return 0
+    try:
+        _flock(fd)
+        with os.fdopen(os.dup(fd), 'rb') as f:
+            lines = f.read().splitlines()
+        records = []
+        for line in lines:
+            try:
+                records.append(json.loads(line))
+            except ValueError:
+                continue
+        with conn:
+            # Ids make a re-ingested spool (after a crash before the truncate) harmless
+            conn.executemany(
+                'INSERT OR IGNORE INTO operations (id, started_at, command, serial, version, outcome, duration, bytes) '
+                'VALUES (:id, :started_at, :command, :serial, :version, :outcome, :duration, :bytes)', records)
+            conn.executemany('INSERT OR IGNORE INTO phases (operation, phase, seconds) VALUES (?, ?, ?)',
+                             [(record['id'], phase, seconds)
+                              for record in records for phase, seconds in record['phases'].items()])
+            cutoff = time.time() - RETENTION_DAYS * 86400
+            conn.execute('DELETE FROM phases WHERE operation IN (SELECT id FROM operations WHERE started_at < ?)',
+                         (cutoff,))
+            conn.execute('DELETE FROM operations WHERE started_at < ?', (cutoff,))
+        os.ftruncate(fd, 0)
+        return len(records)
+    finally:
+        os.close(fd)
+
+
+def open_history(path=None):
+    """Open (and create if needed) the history database, ingesting the spool first"""
+    conn = sqlite3.connect(path or get_history_path())
+    conn.row_factory = sqlite3.Row
+    conn.executescript(SCHEMA)
+    ingest(conn)
+    return conn
+
+
+def recent(limit=20, serial=None, command=None, conn=None):
+    """Return the most recent operations, newest first, with their phases as a dict"""
+    conn = conn or open_history()
+    query = 'SELECT * FROM operations WHERE 1=1'
+    params = []
+    if serial:
+        query += ' AND serial = ?'
+        params.append(serial)
+    if command:
+        query += ' AND command = ?'
+        params.append(command)
+    query += ' ORDER BY started_at DESC LIMIT ?'
+    params.append(limit)
+    records = [dict(row) for row in conn.execute(query, params)]
+    for record in records:
+        record['phases'] = {row['phase']: row['seconds'] for row in
+                            conn.execute('SELECT phase, seconds FROM phases WHERE operation = ?', (record['id'],))}
+    return records
+
+
+def stats(serial=None, command=None, since=None, interval=None, per_device=True, conn=None):
+    """Return latency percentiles per (period, serial, command, phase), in milliseconds
+
+    since is a number of days; interval ('hour', 'day', 'week') splits the
+    samples into periods so trends show up. The 'total' phase is the whole
+    operation.
+    """
+    from fsm.stats import percentile
+
+    conn = conn or open_history()
+    query = ('SELECT o.started_at, o.serial, o.command, p.phase, p.seconds FROM phases p '
+             'JOIN operations o ON o.id = p.operation WHERE 1=1')
+    totals = 'SELECT started_at, serial, command, \'total\' AS phase, duration AS seconds FROM operations o WHERE 1=1'
+    filters = ''
+    params = []
+    if serial:
+        filters += ' AND o.serial = ?'
+        params.append(serial)
+    if command:
+        filters += ' AND o.command = ?'
+        params.append(command)
+    if since is not None:
+        filters += ' AND o.started_at >= ?'
+        params.append(time.time() - since * 86400)
+
+    length = INTERVALS.get(interval)
+    groups = {}
+    for row in conn.execute(f"{query}{filters} UNION ALL {totals}{filters}", params * 2):
+        period = time.strftime('%Y-%m-%d %H:%M', time.localtime(row['started_at'] // length * length)) if length else ''
+        key = (period, (row['serial'] or 'default') if per_device else '*', row['command'], row['phase'])
+        groups.setdefault(key, []).append(row['seconds'] * 1000)
+
+    records = []
+    for (period, device, command_name, phase), samples in sorted(groups.items()):
+        records.append({'period': period, 'serial': device, 'command': command_name, 'phase': phase,
+                        'count': len(samples), 'p50_ms': round(percentile(samples, 50), 1),
+                        'p95_ms': round(percentile(samples, 95), 1), 'p99_ms': round(percentile(samples, 99), 1),
+                        'max_ms': round(max(samples), 1)})
+    return records
@@ -0,0 +1,25 @@
+"""
+The one place fsm makes HTTP requests.
+
+open_url() builds a per-request opener (so a proxy given for one download
+does not leak into the next) and routes the request through the active
+fsm.cassette when recording or replaying.
+"""
+
+USER_AGENT = 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36'
+
+
+def open_url(url, proxy=None, timeout=30, headers=None):
+    """Open url (through proxy if given) and return the response; raises urllib errors"""
+    import urllib.request
+    from fsm import cassette
+
+    def run():
+        handlers = [urllib.request.ProxyHandler({'https': proxy, 'http': proxy})] if proxy else []
+        request = urllib.request.Request(url, headers=dict({'User-Agent': USER_AGENT}, **(headers or {})))
+        return urllib.request.build_opener(*handlers).open(request, timeout=timeout)
+
+    tape = cassette.current()
+    if tape is not None:
+        return tape.http(url, run)
+    return run()
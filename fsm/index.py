@@ -0,0 +1,264 @@
+"""
+Local SQLite index of GitHub releases and their frida-server assets.
+
+The index lives in the fsm cache directory and is only touched by the network
+when it is synced. Syncing walks the paginated releases API newest first,
+sends the stored ETag so an unchanged repository costs a single 304 response,
+and stops paging at the first release that is already indexed. Queries
+(`fsm versions`, asset resolution for `fsm install`) work offline.
+"""
+
+import os
+import re
+import sqlite3
+import time
+
+from rich import print as rich_print
+
+from fsm.core import get_cache_dir
+
+# Repositories synced when no repository is given
+DEFAULT_REPOS = ["frida/frida", "Ylarod/Florida"]
+DEFAULT_API_URL = "https://api.github.com"
+PER_PAGE = 100
+
+# Preferred archive formats when a release ships several for the same arch
+FORMAT_PREFERENCE = ['.xz', '.gz', '.tar.gz']
+
+ARCH_PATTERN = re.compile(r'-((?:android|linux|windows|macos|ios|freebsd|qnx)-[a-z0-9_]+?)(?:\.tar\.gz|\.[a-z0-9]+)?$')
+NEXT_LINK_PATTERN = re.compile(r'<([^>]+)>;\s*rel="next"')
+CLAUSE_PATTERN = re.compile(r'^(>=|<=|==|!=|>|<)?\s*(.+)$')
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS repos (
+    repo TEXT PRIMARY KEY,
+    etag TEXT,
+    synced_at REAL
+);
+CREATE TABLE IF NOT EXISTS releases (
+    repo TEXT NOT NULL,
+    tag TEXT NOT NULL,
+    version TEXT NOT NULL,
+    prerelease INTEGER NOT NULL DEFAULT 0,
+    published_at TEXT,
+    PRIMARY KEY (repo, tag)
+);
+CREATE TABLE IF NOT EXISTS assets (
+    repo TEXT NOT NULL,
+    tag TEXT NOT NULL,
+    name TEXT NOT NULL,
+    arch TEXT,
+    size INTEGER,
+    url TEXT NOT NULL,
+    PRIMARY KEY (repo, tag, name)
+);
+CREATE INDEX IF NOT EXISTS assets_arch ON assets (arch);
+"""
+
+
+def get_index_path():
+    """Return the path of the release index database"""
+    return os.path.join(get_cache_dir(), 'releases.db')
+
+
+def get_api_url():
+    """Return the GitHub API base URL ($FSM_GITHUB_API overrides it, e.g. for a mirror)"""
+    return os.environ.get('FSM_GITHUB_API', DEFAULT_API_URL).rstrip('/')
+
+
+def open_index(path=None):
+    """Open (and create if needed) the release index"""
+    conn = sqlite3.connect(path or get_index_path())
+    conn.row_factory = sqlite3.Row
+    conn.executescript(SCHEMA)
+    return conn
+
+
+def parse_version(version):
+    """Return a version string as a tuple of ints for ordering ('v16.1.4' -> (16, 1, 4))"""
+    return tuple(int(part) for part in re.findall(r'\d+', version or ''))
+
+
+def version_in_range(version, spec):
+    """Check a version against a comma-separated range such as '>=16,<17', '16.1' or '16.*'
+
+    A clause without an operator matches every version with that prefix.
+    """
+    key = parse_version(version)
+    for clause in (clause.strip() for clause in (spec or '').split(',')):
+        if not clause:
+            continue
+        op, target = CLAUSE_PATTERN.match(clause).groups()
+        target_key = parse_version(target)
+        if op is None:
+            if key[:len(target_key)] != target_key:
+                return False
+        elif not {
+            '>=': key >= target_key, '<=': key <= target_key,
+            '>': key > target_key, '<': key < target_key,
+            '==': key == target_key, '!=': key != target_key,
+        }[op]:
+            return False
+    return True
+
+
+def asset_arch(name):
+    """Return the platform-arch part of an asset name ('frida-server-16.1.4-android-arm64.xz' -> 'android-arm64')"""
+    match = ARCH_PATTERN.search(name)
+    return match.group(1) if match else None
+
+
+def arch_matches(arch, wanted):
+    """Match an indexed arch against 'android-arm64' or a bare 'arm64'"""
+    return not wanted or arch == wanted or (arch is not None and arch.endswith(f"-{wanted}"))
+
+
+def _request(url, proxy=None, etag=None):
+    """GET url and return (status, headers, body); a 304 is returned rather than raised"""
+    import urllib.error
+    from fsm.http import open_url
+
+    headers = {
+        'Accept': 'application/vnd.github+json',
+        'User-Agent': 'fsm (frida-server-manager)',
+    }
+    if etag:
+        headers['If-None-Match'] = etag
+    try:
+        with open_url(url, proxy, timeout=10, headers=headers) as response:
+            return response.status, response.headers, response.read()
+    except urllib.error.HTTPError as e:
+        if e.code == 304:
+            return 304, e.headers, b''
+        raise
+
+
+def _store_release(conn, repo, release):
+    """Insert or update one release and its server assets; return True if the release was new"""
+    tag = release['tag_name']
+    known = conn.execute('SELECT 1 FROM releases WHERE repo = ? AND tag = ?', (repo, tag)).fetchone()
+    conn.execute(
+        'INSERT OR REPLACE INTO releases (repo, tag, version, prerelease, published_at) VALUES (?, ?, ?, ?, ?)',
+        (repo, tag, tag.lstrip('v'), int(bool(release.get('prerelease'))), release.get('published_at')))
+    for asset in release.get('assets', []):
+        if 'server' not in asset['name']:
+            continue
+        conn.execute(
+            'INSERT OR REPLACE INTO assets (repo, tag, name, arch, size, url) VALUES (?, ?, ?, ?, ?, ?)',
+            (repo, tag, asset['name'], asset_arch(asset['name']), asset.get('size'), asset['browser_download_url']))
+    return known is None
+
+
+def sync_repo(repo, verbose=False, proxy=None, conn=None):
+    """Bring the index up to date for repo; return the number of new releases"""
+    import json
+
+    own_conn = conn is None
+    conn = conn or open_index()
+    try:
+        row = conn.execute('SELECT etag FROM repos WHERE repo = ?', (repo,)).fetchone()
+        etag = row['etag'] if row else None
+        url = f"{get_api_url()}/repos/{repo}/releases?per_page={PER_PAGE}"
+        new_releases = 0
+        first_page = True
+
+        while url:
+            if verbose:
+                rich_print(f"Fetching {url}")
+            status, headers, body = _request(url, proxy, etag if first_page else None)
+            if status == 304:
+                if verbose:
+                    rich_print(f"{repo} is unchanged since the last sync")
+                break
+            if first_page:
+                etag = headers.get('ETag')
+                first_page = False
+
+            releases = [release for release in json.loads(body.decode()) if not release.get('draft')]
+            page_new = sum(_store_release(conn, repo, release) for release in releases)
+            new_releases += page_new
+            # Releases come newest first, so once a known one shows up the rest is already indexed
+            if page_new < len(releases) and row is not None:
+                break
+            match = NEXT_LINK_PATTERN.search(headers.get('Link') or '')
+            url = match.group(1) if match else None
+
+        conn.execute('INSERT OR REPLACE INTO repos (repo, etag, synced_at) VALUES (?, ?, ?)',
+                     (repo, etag, time.time()))
+        conn.commit()
+        if verbose:
+            rich_print(f"Indexed {new_releases} new release(s) of {repo}")
+        return new_releases
+    finally:
+        if own_conn:
+            conn.close()
+
+
+def indexed_repos(conn=None):
+    """Return the repositories present in the index"""
+    own_conn = conn is None
+    conn = conn or open_index()
+    try:
+        return [row['repo'] for row in conn.execute('SELECT repo FROM repos ORDER BY repo')]
+    finally:
+        if own_conn:
+            conn.close()
+
+
+def search(repos=None, version_range=None, arch=None, prerelease=True, conn=None):
+    """Return asset records (repo, version, arch, asset, size, url, published_at), newest version first"""
+    own_conn = conn is None
+    conn = conn or open_index()
+    try:
+        query = ('SELECT r.repo, r.version, r.prerelease, r.published_at, a.name, a.arch, a.size, a.url '
+                 'FROM releases r JOIN assets a ON a.repo = r.repo AND a.tag = r.tag')
+        params = []
+        if repos:
+            query += f" WHERE r.repo IN ({', '.join('?' for _ in repos)})"
+            params.extend(repos)
+        rows = conn.execute(query, params).fetchall()
+    finally:
+        if own_conn:
+            conn.close()
+
+    records = [
+        {
+            'repo': row['repo'],
+            'version': row['version'],
+            'arch': row['arch'],
+            'asset': row['name'],
+            'size': row['size'],
+            'url': row['url'],
+            'published_at': row['published_at'],
+        }
+        for row in rows
+        if (prerelease or not row['prerelease'])
+        and arch_matches(row['arch'], arch)
+        and version_in_range(row['version'], version_range)
+    ]
+    records.sort(key=lambda record: (record['repo'], record['asset']))
+    records.sort(key=lambda record: parse_version(record['version']), reverse=True)
+    return records
+
+
+def _format_rank(name):
+    for rank, suffix in enumerate(FORMAT_PREFERENCE):
+        if name.endswith(suffix):
+            return rank
+    return len(FORMAT_PREFERENCE)
+
+
+def resolve_asset(repo, version, arch, conn=None):
+    """Return the indexed asset record of repo's release version for arch, or None
+
+    arch is required: unlike search(), a missing arch must not match whichever asset comes first.
+    """
+    if not arch:
+        raise ValueError(f"No architecture given to resolve {repo} {version}")
+    candidates = [
+        record for record in search([repo], f"=={version}", conn=conn)
+        if record['version'] == version.lstrip('v') and arch_matches(record['arch'], arch)
+    ]
+    if not candidates:
+        return None
+    return min(candidates, key=lambda record: _format_rank(record['asset']))
@@ -0,0 +1,105 @@
+"""
+Advisory file locks and atomic writes for state shared between fsm processes.
+
+Locks are flock(2) locks on files under the fsm cache directory, so they are
+released automatically when a process dies. On platforms without fcntl the
+locks are no-ops. device_lock() serializes the operations that change a
+device (install, run, kill, gc) across processes; read-only queries never
+take it.
+"""
+
+import contextlib
+import os
+import re
+import time
+
+try:
+    import fcntl
+except ImportError:  # Windows
+    fcntl = None
+
+
+def get_lock_path(name):
+    """Return the path of the named lock file in the fsm cache directory"""
+    from fsm.core import get_cache_dir
+    lock_dir = os.path.join(get_cache_dir(), 'locks')
+    os.makedirs(lock_dir, exist_ok=True)
+    return os.path.join(lock_dir, f"{name}.lock")
+
+
+@contextlib.contextmanager
+def file_lock(path, shared=False, timeout=None, poll_interval=0.05):
+    """Hold an exclusive (or shared) lock on path for the duration of the block
+
+    Raises TimeoutError if the lock cannot be taken within timeout seconds.
+    """
+    with open(path, 'a') as handle:
+        if fcntl is None:
+            yield
+            return
+
+        mode = fcntl.LOCK_SH if shared else fcntl.LOCK_EX
+        if timeout is None:
+            fcntl.flock(handle, mode)
+        else:
+            deadline = time.monotonic() + timeout
+            while True:
+                try:
+                    fcntl.flock(handle, mode | fcntl.LOCK_NB)
+                    break
+                except BlockingIOError:
+                    if time.monotonic() >= deadline:
+                        raise TimeoutError(f"Timed out waiting for lock {path}")
+                    time.sleep(poll_interval)
+        try:
+            yield
+        finally:
+            fcntl.flock(handle, fcntl.LOCK_UN)
+
+
+def resolve_serial(serial=None):
+    """Return serial, else $ANDROID_SERIAL, else the serial of the one device adb picks (None if there is none)"""
+    serial = serial or os.environ.get('ANDROID_SERIAL')
+    if serial:
+        return serial
+    from fsm.core import run_command
+    from fsm.deadline import QUERY_TIMEOUT
+    output = run_command("adb get-serialno", timeout=QUERY_TIMEOUT)
+    serial = output.strip() if output else ''
+    return serial if serial and serial != 'unknown' else None
+
+
+@contextlib.contextmanager
+def device_lock(serial, timeout=None):
+    """Hold the lock serializing state-changing operations on the device serial across fsm processes
+
+    Without a serial the lock is named after the device adb picks, so
+    `fsm -s <serial>` and a plain `fsm` on a single device exclude each other.
+    """
+    name = re.sub(r'[^\w.-]', '_', resolve_serial(serial) or 'default')
+    with file_lock(get_lock_path(f"device-{name}"), timeout=timeout):
+        yield
+
+
+@contextlib.contextmanager
+def atomic_path(path):
+    """Yield a temporary path to write path's new content to; it replaces path only if the block succeeds"""
+    import tempfile
+    handle, tmp_path = tempfile.mkstemp(prefix=f".{os.path.basename(path)}.", suffix='.tmp',
+                                        dir=os.path.dirname(path) or '.')
+    os.close(handle)
+    try:
+        yield tmp_path
+        with open(tmp_path, 'rb') as f:
+            os.fsync(f.fileno())
+        os.replace(tmp_path, path)
+    finally:
+        if os.path.exists(tmp_path):
+            os.unlink(tmp_path)
+
+
+def atomic_write(path, data):
+    """Write data (str or bytes) to path so readers see either the old or the new content"""
+    with atomic_path(path) as tmp_path:
+        with open(tmp_path, 'wb' if isinstance(data, bytes) else 'w') as f:
+            f.write(data)
@@ -0,0 +1,279 @@
+"""
+frida-server output capture.
+
+`fsm run --log` starts frida-server with stdout and stderr appended to
+DEVICE_LOG_PATH instead of /dev/null, rotating the previous log on the device
+first. The host keeps a copy in the fsm cache directory (logs/<serial>/):
+DeviceLog transfers only the bytes it has not seen yet, using the device
+file's inode and the byte offset recorded next to the copy, and writes them
+to a bounded in-memory ring buffer and to size-capped rotating files.
+tail_lines() and follow_file() read those files from the end, so `fsm logs`
+never re-reads whole files.
+
+Only one process follows a device log at a time (the fsm daemon when it is
+running); it holds the log's file lock, and everyone else reads its copy.
+"""
+
+import collections
+import json
+import os
+import signal
+import subprocess
+import time
+
+from fsm.lock import atomic_write, file_lock
+
+DEVICE_LOG_DIR = '/data/local/tmp/fsm-logs'
+DEVICE_LOG_PATH = f'{DEVICE_LOG_DIR}/frida-server.log'
+# Previous device logs kept as frida-server.log.1 .. .N
+DEVICE_LOG_BACKUPS = 2
+
+MAX_BYTES = 1024 * 1024
+BACKUP_COUNT = 3
+RING_SIZE = 1000
+
+
+def get_log_dir(serial=None):
+    """Return the host directory holding the copy of serial's frida-server log"""
+    from fsm.core import get_cache_dir
+    log_dir = os.path.join(get_cache_dir(), 'logs', serial or os.environ.get('ANDROID_SERIAL') or 'default')
+    os.makedirs(log_dir, exist_ok=True)
+    return log_dir
+
+
+def get_log_path(serial=None):
+    """Return the path of the host copy of serial's frida-server log"""
+    return os.path.join(get_log_dir(serial), 'frida-server.log')
+
+
+def device_log_setup(path=DEVICE_LOG_PATH, backups=DEVICE_LOG_BACKUPS):
+    """Return the device shell commands that rotate the log at path and create an empty one readable by adb"""
+    commands = [f"mkdir -p {os.path.dirname(path)}"]
+    for index in range(backups, 1, -1):
+        commands.append(f"mv -f {path}.{index - 1} {path}.{index} 2>/dev/null")
+    commands.append(f"mv -f {path} {path}.1 2>/dev/null")
+    commands.append(f"touch {path}")
+    commands.append(f"chmod 644 {path}")
+    return '; '.join(commands)
+
+
+class RotatingLog:
+    """Append-only text file that is rotated to path.1 .. path.N once it would exceed max_bytes"""
+
+    def __init__(self, path, max_bytes=MAX_BYTES, backup_count=BACKUP_COUNT):
+        self.path = path
+        self.max_bytes = max_bytes
+        self.backup_count = backup_count
+        self._handle = None
+        self._size = 0
+
+    def write(self, lines):
+        data = ''.join(f"{line}\n" for line in lines).encode()
+        if not data:
+            return
+        if self._handle is None:
+            self._handle = open(self.path, 'ab')
+            self._size = self._handle.tell()
+        if self._size and self._size + len(data) > self.max_bytes:
+            self.rotate()
+        self._handle.write(data)
+        self._handle.flush()
+        self._size += len(data)
+
+    def rotate(self):
+        if self._handle:
+            self._handle.close()
+        for index in range(self.backup_count, 0, -1):
+            source = f"{self.path}.{index - 1}" if index > 1 else self.path
+            if os.path.exists(source):
+                os.replace(source, f"{self.path}.{index}")
+        self._handle = open(self.path, 'ab')
+        self._size = 0
+
+    def close(self):
+        if self._handle:
+            self._handle.close()
+            self._handle = None
+
+
+def _last_lines(path, count, block_size=8192):
+    """Return the last count lines of path, reading backwards from the end in blocks"""
+    with open(path, 'rb') as f:
+        f.seek(0, os.SEEK_END)
+        position = f.tell()
+        data = b''
+        while position > 0 and data.count(b'\n') <= count:
+            step = min(block_size, position)
+            position -= step
+            f.seek(position)
+            data = f.read(step) + data
+    lines = data.decode(errors='replace').splitlines()
+    return lines[-count:] if count else []
+
+
+def tail_lines(path, count, backup_count=BACKUP_COUNT):
+    """Return the last count lines of a rotating log, continuing into its backups when needed"""
+    lines = []
+    for index in range(backup_count + 1):
+        source = f"{path}.{index}" if index else path
+        if len(lines) >= count or not os.path.exists(source):
+            break
+        lines = _last_lines(source, count - len(lines)) + lines
+    return lines
+
+
+def follow_file(path, poll_interval=0.2):
+    """Yield lines appended to path from its current end, reopening it when it is rotated"""
+    handle = None
+    partial = b''
+    try:
+        while True:
+            if handle is None:
+                if not os.path.exists(path):
+                    time.sleep(poll_interval)
+                    continue
+                handle = open(path, 'rb')
+                handle.seek(0, os.SEEK_END)
+            chunk = handle.readline()
+            if chunk:
+                partial += chunk
+                if partial.endswith(b'\n'):
+                    yield partial.decode(errors='replace').rstrip('\n')
+                    partial = b''
+                continue
+            try:
+                rotated = os.stat(path).st_ino != os.fstat(handle.fileno()).st_ino
+            except FileNotFoundError:
+                rotated = True
+            if rotated:
+                # Finish the old file first, then continue from the start of the new one
+                rest = handle.read()
+                handle.close()
+                for line in (partial + rest).decode(errors='replace').splitlines():
+                    yield line
+                partial = b''
+                handle = open(path, 'rb') if os.path.exists(path) else None
+                continue
+            time.sleep(poll_interval)
+    finally:
+        if handle:
+            handle.close()
+
+
+class DeviceLog:
+    """Host-side copy of one device's frida-server log with a ring buffer of the recent lines"""
+
+    def __init__(self, device, device_path=DEVICE_LOG_PATH, max_bytes=MAX_BYTES,
+                 backup_count=BACKUP_COUNT, ring_size=RING_SIZE):
+        self.device = device
+        self.device_path = device_path
+        self.path = get_log_path(device.serial)
+        self.ring = collections.deque(maxlen=ring_size)
+        self.file = RotatingLog(self.path, max_bytes, backup_count)
+        self.following = False
+        self._state_path = os.path.join(os.path.dirname(self.path), 'device-log.json')
+        self._process = None
+
+    def _load_state(self):
+        if not os.path.exists(self._state_path):
+            return {'inode': None, 'offset': 0}
+        with open(self._state_path) as f:
+            return json.load(f)
+
+    def _save_state(self, state):
+        atomic_write(self._state_path, json.dumps(state))
+
+    def _locked(self):
+        # Fail immediately when another process is following this device's log
+        return file_lock(self._state_path + '.lock', timeout=0)
+
+    def _add(self, lines):
+        self.ring.extend(lines)
+        self.file.write(lines)
+
+    def _fetch(self, state):
+        """Copy device log bytes after state['offset']; return the new complete lines"""
+        path = self.device_path
+        output = self.device.shell(f'"stat -c %i:%s {path} && tail -c +{state["offset"] + 1} {path}"')
+        if output is None:
+            # No log on the device (frida-server was never started with --log)
+            return []
+        header, _, data = output.partition('\n')
+        inode, _, size = header.partition(':')
+        if inode != state['inode'] or int(size) < state['offset']:
+            # The device log was rotated or truncated, start over from its beginning
+            state.update(inode=inode, offset=0)
+            output = self.device.shell(f"cat {path}")
+            data = output or ''
+
+        # Keep an incomplete last line on the device until it is finished
+        complete = data[:data.rfind('\n') + 1]
+        state['offset'] += len(complete.encode())
+        lines = complete.splitlines()
+        self._add(lines)
+        return lines
+
+    def pull(self):
+        """Copy new device log lines to the host and return them, or None if another process is following the log"""
+        try:
+            with self._locked():
+                state = self._load_state()
+                lines = self._fetch(state)
+                self._save_state(state)
+                return lines
+        except TimeoutError:
+            return None
+
+    def follow(self, save_interval=1.0):
+        """Yield device log lines as they are written, copying them to the host
+
+        Raises TimeoutError when another process is already following the log.
+        """
+        with self._locked():
+            state = self._load_state()
+            for line in self._fetch(state):
+                yield line
+            self._save_state(state)
+
+            command = f'{self.device.adb} shell "tail -c +{state["offset"] + 1} -f {self.device_path}"'
+            if self.device.verbose:
+                from rich import print as rich_print
+                rich_print(f"Running command: {command}")
+            # A session of its own lets stop() kill adb together with anything it spawned
+            self._process = subprocess.Popen(command, shell=True, stdout=subprocess.PIPE,
+                                             stderr=subprocess.DEVNULL, start_new_session=True)
+            self.following = True
+            saved_at = time.monotonic()
+            try:
+                for raw in self._process.stdout:
+                    line = raw.decode(errors='replace').rstrip('\n')
+                    state['offset'] += len(raw)
+                    self._add([line])
+                    if time.monotonic() - saved_at > save_interval:
+                        self._save_state(state)
+                        saved_at = time.monotonic()
+                    yield line
+            finally:
+                self.following = False
+                process = self._process
+                self.stop()
+                if process:
+                    process.wait()
+                    process.stdout.close()
+                self._save_state(state)
+
+    def stop(self):
+        """Stop a running follow(); safe to call from another thread"""
+        process, self._process = self._process, None
+        if process is None or process.poll() is not None:
+            return
+        try:
+            os.killpg(process.pid, signal.SIGKILL)
+        except (ProcessLookupError, PermissionError, AttributeError):
+            process.kill()
+
+    def recent(self, count):
+        """Return the last count lines, from the ring buffer when it holds enough"""
+        if len(self.ring) >= count:
+            return list(self.ring)[-count:] if count else []
+        return tail_lines(self.path, count, self.file.backup_count)
@@ -0,0 +1,127 @@
+"""
+Device-side manifest of installed frida-server binaries.
+
+install_frida_server() appends one JSON line per installed binary to
+MANIFEST_NAME in the install directory: name, version, arch, sha256, size,
+mtime, install time and source URL. The version comes from the release
+being installed, or from scan_elf() on the host for --url installs. load()
+reads the manifest with one `cat`, in the same round trip as a `stat` of the
+directory, and keeps only entries whose file still has the recorded size and
+mtime, so `list` and `run --version` only execute binaries the manifest does
+not describe.
+"""
+
+import base64
+import hashlib
+import json
+import mmap
+import re
+import time
+
+MANIFEST_NAME = '.fsm-manifest.jsonl'
+_SEPARATOR = '@@fsm-manifest@@'
+
+# e_machine values of the architectures frida-server is built for
+ELF_MACHINES = {0x28: 'android-arm', 0xB7: 'android-arm64', 0x03: 'android-x86', 0x3E: 'android-x86_64'}
+# A version string stored on its own in the string table, e.g. b"\x0016.1.4\x00"
+_VERSION_STRING_RE = re.compile(rb'\x00(\d{1,3}\.\d{1,3}\.\d{1,3})\x00')
+
+
+def scan_elf(path):
+    """Return (arch, version) of an ELF frida-server at path on the host; either may be None"""
+    with open(path, 'rb') as f:
+        header = f.read(20)
+        if len(header) < 20 or header[:4] != b'\x7fELF':
+            return None, None
+        byteorder = 'little' if header[5] == 1 else 'big'
+        arch = ELF_MACHINES.get(int.from_bytes(header[18:20], byteorder))
+
+        # Scan the mapped file instead of reading tens of megabytes into memory
+        counts = {}
+        with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as data:
+            for match in _VERSION_STRING_RE.finditer(data):
+                version = match.group(1).decode()
+                counts[version] = counts.get(version, 0) + 1
+    if not counts:
+        return arch, None
+    # frida's own version is the one referenced most; prefer the newer on ties
+    version = max(counts, key=lambda v: (counts[v], tuple(int(part) for part in v.split('.'))))
+    return arch, version
+
+
+def sha256_file(path):
+    """Return the hex sha256 of a host file"""
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(1024 * 1024), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def build_entry(local_path, remote_path, version=None, arch=None, source=None):
+    """Describe the host file about to be installed at remote_path; size and mtime are filled in after the push"""
+    scanned_arch, scanned_version = scan_elf(local_path)
+    return {
+        'name': remote_path.rsplit('/', 1)[-1],
+        'version': version or scanned_version,
+        'arch': arch or scanned_arch,
+        'sha256': sha256_file(local_path),
+        'size': None,
+        'mtime': None,
+        'installed_at': int(time.time()),
+        'source': source,
+    }
+
+
+def append_command(server_dir, entry):
+    """Return the device shell command appending entry to the manifest of server_dir"""
+    # base64 keeps the JSON intact through both the host and the device shell
+    encoded = base64.b64encode(json.dumps(entry, sort_keys=True).encode()).decode()
+    return f"(echo {encoded} | base64 -d; echo) >> {server_dir}/{MANIFEST_NAME}"
+
+
+def parse(text):
+    """Return the manifest entries by name; later lines replace earlier ones"""
+    entries = {}
+    for line in text.splitlines():
+        line = line.strip()
+        if not line:
+            continue
+        try:
+            entry = json.loads(line)
+        except ValueError:
+            continue
+        if isinstance(entry, dict) and entry.get('name'):
+            entries[entry['name']] = entry
+    return entries
+
+
+def load_command(server_dir):
+    """Return the device shell command printing the manifest and the size and mtime of the files in server_dir"""
+    return (f"cat {server_dir}/{MANIFEST_NAME} 2>/dev/null; echo {_SEPARATOR}; "
+            f"cd {server_dir} && stat -c %s:%Y:%n * 2>/dev/null; true")
+
+
+def parse_listing(output):
+    """Split the output of load_command() into (entries of unchanged files, {name: (size, mtime)} of all files)"""
+    if not output:
+        return {}, {}
+    manifest, _, listing = output.partition(_SEPARATOR)
+    current = {}
+    for line in listing.splitlines():
+        parts = line.strip().split(':', 2)
+        if len(parts) == 3 and parts[0].isdigit() and parts[1].isdigit():
+            current[parts[2]] = (int(parts[0]), int(parts[1]))
+    entries = {name: entry for name, entry in parse(manifest).items()
+               if current.get(name) == (entry.get('size'), entry.get('mtime'))}
+    return entries, current
+
+
+def current_entries(output):
+    """Return the entries in the output of load_command() whose files still have the recorded size and mtime"""
+    return parse_listing(output)[0]
+
+
+def load(server_dir, device):
+    """Return the manifest entries of server_dir whose files are unchanged, in one adb round trip"""
+    return current_entries(device.query(f'"{load_command(server_dir)}"'))
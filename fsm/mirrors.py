@@ -0,0 +1,210 @@
+"""
+Download mirrors for frida-server release assets.
+
+Mirrors come from `fsm install --mirror` and $FSM_MIRRORS (comma separated).
+A mirror is either a base URL that replaces the scheme and host of the asset
+URL (https://mirror.example/gh serves /gh/frida/frida/releases/download/...),
+or a template containing {url}, which is replaced by the whole GitHub URL
+(for proxies such as https://ghproxy.example/{url}).
+
+race() opens connections to the best ranked mirrors at once and keeps the
+first one whose response is valid and delivers SAMPLE_BYTES; the others are
+closed as soon as there is a winner. The time to first byte and the early
+throughput of every attempt are kept in mirrors.json in the fsm cache
+directory, and rank() uses them to decide which mirrors to race next time.
+"""
+
+import json
+import os
+import threading
+import time
+
+from fsm.http import open_url
+from fsm.lock import atomic_write, file_lock
+
+MIRRORS_ENV = 'FSM_MIRRORS'
+
+# Mirrors raced at once
+RACE_WIDTH = 3
+# Bytes a mirror must deliver before it can win the race
+SAMPLE_BYTES = 64 * 1024
+CHUNK_SIZE = 8192
+# Weight of the newest sample in the moving average of a mirror's throughput
+EWMA_WEIGHT = 0.3
+
+
+def configured_mirrors(mirrors=None):
+    """Return mirrors plus the ones in $FSM_MIRRORS, without duplicates"""
+    configured = list(mirrors or [])
+    configured += [mirror.strip() for mirror in os.environ.get(MIRRORS_ENV, '').split(',') if mirror.strip()]
+    return list(dict.fromkeys(mirror.rstrip('/') for mirror in configured))
+
+
+def origin(url):
+    """Return scheme://host[:port] of url"""
+    from urllib.parse import urlsplit
+    parts = urlsplit(url)
+    return f"{parts.scheme}://{parts.netloc}"
+
+
+def mirror_url(mirror, url):
+    """Return the URL of the asset at url on mirror"""
+    if '{url}' in mirror:
+        return mirror.replace('{url}', url)
+    return mirror + url[len(origin(url)):]
+
+
+def get_stats_path():
+    """Return the path of the per-mirror performance stats"""
+    from fsm.core import get_cache_dir
+    return os.path.join(get_cache_dir(), 'mirrors.json')
+
+
+def load_stats():
+    """Return the recorded stats by mirror"""
+    try:
+        with open(get_stats_path()) as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {}
+
+
+def record(results):
+    """Merge race results (mirror, ok, ttfb, throughput) into the stored stats"""
+    path = get_stats_path()
+    with file_lock(path + '.lock'):
+        stats = load_stats()
+        for result in results:
+            entry = stats.setdefault(result['mirror'], {'successes': 0, 'failures': 0, 'throughput': None,
+                                                        'ttfb': None, 'last_ok': None, 'last_used': None})
+            entry['last_used'] = time.time()
+            entry['last_ok'] = result['ok']
+            if not result['ok']:
+                entry['failures'] += 1
+                continue
+            entry['successes'] += 1
+            for key in ('throughput', 'ttfb'):
+                if result[key] is not None:
+                    previous = entry[key]
+                    entry[key] = result[key] if previous is None else \
+                        EWMA_WEIGHT * result[key] + (1 - EWMA_WEIGHT) * previous
+        atomic_write(path, json.dumps(stats, indent=1, sort_keys=True))
+
+
+def rank(mirrors, stats=None):
+    """Order mirrors for racing: untried ones first, then by throughput; mirrors that failed last go last"""
+    stats = load_stats() if stats is None else stats
+
+    def key(mirror):
+        entry = stats.get(mirror)
+        if entry is None:
+            return (0, 0.0)
+        if entry['last_ok'] is False:
+            return (2, -(entry['throughput'] or 0.0))
+        return (1, -(entry['throughput'] or 0.0))
+    return sorted(mirrors, key=key)
+
+
+class Attempt:
+    """One mirror's connection during a race"""
+
+    def __init__(self, mirror, url):
+        self.mirror = mirror
+        self.url = url
+        self.response = None
+        self.head = b''
+        self.error = None
+        self.ttfb = None
+        self.throughput = None
+        # Set once the sample (or the whole, smaller file) has arrived
+        self.completed_at = None
+        self.selected = False
+
+    def result(self):
+        return {'mirror': self.mirror, 'ok': self.error is None, 'ttfb': self.ttfb, 'throughput': self.throughput}
+
+    def close(self):
+        if self.response is not None:
+            self.response.close()
+
+
+def _sample(attempt, done, proxy, sample_bytes):
+    start = time.monotonic()
+    try:
+        attempt.response = open_url(attempt.url, proxy)
+        if attempt.response.status != 200:
+            raise Exception(f"HTTP error {attempt.response.status}")
+        while not done.is_set():
+            chunk = attempt.response.read(CHUNK_SIZE)
+            if attempt.ttfb is None:
+                attempt.ttfb = time.monotonic() - start
+            attempt.head += chunk
+            if not chunk or len(attempt.head) >= sample_bytes:
+                attempt.completed_at = time.monotonic()
+                break
+        if attempt.head:
+            # A cancelled attempt still tells how fast the mirror was going
+            attempt.throughput = len(attempt.head) / max(time.monotonic() - start - attempt.ttfb, 1e-6)
+    except Exception as e:
+        # Errors caused by the cancellation closing the connection are not the mirror's fault
+        if not done.is_set():
+            attempt.error = e
+    finally:
+        if done.is_set() and not attempt.selected:
+            attempt.close()
+
+
+def race(candidates, proxy=None, verbose=False, width=RACE_WIDTH, sample_bytes=SAMPLE_BYTES):
+    """Race the best ranked (mirror, url) candidates; return the winning Attempt with its response still open
+
+    The winner's first bytes are in attempt.head and the rest is read from
+    attempt.response. Raises the last error if every mirror failed.
+    """
+    urls = dict(candidates)
+    ranked = rank(list(urls))[:width]
+    attempts = [Attempt(mirror, urls[mirror]) for mirror in ranked]
+    finished = threading.Condition()
+    done = threading.Event()
+
+    def run(attempt):
+        _sample(attempt, done, proxy, sample_bytes)
+        with finished:
+            finished.notify_all()
+
+    threads = [threading.Thread(target=run, args=(attempt,), daemon=True) for attempt in attempts]
+    for thread in threads:
+        thread.start()
+
+    def first_complete():
+        complete = [attempt for attempt in attempts if attempt.completed_at is not None]
+        return min(complete, key=lambda attempt: attempt.completed_at) if complete else None
+
+    with finished:
+        while first_complete() is None and any(thread.is_alive() for thread in threads):
+            finished.wait(0.1)
+    winner = first_complete()
+    if winner:
+        winner.selected = True
+    # Cancel the others: they stop reading at their next chunk and their connections are closed
+    done.set()
+    for thread in threads:
+        thread.join(1)
+    for attempt in attempts:
+        if attempt is not winner:
+            attempt.close()
+
+    try:
+        # Attempts cancelled before their first byte say nothing about their mirror
+        record([attempt.result() for attempt in attempts if attempt.error or attempt.ttfb is not None])
+    except OSError:
+        pass
+    if verbose:
+        from rich import print as rich_print
+        for attempt in attempts:
+            state = attempt.error or (f"{attempt.throughput / 1024:.0f} KiB/s" if attempt.throughput else "cancelled")
+            rich_print(f"Mirror {attempt.mirror}: {state}{' (selected)' if attempt is winner else ''}")
+
+    if winner is None:
+        errors = [attempt.error for attempt in attempts if attempt.error]
+        raise errors[-1] if errors else Exception("No mirror delivered the file")
+    return winner
@@ -0,0 +1,76 @@
+import sys
+from enum import Enum
+
+
+class OutputFormat(str, Enum):
+    """Output formats supported by the listing commands"""
+    table = "table"
+    json = "json"
+    ndjson = "ndjson"
+    tsv = "tsv"
+
+
+# Field order used for each record type in machine-readable output
+DEVICE_FIELDS = ['serial', 'model', 'status']
+FILE_FIELDS = ['filename', 'path', 'version', 'aliases']
+PROCESS_FIELDS = ['pid', 'user', 'memory', 'command']
+VERSION_FIELDS = ['repo', 'version', 'arch', 'asset', 'size', 'url', 'published_at']
+FORWARD_FIELDS = ['serial', 'endpoint', 'port', 'remote']
+PROBE_FIELDS = ['iteration', 'connect_ms', 'response_ms', 'ok', 'error']
+EVENT_FIELDS = ['serial', 'time', 'kind', 'pid', 'process', 'tag', 'message']
+GC_FIELDS = ['path', 'version', 'size', 'last_used', 'running', 'action', 'reason', 'freed']
+APPLY_FIELDS = ['serial', 'action', 'detail', 'status']
+HISTORY_FIELDS = ['time', 'command', 'serial', 'version', 'outcome', 'duration_ms', 'bytes', 'phases']
+HISTORY_STATS_FIELDS = ['period', 'serial', 'command', 'phase', 'count', 'p50_ms', 'p95_ms', 'p99_ms', 'max_ms']
+
+
+def _tsv_value(value):
+    if value is None:
+        return ''
+    if isinstance(value, list):
+        value = ','.join(map(str, value))
+    return str(value).replace('\\', '\\\\').replace('\t', '\\t').replace('\n', '\\n')
+
+
+def write_records(records, output_format, fields, stream=None):
+    """Write records (dicts) as they are produced, without any rich rendering.
+
+    json writes a single array, ndjson one object per line and tsv a header
+    row followed by tab-separated values. Each record is flushed as soon as
+    it is written so consumers such as `jq` can process output incrementally.
+    Returns the number of records written.
+    """
+    stream = stream if stream is not None else sys.stdout
+    output_format = OutputFormat(output_format)
+    count = 0
+
+    if output_format == OutputFormat.tsv:
+        stream.write('\t'.join(fields) + '\n')
+        for record in records:
+            stream.write('\t'.join(_tsv_value(record.get(field)) for field in fields) + '\n')
+            stream.flush()
+            count += 1
+        stream.flush()
+        return count
+
+    import json
+
+    if output_format == OutputFormat.ndjson:
+        for record in records:
+            stream.write(json.dumps({field: record.get(field) for field in fields}) + '\n')
+            stream.flush()
+            count += 1
+        return count
+
+    if output_format == OutputFormat.json:
+        stream.write('[')
+        for record in records:
+            stream.write(',\n' if count else '\n')
+            stream.write(json.dumps({field: record.get(field) for field in fields}))
+            stream.flush()
+            count += 1
+        stream.write('\n]\n' if count else ']\n')
+        stream.flush()
+        return count
+
+    raise ValueError(f"Unsupported machine output format: {output_format.value}")
@@ -0,0 +1,104 @@
+"""
+Connection latency probe for a running frida-server.
+
+frida-server speaks D-Bus over a WebSocket, so the first thing any client
+does is an HTTP/1.1 upgrade of GET /ws. probe() opens a fresh TCP
+connection per iteration, completes that handshake and records how long
+the connect and the first response took. wait_until_ready() repeats the
+handshake until it succeeds, which makes it usable as a readiness gate
+after `fsm run`.
+"""
+
+import base64
+import hashlib
+import os
+import socket
+import time
+
+from fsm.stats import percentile
+
+DEFAULT_TIMEOUT = 2.0
+WEBSOCKET_GUID = "258EAFA5-E914-47DA-95CA-C5AB0DC85B11"
+PERCENTILES = (50, 90, 99)
+
+
+class HandshakeError(ConnectionError):
+    """frida-server accepted the connection but did not complete the WebSocket handshake"""
+
+
+def parse_endpoint(endpoint):
+    """Split 'host:port' (or a bare port) into (host, port)"""
+    host, _, port = endpoint.rpartition(':')
+    return host or '127.0.0.1', int(port)
+
+
+def handshake(host, port, timeout=DEFAULT_TIMEOUT):
+    """Connect and complete the WebSocket upgrade; return (connect_ms, response_ms)"""
+    key = base64.b64encode(os.urandom(16)).decode()
+    start = time.perf_counter()
+    with socket.create_connection((host, port), timeout=timeout) as sock:
+        connected = time.perf_counter()
+        sock.sendall((
+            "GET /ws HTTP/1.1\r\n"
+            f"Host: {host}:{port}\r\n"
+            "Upgrade: websocket\r\n"
+            "Connection: Upgrade\r\n"
+            f"Sec-WebSocket-Key: {key}\r\n"
+            "Sec-WebSocket-Version: 13\r\n\r\n").encode())
+        response = b''
+        while b'\r\n\r\n' not in response:
+            chunk = sock.recv(4096)
+            if not chunk:
+                raise HandshakeError("Connection closed before the handshake completed")
+            response += chunk
+        responded = time.perf_counter()
+
+    head = response.split(b'\r\n\r\n', 1)[0].decode('latin-1').split('\r\n')
+    if head[0].split()[1:2] != ['101']:
+        raise HandshakeError(f"Unexpected handshake response: {head[0]}")
+    expected = base64.b64encode(hashlib.sha1((key + WEBSOCKET_GUID).encode()).digest()).decode()
+    headers = {k.strip().lower(): v.strip() for k, _, v in (line.partition(':') for line in head[1:])}
+    if headers.get('sec-websocket-accept') != expected:
+        raise HandshakeError("Handshake response has a wrong Sec-WebSocket-Accept")
+    return (connected - start) * 1000, (responded - connected) * 1000
+
+
+def probe(host, port, iterations=10, timeout=DEFAULT_TIMEOUT, interval=0.0):
+    """Run the handshake iterations times; yield one record (iteration, connect_ms, response_ms, ok, error) each"""
+    for iteration in range(1, iterations + 1):
+        try:
+            connect_ms, response_ms = handshake(host, port, timeout)
+            yield {'iteration': iteration, 'connect_ms': round(connect_ms, 3),
+                   'response_ms': round(response_ms, 3), 'ok': True, 'error': ''}
+        except OSError as e:
+            yield {'iteration': iteration, 'connect_ms': None, 'response_ms': None,
+                   'ok': False, 'error': str(e) or type(e).__name__}
+        if interval and iteration < iterations:
+            time.sleep(interval)
+
+
+def summarize(samples):
+    """Return min, p50, p90, p99 and max of connect and response latency for the successful samples"""
+    summary = {}
+    for metric in ('connect_ms', 'response_ms'):
+        values = [sample[metric] for sample in samples if sample['ok']]
+        stats = {'min': min(values) if values else None}
+        for pct in PERCENTILES:
+            stats[f"p{pct}"] = percentile(values, pct)
+        stats['max'] = max(values) if values else None
+        summary[metric] = stats
+    return summary
+
+
+def wait_until_ready(host, port, timeout, interval=0.2, handshake_timeout=DEFAULT_TIMEOUT):
+    """Retry the handshake until it succeeds; return the seconds waited or raise TimeoutError"""
+    start = time.monotonic()
+    deadline = start + timeout
+    while True:
+        try:
+            handshake(host, port, min(handshake_timeout, max(deadline - time.monotonic(), 0.01)))
+            return time.monotonic() - start
+        except OSError as e:
+            if time.monotonic() + interval > deadline:
+                raise TimeoutError(f"frida-server at {host}:{port} was not ready within {timeout}s: {e}")
+        time.sleep(interval)
@@ -0,0 +1,34 @@
+import math
+
+
+def percentile(samples, pct):
+    """Return the pct-th percentile of samples using linear interpolation"""
+    if not samples:
+        return None
+
+    ordered = sorted(samples)
+    if len(ordered) == 1:
+        return ordered[0]
+
+    rank = (len(ordered) - 1) * (pct / 100.0)
+    lower = math.floor(rank)
+    upper = math.ceil(rank)
+    if lower == upper:
+        return ordered[int(rank)]
+    return ordered[lower] + (ordered[upper] - ordered[lower]) * (rank - lower)
+
+
+def summarize(samples):
+    """Summarize latency samples (in seconds) into a dict of common statistics"""
+    if not samples:
+        return {"count": 0}
+
+    return {
+        "count": len(samples),
+        "min": min(samples),
+        "mean": sum(samples) / len(samples),
+        "p50": percentile(samples, 50),
+        "p95": percentile(samples, 95),
+        "p99": percentile(samples, 99),
+        "max": max(samples),
+    }
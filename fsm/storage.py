@@ -0,0 +1,137 @@
+"""
+Garbage collection of frida-server binaries on the device.
+
+collect() gathers the size and last-use time of every server binary in a
+directory, together with the running frida-server processes, in a single
+`adb shell` round trip. The last-use time is the file's access time, which
+`fsm run` refreshes with `touch -a` when it starts a binary (so it works on
+noatime mounts too). plan() keeps the most recently used versions plus any
+pinned or running ones, and gc() deletes the rest with one batched `rm`,
+together with the store entries (fsm.store) no remaining name links to.
+"""
+
+import re
+
+from fsm.core import DEFAULT_INSTALL_DIR, get_device, parse_process_line, run_command
+from fsm.device import SERVER_FILE_PATTERN
+from fsm.store import STORE_NAME, prune_command
+
+DEFAULT_KEEP = 3
+SERVER_GLOBS = ('*frida*server*', '*server*frida*', '*florida*server*')
+_SEPARATOR = '@@fsm-gc@@'
+
+
+def collect(server_dir=DEFAULT_INSTALL_DIR, verbose=False, device=None):
+    """Return a dict (name, path, version, size, last_used, running) per server binary in server_dir"""
+    device = get_device(device, verbose)
+    # Globs are expanded by the device shell; a glob without matches only makes stat complain
+    command = (f'"cd {server_dir} && stat -c %s:%X:%f:%i:%h:%n {" ".join(SERVER_GLOBS)} 2>/dev/null; '
+               f'echo {_SEPARATOR}; stat -c %i {STORE_NAME}/* 2>/dev/null; '
+               f'echo {_SEPARATOR}; ps -A | grep frida-server; true"')
+    output = device.query(command)
+    if output is None:
+        raise RuntimeError(f"Could not list {server_dir} on the device")
+    listing, _, rest = output.partition(_SEPARATOR)
+    stored, _, processes = rest.partition(_SEPARATOR)
+    # Inodes of the binaries in the store, each of which holds one more link to its names' data
+    stored = {int(line) for line in stored.split() if line.isdigit()}
+
+    running = set()
+    for line in processes.splitlines():
+        process = parse_process_line(line)
+        if process:
+            running.add(process['command'].split()[0])
+
+    files = {}
+    for line in listing.splitlines():
+        parts = line.strip().split(':', 5)
+        if len(parts) != 6 or not parts[0].isdigit():
+            continue
+        size, accessed, mode, inode, links, name = parts
+        # Regular files only (S_IFREG)
+        if int(mode, 16) & 0o170000 != 0o100000 or not SERVER_FILE_PATTERN.search(name):
+            continue
+        path = f"{server_dir.rstrip('/')}/{name}"
+        version = re.search(r'\d+\.\d+\.\d+', name)
+        files[name] = {
+            'name': name,
+            'path': path,
+            'version': version.group() if version else None,
+            'size': int(size),
+            'last_used': int(accessed),
+            'running': path in running or name in running,
+            'inode': int(inode),
+            'links': int(links),
+            'stored': int(inode) in stored,
+        }
+    return sorted(files.values(), key=lambda record: record['last_used'], reverse=True)
+
+
+def plan(files, keep=DEFAULT_KEEP, pins=()):
+    """Set 'action' ('keep' or 'delete') and 'reason' on each file and return them
+
+    Files are grouped by version (by name when the name has none); the keep
+    most recently used groups survive, as do pinned and running files.
+    """
+    pins = set(pins)
+    last_used = {}
+    for record in files:
+        group = record['version'] or record['name']
+        last_used[group] = max(last_used.get(group, 0), record['last_used'])
+    recent = set(sorted(last_used, key=last_used.get, reverse=True)[:keep])
+
+    for record in files:
+        group = record['version'] or record['name']
+        if record['running']:
+            record.update(action='keep', reason='running')
+        elif group in pins or record['name'] in pins:
+            record.update(action='keep', reason='pinned')
+        elif group in recent:
+            record.update(action='keep', reason='recently used')
+        else:
+            record.update(action='delete', reason='not used recently')
+    return _count_freed(files)
+
+
+def _count_freed(files):
+    """Set 'freed' on each record: the bytes deleting it gives back
+
+    Names hard-linked to one binary (fsm.store aliases) share its data, which
+    is only freed with the last link: it is counted once, and not at all while
+    a kept name or a link outside the deleted ones remains. The store's own
+    link goes with the last name (see store.prune_command()).
+    """
+    doomed = {}
+    for record in files:
+        if record['action'] == 'delete' and record.get('inode') is not None:
+            doomed.setdefault(record['inode'], []).append(record)
+    for record in files:
+        record['freed'] = 0
+        if record['action'] != 'delete':
+            continue
+        names = doomed.get(record.get('inode'))
+        if names is None:
+            record['freed'] = record['size']
+        elif record is names[-1] and record['links'] - len(names) - record.get('stored', False) <= 0:
+            record['freed'] = record['size']
+    return files
+
+
+def gc(server_dir=DEFAULT_INSTALL_DIR, keep=DEFAULT_KEEP, pins=(), dry_run=False, verbose=False, device=None):
+    """Delete the server binaries plan() does not keep; return the planned records"""
+    device = get_device(device, verbose)
+    device.ensure_connected()
+    files = plan(collect(server_dir, verbose, device), keep, pins)
+    if dry_run or not any(record['action'] == 'delete' for record in files):
+        return files
+    with device.exclusive():
+        # Plan again under the lock: another fsm process may have started or installed a server meanwhile
+        files = plan(collect(server_dir, verbose, device), keep, pins)
+        doomed = [record['path'] for record in files if record['action'] == 'delete']
+        if doomed:
+            # Stored binaries (fsm.store) whose last name is gone go with them
+            command = f"rm -f {' '.join(doomed)} && {{ {prune_command(server_dir)}; }}"
+            if run_command(device.root_command(command), verbose) is None:
+                raise RuntimeError("Could not delete the old frida-server binaries")
+            device.invalidate('listings')
+    return files
@@ -0,0 +1,96 @@
+"""
+Content-addressed store of frida-server binaries on the device.
+
+Every binary fsm installs is kept once in STORE_NAME inside the install
+directory, named by its sha256, and the names users run
+(frida-server-<version>, --name, --keep-name) are hard links to it.
+Installing a release the store already holds, under any name, downloads and
+pushes nothing: one shell call links the new name into place. Hard links
+rather than symlinks keep every name a regular file, so `run`, `gc`, `find
+-type f` and the manifest's size/mtime check treat them as before, and all
+aliases of a binary share one inode and therefore one size and mtime. Where
+the filesystem has no hard links the name gets a copy instead.
+
+gc() removes a stored binary once no name links to it any more.
+"""
+
+from fsm.core import get_temp_path
+from fsm.manifest import MANIFEST_NAME, parse
+
+STORE_NAME = '.fsm-store'
+_SEPARATOR = '@@fsm-store@@'
+
+
+def get_store_path(install_dir, sha256=None):
+    """Return the device path of install_dir's store, or of the stored binary with sha256"""
+    store = f"{install_dir.rstrip('/')}/{STORE_NAME}"
+    return f"{store}/{sha256}" if sha256 else store
+
+
+def lookup_command(install_dir):
+    """Return the device shell command creating the store and printing the manifest and the stored binaries"""
+    return (f"mkdir -p {get_store_path(install_dir)}; cat {install_dir}/{MANIFEST_NAME} 2>/dev/null; "
+            f"echo {_SEPARATOR}; cd {get_store_path(install_dir)} && stat -c %s:%n * 2>/dev/null; true")
+
+
+def parse_lookup(output):
+    """Split the output of lookup_command() into (manifest entries by name, {sha256: size} of stored binaries)"""
+    text, _, listing = (output or '').partition(_SEPARATOR)
+    blobs = {}
+    for line in listing.splitlines():
+        size, _, sha256 = line.strip().partition(':')
+        if size.isdigit() and sha256:
+            blobs[sha256] = int(size)
+    return parse(text), blobs
+
+
+def lookup(install_dir, device):
+    """Return (manifest entries, stored binaries) of install_dir in one adb round trip"""
+    return parse_lookup(device.query(f'"{lookup_command(install_dir)}"'))
+
+
+def find_stored(entries, blobs, source):
+    """Return the newest manifest entry installed from source whose binary is still in the store, or None"""
+    if not source:
+        return None
+    for entry in sorted(entries.values(), key=lambda entry: entry.get('installed_at') or 0, reverse=True):
+        if entry.get('source') == source and entry.get('sha256') and blobs.get(entry['sha256']) == entry.get('size'):
+            return entry
+    return None
+
+
+def alias_entry(entry, remote_path):
+    """Return a copy of a manifest entry describing the same binary installed at remote_path"""
+    import time
+    return dict(entry, name=remote_path.rsplit('/', 1)[-1], installed_at=int(time.time()), size=None, mtime=None)
+
+
+def link_command(install_dir, sha256, remote_path, pushed=None):
+    """Return the device shell command putting stored binary sha256 in place at remote_path
+
+    pushed is where a binary new to the store was pushed to; it is made
+    executable and moved into the store first. The name is linked to a
+    temporary name and renamed over remote_path, so a running server is never
+    replaced by a partial file. Prints `size:mtime:path` of remote_path.
+    """
+    blob = get_store_path(install_dir, sha256)
+    temp_path = get_temp_path(remote_path)
+    steps = [f"chmod 755 {pushed}", f"mv -f {pushed} {blob}"] if pushed else []
+    steps += [f"(ln -f {blob} {temp_path} 2>/dev/null || cp {blob} {temp_path})",
+              f"mv -f {temp_path} {remote_path}", f"stat -c %s:%Y:%n {remote_path}"]
+    return ' && '.join(steps)
+
+
+def prune_command(install_dir):
+    """Return the device shell command deleting stored binaries no name links to any more"""
+    return f"find {get_store_path(install_dir)} -type f -links 1 -exec rm -f {{}} + 2>/dev/null; true"
+
+
+def aliases(entries):
+    """Return {name: [other names of the same binary]} for manifest entries sharing a sha256"""
+    names = {}
+    for name, entry in entries.items():
+        if entry.get('sha256'):
+            names.setdefault(entry['sha256'], []).append(name)
+    return {name: sorted(other for other in names[entry['sha256']] if other != name)
+            for name, entry in entries.items() if entry.get('sha256')}
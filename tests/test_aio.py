@@ -0,0 +1,95 @@
+#!/usr/bin/env python3
+"""
+Tests for the asyncio API (fsm.aio) against the fake adb
+"""
+
+import asyncio
+import os
+import sys
+import unittest
+from unittest import mock
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from benchmarks.environment import FakeEnvironment
+from fsm import aio
+from fsm.device import Device
+from fsm.errors import DeviceNotFoundError, ServerNotFoundError
+
+
+def run_async(coro):
+    return asyncio.new_event_loop().run_until_complete(coro)
+
+
+class TestAio(unittest.TestCase):
+    def setUp(self):
+        self.env = FakeEnvironment(asset_size=1024).__enter__()
+        self.serials = ["emulator-5554", "emulator-5556"]
+        for serial in self.serials:
+            self.env.add_device(serial)
+        patcher = mock.patch.dict(os.environ, self.env.env())
+        patcher.start()
+        # su methods are probed once per serial and process
+        su_methods = mock.patch.dict(aio._su_methods, clear=True)
+        su_methods.start()
+        self.addCleanup(su_methods.stop)
+        self.addCleanup(patcher.stop)
+        self.addCleanup(self.env.__exit__, None, None, None)
+
+    def test_check_lists_all_devices(self):
+        devices = run_async(aio.check())
+        self.assertEqual([device['serial'] for device in devices], self.serials)
+        with self.assertRaises(DeviceNotFoundError):
+            run_async(aio.check("missing"))
+
+    def test_install_run_ps_kill_on_all_devices(self):
+        url = self.env.server.asset_url("16.1.4")
+
+        async def scenario():
+            installed = await aio.on_devices(self.serials, aio.install, url=url, custom_name="frida-server-16.1.4")
+            listed = await aio.list_servers(self.serials[0])
+            started = await aio.on_devices(self.serials, aio.run, version="16.1.4", timeout=5)
+            processes = await aio.ps(self.serials[1])
+            killed = await aio.kill(self.serials[1])
+            return installed, listed, started, processes, killed
+
+        installed, listed, started, processes, killed = run_async(scenario())
+        self.assertEqual(installed[self.serials[0]]['path'], "/data/local/tmp/frida-server-16.1.4")
+        self.assertEqual(listed[0]['version'], "16.1.4")
+        for serial in self.serials:
+            self.assertFalse(isinstance(started[serial], Exception), started[serial])
+            self.assertTrue(started[serial]['pids'])
+        self.assertEqual(len(processes), 1)
+        self.assertFalse(killed['warning'])
+
+    def test_root_commands_use_the_probed_su_method(self):
+        self.assertEqual(run_async(aio.su_method(self.serials[0])), Device(self.serials[0]).su_method)
+
+        # A device whose su only takes AOSP's `su 0 <command>` syntax
+        url = self.env.server.asset_url("16.1.4")
+        with mock.patch.dict(aio._su_methods, {self.serials[1]: 'su0'}), \
+                mock.patch('fsm.aio.adb', wraps=aio.adb) as adb:
+            run_async(aio.install(self.serials[1], url=url, custom_name="frida-server-16.1.4"))
+            self.assertTrue(run_async(aio.run(self.serials[1], version="16.1.4", timeout=5))['pids'])
+            self.assertFalse(run_async(aio.kill(self.serials[1]))['warning'])
+        commands = [' '.join(map(str, call.args)) for call in adb.call_args_list]
+        self.assertTrue([command for command in commands if command.startswith("shell su 0 sh -c")])
+        self.assertFalse([command for command in commands if "su -c" in command])
+
+    def test_list_name_filter_matches_like_the_cli(self):
+        url = self.env.server.asset_url("16.1.4")
+        run_async(aio.install(self.serials[0], url=url, custom_name="frida-server-16.1.4"))
+        run_async(aio.install(self.serials[0], url=url, custom_name="my-server"))
+        device = Device(self.serials[0])
+        for name in ("frida-server-16.*", "16.1", None):
+            listed = [server['filename'] for server in run_async(aio.list_servers(self.serials[0], name=name))]
+            self.assertEqual(listed, device.server_files("/data/local/tmp", name), name)
+        self.assertEqual(listed, ["frida-server-16.1.4"])
+
+    def test_run_without_server_raises(self):
+        with self.assertRaises(ServerNotFoundError):
+            run_async(aio.run(self.serials[0], version="16.1.4"))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,108 @@
+#!/usr/bin/env python3
+"""
+Tests for declarative state apply (fsm.apply) against the fake adb
+"""
+
+import os
+import sys
+import tempfile
+import unittest
+from unittest import mock
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from benchmarks.environment import FakeEnvironment
+from fsm import apply as desired_state
+from fsm import core
+
+STATE = """
+[defaults]
+version = "16.1.4"
+
+[devices.emulator-5554]
+params = "-l 0.0.0.0:27042"
+
+[devices.emulator-5556]
+{extra}
+"""
+
+
+class TestLoadState(unittest.TestCase):
+    def write(self, text, suffix=".toml"):
+        with tempfile.NamedTemporaryFile('w', suffix=suffix, delete=False) as f:
+            f.write(text)
+        self.addCleanup(os.unlink, f.name)
+        return f.name
+
+    def test_defaults_are_merged(self):
+        state = desired_state.load_state(self.write(STATE.format(extra='running = false')))
+        self.assertEqual(state['emulator-5554']['name'], "frida-server-16.1.4")
+        self.assertEqual(state['emulator-5554']['params'], "-l 0.0.0.0:27042")
+        self.assertFalse(state['emulator-5556']['running'])
+        self.assertEqual(state['emulator-5556']['dir'], "/data/local/tmp")
+
+    def test_unknown_keys_and_missing_version_are_rejected(self):
+        with self.assertRaises(ValueError):
+            desired_state.load_state(self.write(STATE.format(extra='verison = "1.0.0"')))
+        with self.assertRaises(ValueError):
+            desired_state.load_state(self.write('{"devices": {"emulator-5554": {}}}', suffix=".json"))
+
+
+class TestApply(unittest.TestCase):
+    def setUp(self):
+        self.env = FakeEnvironment(asset_size=1024).__enter__()
+        self.addCleanup(self.env.__exit__, None, None, None)
+        self.serials = ["emulator-5554", "emulator-5556"]
+        for serial in self.serials:
+            self.env.add_device(serial)
+        patcher = mock.patch.dict(os.environ, dict(self.env.env(), FSM_CACHE_DIR=tempfile.mkdtemp(dir=self.env.root),
+                                                   FSM_GITHUB_API=self.env.server.base_url))
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def state(self, extra=''):
+        path = os.path.join(self.env.root, "state.toml")
+        with open(path, 'w') as f:
+            f.write(STATE.format(extra=extra))
+        return desired_state.load_state(path)
+
+    def summary(self, actions):
+        return sorted((action['serial'], action['action']) for action in actions)
+
+    def test_apply_converges_and_reapply_costs_one_query_per_device(self):
+        state = self.state()
+        actions = desired_state.plan(state)
+        self.assertEqual(self.summary(actions), [("emulator-5554", "install"), ("emulator-5554", "start"),
+                                                 ("emulator-5556", "install"), ("emulator-5556", "start")])
+        self.assertTrue(all(action['status'] == 'planned' for action in actions))
+
+        desired_state.apply(state, actions)
+        self.assertTrue(all(action['status'] == 'done' for action in actions), actions)
+
+        with mock.patch('fsm.core.run_command', wraps=core.run_command) as run_command:
+            self.assertEqual(desired_state.plan(state), [])
+        self.assertEqual(run_command.call_count, len(self.serials))
+
+    def test_only_changed_devices_are_touched(self):
+        desired_state.apply(self.state(), desired_state.plan(self.state()))
+
+        actions = desired_state.plan(self.state('params = "-D"'))
+        self.assertEqual(self.summary(actions), [("emulator-5556", "start")])
+        self.assertIn("-D", actions[0]['detail'])
+
+        actions = desired_state.plan(self.state('running = false'))
+        self.assertEqual(self.summary(actions), [("emulator-5556", "stop")])
+        desired_state.apply(self.state('running = false'), actions)
+        self.assertEqual(desired_state.gather("emulator-5556")['running'], [])
+
+    def test_unreachable_device_fails_without_stopping_others(self):
+        state = self.state()
+        state['emulator-9999'] = dict(state['emulator-5556'])
+        actions = desired_state.apply(state, desired_state.plan(state))
+        statuses = {(action['serial'], action['status']) for action in actions}
+        self.assertIn(("emulator-9999", "failed"), statuses)
+        self.assertIn(("emulator-5554", "done"), statuses)
+
+
+if __name__ == '__main__':
+    unittest.main()
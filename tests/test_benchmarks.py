@@ -0,0 +1,91 @@
+#!/usr/bin/env python3
+"""
+Tests for the benchmark tooling: fake adb, local release server and baseline comparison
+"""
+
+import io
+import json
+import os
+import sys
+import unittest
+from contextlib import redirect_stderr
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from benchmarks.environment import FakeEnvironment
+from benchmarks.run import compare_results
+from benchmarks.run import main as run_benchmarks_main
+from benchmarks.scale import run_scale
+from fsm.stats import percentile, summarize
+
+
+class TestStats(unittest.TestCase):
+    def test_percentile_interpolates(self):
+        self.assertEqual(percentile([1, 2, 3, 4], 50), 2.5)
+        self.assertEqual(percentile([5], 99), 5)
+        self.assertIsNone(percentile([], 50))
+
+    def test_summarize(self):
+        summary = summarize([0.1, 0.2, 0.3])
+        self.assertEqual(summary["count"], 3)
+        self.assertAlmostEqual(summary["p50"], 0.2)
+
+
+class TestCompareResults(unittest.TestCase):
+    def test_regression_above_threshold(self):
+        baseline = {"results": {"ps": {"p50": 1.0}, "list_1": {"p50": 1.0}}}
+        current = {"results": {"ps": {"p50": 1.5}, "list_1": {"p50": 1.1}}}
+        regressions = compare_results(current, baseline, threshold=0.25)
+        self.assertEqual([r["scenario"] for r in regressions], ["ps"])
+
+    def test_missing_scenarios_are_ignored(self):
+        self.assertEqual(compare_results({"results": {}}, {"results": {"ps": {"p50": 1.0}}}), [])
+
+    def test_missing_baseline_file_is_an_error(self):
+        with self.assertRaises(SystemExit) as raised, redirect_stderr(io.StringIO()):
+            run_benchmarks_main(["--baseline", os.path.join(os.path.dirname(__file__), "no-such-baseline.json")])
+        self.assertNotEqual(raised.exception.code, 0)
+
+
+class TestFakeEnvironment(unittest.TestCase):
+    def test_list_ps_and_kill_against_fake_adb(self):
+        with FakeEnvironment(asset_size=1024) as env:
+            device_dir = env.add_device("emulator-5554")
+            env.add_servers(device_dir, 2)
+
+            _, result = env.run_fsm(["list"])
+            self.assertIn("frida-server-16.1.4-000", result.stdout)
+            self.assertIn("16.1.4", result.stdout)
+
+            _, result = env.run_fsm(["ps", "-n", "system_server"])
+            self.assertIn("system_server", result.stdout)
+
+            env.run_fsm(["run", "--name", "frida-server-16.1.4-000"])
+            self.assertTrue(self.frida_servers(device_dir))
+            env.run_fsm(["kill"])
+            self.assertEqual(self.frida_servers(device_dir), [])
+
+    def frida_servers(self, device_dir):
+        with open(os.path.join(device_dir, "processes.json")) as f:
+            return [process for process in json.load(f)["processes"] if "frida-server" in process["args"]]
+
+    def test_install_from_local_release_server(self):
+        with FakeEnvironment(asset_size=1024) as env:
+            device_dir = env.add_device("emulator-5554")
+            _, result = env.run_fsm(["install", "--url", env.server.asset_url("16.1.4"), "--name", "frida-server-test"])
+            self.assertIn("Successfully installed", result.stdout)
+            installed = os.path.join(device_dir, "root", "data", "local", "tmp", "frida-server-test")
+            self.assertTrue(os.access(installed, os.X_OK))
+
+
+class TestScaleHarness(unittest.TestCase):
+    def test_discovery_reports_every_fleet_size(self):
+        report = run_scale([1, 3], scenarios=["discovery"], concurrency=2, process_count=0)
+        rows = report["results"]
+        self.assertEqual([row["devices"] for row in rows], [1, 3])
+        self.assertTrue(all(row["failures"] == 0 for row in rows))
+        self.assertIn("p99", rows[0])
+
+
+if __name__ == '__main__':
+    unittest.main()
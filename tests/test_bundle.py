@@ -0,0 +1,75 @@
+#!/usr/bin/env python3
+"""
+Tests for installing several frida-server versions as one bundle against the fake adb
+"""
+
+import os
+import sys
+import tempfile
+import unittest
+from unittest import mock
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from benchmarks.environment import FakeEnvironment
+from fsm import core, manifest, store
+from fsm.device import Device
+
+VERSIONS = ("16.1.4", "16.5.9", "17.2.15")
+
+
+class TestBundleInstall(unittest.TestCase):
+    def setUp(self):
+        self.env = FakeEnvironment(versions=VERSIONS, asset_size=1024).__enter__()
+        self.addCleanup(self.env.__exit__, None, None, None)
+        self.device_dir = self.env.add_device("emulator-5554")
+        patcher = mock.patch.dict(os.environ, dict(self.env.env("emulator-5554"),
+                                                   FSM_CACHE_DIR=tempfile.mkdtemp(dir=self.env.root),
+                                                   FSM_GITHUB_API=self.env.server.base_url))
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.device = Device("emulator-5554")
+        self.tmp = os.path.join(self.device_dir, "root/data/local/tmp")
+
+    def test_versions_are_pushed_once_and_recorded(self):
+        with mock.patch('fsm.core.run_command', wraps=core.run_command) as run_command:
+            results = core.install_frida_servers(VERSIONS, device=self.device)
+        self.assertEqual([(result['version'], result['status']) for result in results],
+                         [(version, 'installed') for version in VERSIONS])
+        pushes = [call.args[0] for call in run_command.call_args_list if " push " in call.args[0]]
+        self.assertEqual(len(pushes), 1)
+
+        for version in VERSIONS:
+            path = os.path.join(self.tmp, f"frida-server-{version}")
+            self.assertTrue(os.access(path, os.X_OK), path)
+        self.assertEqual(sorted(name for name in os.listdir(self.tmp) if name.startswith('.') and 'fsm' in name),
+                         [manifest.MANIFEST_NAME, store.STORE_NAME])
+        self.assertFalse([name for name in os.listdir(os.path.join(self.tmp, store.STORE_NAME)) if name.startswith('.')])
+        entries = manifest.load("/data/local/tmp", self.device)
+        self.assertEqual({entry['version'] for entry in entries.values()}, set(VERSIONS))
+
+    def test_an_unsupported_abi_stops_before_anything_is_fetched(self):
+        self.env.add_device("emulator-5556", abi="mips")
+        with mock.patch('fsm.core.fetch_frida_server') as fetch, mock.patch('fsm.core.rich_print') as rich_print, \
+                self.assertRaises(SystemExit):
+            core.install_frida_servers(VERSIONS, device=Device("emulator-5556"))
+        fetch.assert_not_called()
+        rich_print.assert_any_call("Error: Unsupported architecture: mips")
+
+    def test_a_failed_download_only_fails_its_version(self):
+        fetch = core.fetch_frida_server
+
+        def flaky_fetch(url, filename, *args, **kwargs):
+            if "16.5.9" in url:
+                raise Exception("HTTP error 503")
+            return fetch(url, filename, *args, **kwargs)
+
+        with mock.patch('fsm.core.fetch_frida_server', side_effect=flaky_fetch):
+            results = core.install_frida_servers(VERSIONS, device=self.device)
+        self.assertEqual([result['status'] for result in results], ['installed', 'failed', 'installed'])
+        self.assertIn("503", results[1]['detail'])
+        self.assertFalse(os.path.exists(os.path.join(self.tmp, "frida-server-16.5.9")))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,98 @@
+#!/usr/bin/env python3
+"""
+Tests for recording and replaying adb commands and HTTP responses (fsm.cassette)
+"""
+
+import os
+import subprocess
+import sys
+import tempfile
+import unittest
+from unittest import mock
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from benchmarks import fake_adb
+from benchmarks.environment import PROJECT_ROOT, FakeEnvironment
+from fsm import cassette, core
+from fsm.errors import CassetteError
+
+
+class TestCassette(unittest.TestCase):
+    def setUp(self):
+        self.dir = tempfile.mkdtemp()
+        self.path = os.path.join(self.dir, "session.jsonl.gz")
+
+    def use(self, **env):
+        patcher = mock.patch.dict(os.environ, {key: '' for key in ('FSM_RECORD', 'FSM_REPLAY', 'FSM_REPLAY_SPEED')})
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        os.environ.update(env)
+
+    def test_normalize_masks_temporary_paths_and_blobs(self):
+        command = f"adb push {tempfile.gettempdir()}/tmpab12cd /data/local/tmp/x && echo {'QUJD' * 20} | base64 -d"
+        self.assertEqual(cassette.normalize(command), "adb push <tmp> /data/local/tmp/x && echo <blob> | base64 -d")
+
+    def test_commands_replay_in_order_with_scaled_timing(self):
+        self.use(FSM_RECORD=self.path)
+        self.assertEqual(core.run_command("sleep 0.1; echo one"), "one\n")
+        self.assertIsNone(core.run_command("echo two >&2; exit 3"))
+
+        self.use(FSM_REPLAY=self.path, FSM_REPLAY_SPEED="0.5")
+        with mock.patch('fsm.cassette.time.sleep') as sleep:
+            self.assertEqual(core.run_command("sleep 0.1; echo one"), "one\n")
+            self.assertEqual(core.run_command("echo two >&2; exit 3", return_error=True), None)
+        self.assertGreaterEqual(sleep.call_args_list[0].args[0], 0.05)
+        with self.assertRaises(CassetteError):
+            core.run_command("echo three")
+
+    def test_poll_waits_follow_the_replay_speed(self):
+        self.use(FSM_RECORD=self.path)
+        core.run_command("true")
+        self.use(FSM_REPLAY=self.path, FSM_REPLAY_SPEED="0")
+        with mock.patch('fsm.cassette.time.sleep') as sleep:
+            cassette.sleep(1.5)
+        sleep.assert_called_once_with(0.0)
+
+
+class TestSessionReplay(unittest.TestCase):
+    def test_recorded_install_replays_without_device_or_network(self):
+        path = os.path.join(tempfile.mkdtemp(), "install.jsonl")
+        with FakeEnvironment(asset_size=1024) as env:
+            env.add_device("emulator-5554")
+            api_url = env.server.base_url
+            with mock.patch.dict(os.environ, {'FSM_CACHE_DIR': tempfile.mkdtemp(), 'FSM_GITHUB_API': api_url}):
+                _, recorded = env.run_fsm(["--record", path, "install", "16.1.4"])
+
+        # The fake adb and the release server are gone; only the cassette is left
+        replayed = subprocess.run(
+            [sys.executable, "-m", "fsm", "--replay", path, "--replay-speed", "0", "install", "16.1.4"],
+            env=dict(os.environ, PYTHONPATH=PROJECT_ROOT, FSM_CACHE_DIR=tempfile.mkdtemp(),
+                     FSM_GITHUB_API=api_url),
+            stdout=subprocess.PIPE, stderr=subprocess.PIPE, text=True)
+        self.assertEqual(replayed.returncode, 0, replayed.stdout + replayed.stderr)
+        self.assertIn("/data/local/tmp/frida-server-16.1.4", replayed.stdout)
+        # Everything but the timings is replayed as recorded
+        results = lambda stdout: [line for line in stdout.replace('⠋', '').splitlines()
+                                  if line.startswith(('✓', 'ℹ Location', 'ℹ To run'))]
+        self.assertEqual(results(replayed.stdout), results(recorded.stdout))
+        self.assertEqual(len(results(recorded.stdout)), 3)
+
+    def test_recorded_restart_replays_without_device(self):
+        path = os.path.join(tempfile.mkdtemp(), "run.jsonl")
+        with FakeEnvironment() as env:
+            device_dir = env.add_device("emulator-5554")
+            fake_adb.add_device_file(device_dir, "/data/local/tmp/frida-server-16.1.4",
+                                     fake_adb.fake_server_script("16.1.4"))
+            env.run_fsm(["--record", path, "run", "-V", "16.1.4", "--force"])
+
+        # Stopping, starting and the polls in between are all served from the cassette
+        replayed = subprocess.run(
+            [sys.executable, "-m", "fsm", "--replay", path, "--replay-speed", "0", "run", "-V", "16.1.4", "--force"],
+            env=dict(os.environ, PYTHONPATH=PROJECT_ROOT), stdout=subprocess.PIPE, stderr=subprocess.PIPE, text=True)
+        self.assertEqual(replayed.returncode, 0, replayed.stdout + replayed.stderr)
+        self.assertNotIn("Could not verify", replayed.stdout)
+
+
+if __name__ == '__main__':
+    unittest.main()
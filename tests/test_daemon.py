@@ -0,0 +1,96 @@
+#!/usr/bin/env python3
+"""
+Tests for the fsm daemon (fsm.daemon) against the fake adb
+"""
+
+import os
+import sys
+import tempfile
+import threading
+import time
+import unittest
+from unittest import mock
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from benchmarks.environment import FakeEnvironment
+from fsm import daemon
+
+
+class TestDaemon(unittest.TestCase):
+    def setUp(self):
+        self.env = FakeEnvironment(asset_size=1024).__enter__()
+        self.addCleanup(self.env.__exit__, None, None, None)
+        self.device_dir = self.env.add_device("emulator-5554")
+        self.env.add_servers(self.device_dir, 2)
+        self.socket_path = os.path.join(self.env.root, "daemon.sock")
+        patcher = mock.patch.dict(os.environ, dict(self.env.env("emulator-5554"), **{daemon.SOCKET_ENV: self.socket_path}))
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def start_daemon(self):
+        thread = threading.Thread(target=daemon.serve, daemon=True)
+        thread.start()
+        deadline = time.monotonic() + 5
+        while not daemon.ping() and time.monotonic() < deadline:
+            time.sleep(0.01)
+        self.addCleanup(thread.join, 5)
+        self.addCleanup(daemon.stop)
+
+    def test_falls_back_when_no_daemon_is_running(self):
+        self.assertIsNone(daemon.request('ps'))
+        self.assertIsNone(daemon.ping())
+        self.assertFalse(daemon.stop())
+
+    def test_requests_reuse_a_warm_session(self):
+        self.start_daemon()
+
+        self.assertIn("Checking ADB connection", daemon.request('kill')['output'])
+
+        listed = daemon.request('list')
+        self.assertTrue(listed['ok'])
+        self.assertEqual([record['version'] for record in listed['result']], ["16.1.4", "16.1.4"])
+
+        killed = daemon.request('kill')
+        self.assertTrue(killed['ok'])
+        # The connection check ran for the first request only
+        self.assertNotIn("Checking ADB connection", killed['output'])
+        self.assertEqual(daemon.request('ps', name="frida-server")['result'], [])
+
+        status = daemon.ping()
+        self.assertEqual(status['sessions'], ["emulator-5554"])
+        self.assertEqual(status['pid'], os.getpid())
+
+    def test_errors_are_reported_not_raised(self):
+        self.start_daemon()
+        reply = daemon.request('run', version="9.9.9")
+        self.assertFalse(reply['ok'])
+        self.assertEqual(reply['exit_code'], 1)
+        self.assertIn("No frida-server found with version 9.9.9", reply['output'])
+        self.assertFalse(daemon.request('bogus')['ok'])
+
+        with mock.patch.dict(os.environ, {daemon.DISABLE_ENV: "1"}):
+            self.assertIsNone(daemon.request('ps'))
+
+    def test_output_of_install_worker_threads_reaches_the_client(self):
+        self.start_daemon()
+        with mock.patch.dict(os.environ, {'FSM_CACHE_DIR': tempfile.mkdtemp(dir=self.env.root),
+                                          'FSM_GITHUB_API': self.env.server.base_url}):
+            reply = daemon.request('install', version="16.1.4")
+        self.assertTrue(reply['ok'], reply)
+        # The connection check runs in the discovery pool, not in the request's thread
+        self.assertIn("Checking ADB connection", reply['output'])
+
+    def test_stop_removes_the_socket(self):
+        thread = threading.Thread(target=daemon.serve, daemon=True)
+        thread.start()
+        deadline = time.monotonic() + 5
+        while not daemon.ping() and time.monotonic() < deadline:
+            time.sleep(0.01)
+        self.assertTrue(daemon.stop())
+        thread.join(5)
+        self.assertFalse(os.path.exists(self.socket_path))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,119 @@
+#!/usr/bin/env python3
+"""
+Tests for command deadlines and retries (fsm.deadline, core.run_command)
+"""
+
+import os
+import shutil
+import sys
+import tempfile
+import time
+import unittest
+from unittest import mock
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from benchmarks.environment import FakeEnvironment
+from fsm import core
+from fsm.deadline import backoff_delays, deadline, remaining
+from fsm.device import Device
+from fsm.errors import CommandTimeoutError
+
+
+def alive(pid):
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    return True
+
+
+class TestDeadline(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.tmp, True)
+
+    def test_nested_deadlines_only_shorten(self):
+        self.assertIsNone(remaining())
+        with deadline(1.0):
+            with deadline(60):
+                self.assertLessEqual(remaining(), 1.0)
+            with deadline(0.1):
+                self.assertLessEqual(remaining(), 0.1)
+        self.assertIsNone(remaining())
+
+    def test_backoff_is_capped_and_jittered(self):
+        delays = list(backoff_delays(6, base=0.1, cap=0.5))
+        self.assertEqual(len(delays), 6)
+        self.assertTrue(all(0 <= delay <= 0.5 for delay in delays))
+
+    def test_timeout_kills_the_whole_process_group(self):
+        pid_file = os.path.join(self.tmp, "pid")
+        start = time.monotonic()
+        with self.assertRaises(CommandTimeoutError):
+            with deadline(0.3):
+                core.run_command(f"sh -c 'sleep 30 & echo $! > {pid_file}; wait'")
+        self.assertLess(time.monotonic() - start, 5)
+        with open(pid_file) as f:
+            pid = int(f.read())
+        for _ in range(50):
+            if not alive(pid):
+                break
+            time.sleep(0.05)
+        self.assertFalse(alive(pid))
+
+    def test_expired_deadline_runs_nothing(self):
+        marker = os.path.join(self.tmp, "ran")
+        with deadline(0):
+            with self.assertRaises(CommandTimeoutError):
+                core.run_command(f"touch {marker}")
+        self.assertFalse(os.path.exists(marker))
+
+    def test_transient_adb_errors_are_retried(self):
+        counter = os.path.join(self.tmp, "attempts")
+        cmd = (f"echo x >> {counter}; [ $(wc -l < {counter}) -ge 3 ] && echo ok "
+               f"|| {{ echo 'adb: error: device offline' >&2; exit 1; }}")
+        with mock.patch('fsm.core.time'):
+            self.assertEqual(core.run_command(cmd, retries=2), "ok\n")
+            os.unlink(counter)
+            self.assertIsNone(core.run_command(cmd, retries=1))
+
+    def test_other_failures_are_not_retried(self):
+        counter = os.path.join(self.tmp, "attempts")
+        self.assertIsNone(core.run_command(f"echo x >> {counter}; exit 1", retries=3))
+        with open(counter) as f:
+            self.assertEqual(len(f.readlines()), 1)
+
+
+class TestDeviceDeadline(unittest.TestCase):
+    def setUp(self):
+        self.env = FakeEnvironment(asset_size=1024).__enter__()
+        self.addCleanup(self.env.__exit__, None, None, None)
+        self.env.add_device("emulator-5554", latency=2.0)
+        self.env.add_device("emulator-5556", failure_rate=1.0)
+        patcher = mock.patch.dict(os.environ, self.env.env())
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def test_wedged_device_query_times_out(self):
+        start = time.monotonic()
+        with self.assertRaises(CommandTimeoutError):
+            with deadline(0.5):
+                Device("emulator-5554").list_dir("/data/local/tmp")
+        self.assertLess(time.monotonic() - start, 1.5)
+
+    def test_offline_device_query_gives_up_after_retries(self):
+        with mock.patch('fsm.core.run_command', wraps=core.run_command) as run_command, \
+                mock.patch('fsm.core.time') as core_time:
+            self.assertEqual(Device("emulator-5556", retries=3).list_dir("/data/local/tmp"), [])
+        self.assertEqual(run_command.call_count, 1)
+        self.assertEqual(core_time.sleep.call_count, 3)
+
+    def test_cli_timeout_option(self):
+        _, result = self.env.run_fsm(["--timeout", "0.5", "list"], serial="emulator-5554", check=False)
+        self.assertEqual(result.returncode, 1)
+        self.assertIn("Timed out", result.stdout + result.stderr)
+
+
+if __name__ == '__main__':
+    unittest.main()
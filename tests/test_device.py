@@ -0,0 +1,92 @@
+#!/usr/bin/env python3
+"""
+Tests for the Device session (fsm.device)
+"""
+
+import os
+import sys
+import unittest
+from unittest import mock
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from benchmarks.environment import FakeEnvironment
+from fsm import core
+from fsm.deadline import QUERY_TIMEOUT
+from fsm.device import Device
+
+
+class TestDeviceCaching(unittest.TestCase):
+    @mock.patch('fsm.core.run_command')
+    def test_abi_is_queried_once(self, mock_run_command):
+        mock_run_command.return_value = "arm64-v8a\n"
+        device = Device("emulator-5554")
+
+        self.assertEqual(core.get_frida_server_arch(device=device), "android-arm64")
+        self.assertEqual(core.get_frida_server_arch(device=device), "android-arm64")
+        mock_run_command.assert_called_once_with(
+            'adb -s emulator-5554 shell getprop ro.product.cpu.abi', False, False, QUERY_TIMEOUT, device.retries)
+
+    @mock.patch('fsm.core.run_command')
+    def test_listing_is_cached_until_invalidated(self, mock_run_command):
+        mock_run_command.return_value = "frida-server-16.1.4\nflorida-server-17.0.0\nother\n"
+        device = Device()
+
+        self.assertEqual(device.server_files("/data/local/tmp"), ["florida-server-17.0.0", "frida-server-16.1.4"])
+        self.assertEqual(device.server_files("/data/local/tmp", "florida"), ["florida-server-17.0.0"])
+        self.assertEqual(mock_run_command.call_count, 1)
+
+        device.invalidate('listings')
+        device.server_files("/data/local/tmp")
+        self.assertEqual(mock_run_command.call_count, 2)
+
+    @mock.patch('fsm.core.check_adb_connection')
+    def test_connection_is_checked_once(self, mock_check_adb_connection):
+        device = Device("emulator-5554", verbose=True)
+        device.ensure_connected()
+        device.ensure_connected()
+        mock_check_adb_connection.assert_called_once_with(True, "emulator-5554")
+
+        device.invalidate()
+        device.ensure_connected()
+        self.assertEqual(mock_check_adb_connection.call_count, 2)
+
+    @mock.patch('fsm.core.run_command')
+    def test_su_wrapping_follows_detected_method(self, mock_run_command):
+        device = Device()
+        for method, expected in (("su-c", "su -c 'id'"), ("su0", "su 0 sh -c 'id'"),
+                                 ("root", "sh -c 'id'"), ("none", "sh -c 'id'")):
+            mock_run_command.return_value = method + "\n"
+            device.invalidate('su')
+            self.assertEqual(device.su("id"), expected)
+        self.assertEqual(Device("abc").root_command("id"), 'adb -s abc shell "sh -c \'id\'"')
+
+
+class TestDeviceOnFakeAdb(unittest.TestCase):
+    def setUp(self):
+        self.env = FakeEnvironment(asset_size=1024).__enter__()
+        self.addCleanup(self.env.__exit__, None, None, None)
+        self.device_dir = self.env.add_device("emulator-5554")
+        self.env.add_device("no-root", root=False)
+        self.env.add_servers(self.device_dir, 2)
+        patcher = mock.patch.dict(os.environ, self.env.env())
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def test_detects_su_and_root(self):
+        self.assertEqual(Device("emulator-5554").su_method, "su-c")
+        self.assertIsNone(Device("no-root").su_method)
+
+    def test_run_and_kill_share_one_session(self):
+        device = Device("emulator-5554")
+        with mock.patch('time.sleep'):
+            self.assertTrue(core.run_frida_server(version="16.1.4", device=device))
+        self.assertEqual(len(device.running_pids()), 1)
+
+        result = core.kill_frida_server(device=device)
+        self.assertFalse(result['warning'])
+        self.assertEqual(device.running_pids(), [])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,105 @@
+#!/usr/bin/env python3
+"""
+Tests for the logcat event watcher (fsm.events) against the fake adb
+"""
+
+import os
+import sys
+import threading
+import time
+import unittest
+from unittest import mock
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from benchmarks import fake_adb
+from benchmarks.environment import FakeEnvironment
+from fsm import events
+
+LMK = "1700000000.250   512   512 I lowmemorykiller: Kill 'frida-server' (20001), uid 0, oom_score_adj 0 to free 4096kB"
+AVC = ('1700000001.000 20002 20002 W frida-server: type=1400 audit(0.0:12): avc:  denied  { read } for '
+       'pid=20002 comm="frida-server" name="maps" scontext=u:r:su:s0 tcontext=u:r:init:s0')
+CRASH = ("1700000002.000 20002 20003 F libc    : Fatal signal 11 (SIGSEGV), code 1 (SEGV_MAPERR), "
+         "fault addr 0x0 in tid 20003 (gum-js-loop), pid 20002 (frida-server)")
+TOMBSTONE = "1700000003.000   300   300 E DEBUG   : Tombstone written to: /data/tombstones/tombstone_03"
+
+
+class TestParseLine(unittest.TestCase):
+    def test_classifies_events(self):
+        lmk = events.parse_line(LMK, "emulator-5554")
+        self.assertEqual((lmk['kind'], lmk['process'], lmk['pid'], lmk['serial']),
+                         ('lmk_kill', 'frida-server', 20001, "emulator-5554"))
+        self.assertEqual(lmk['time'], "2023-11-14T22:13:20.250+00:00")
+
+        avc = events.parse_line(AVC)
+        self.assertEqual((avc['kind'], avc['process'], avc['pid']), ('selinux_denial', 'frida-server', 20002))
+
+        crash = events.parse_line(CRASH)
+        self.assertEqual((crash['kind'], crash['process'], crash['pid'], crash['tag']),
+                         ('crash', 'frida-server', 20002, 'libc'))
+
+        tombstone = events.parse_line(TOMBSTONE)
+        self.assertEqual((tombstone['kind'], tombstone['process']), ('tombstone', None))
+
+    def test_ignores_unrelated_lines(self):
+        self.assertIsNone(events.parse_line("--------- beginning of main"))
+        self.assertIsNone(events.parse_line("1700000000.000  1000  1000 I lmkd    : Reclaimed 4096kB"))
+
+    def test_process_filter(self):
+        other = events.parse_line(LMK.replace("frida-server", "com.example.app"))
+        self.assertFalse(events.matches_process(other, "frida"))
+        self.assertTrue(events.matches_process(other, ""))
+        self.assertTrue(events.matches_process(events.parse_line(TOMBSTONE), "frida"))
+
+    def test_logcat_command_filters_on_the_device(self):
+        command = events.logcat_command("emulator-5554", pid=42)
+        self.assertIn("-T 1", command)
+        self.assertIn("--pid=42", command)
+        self.assertNotIn("'", events.DEVICE_FILTER)
+        self.assertIn("-d -T 12.500", events.logcat_command("emulator-5554", since=12.5, dump=True))
+
+
+class TestWatch(unittest.TestCase):
+    def setUp(self):
+        self.env = FakeEnvironment(asset_size=1024).__enter__()
+        self.addCleanup(self.env.__exit__, None, None, None)
+        self.first = self.env.add_device("emulator-5554")
+        self.second = self.env.add_device("emulator-5556")
+        patcher = mock.patch.dict(os.environ, self.env.env())
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def test_dump_merges_devices_and_filters(self):
+        fake_adb.add_logcat(self.first, "lowmemorykiller", "Kill 'frida-server' (20001), uid 0")
+        fake_adb.add_logcat(self.first, "lowmemorykiller", "Kill 'com.example.app' (3000), uid 10001")
+        fake_adb.add_logcat(self.second, "DEBUG", "Tombstone written to: /data/tombstones/tombstone_00")
+        fake_adb.add_logcat(self.second, "ActivityManager", "Start proc 4000:com.example.app")
+        fake_adb.add_logcat(self.second, "lowmemorykiller", "Kill 'frida-server' (9), uid 0", timestamp=time.time() - 3600)
+
+        found = sorted((event['serial'], event['kind']) for event in
+                       events.watch(["emulator-5554", "emulator-5556"], since=60, dump=True))
+        self.assertEqual(found, [("emulator-5554", 'lmk_kill'), ("emulator-5556", 'tombstone')])
+
+        everything = [event for event in events.watch(["emulator-5554"], since=60, dump=True, process='')]
+        self.assertEqual(len(everything), 2)
+
+    def test_follow_streams_new_events(self):
+        fake_adb.add_logcat(self.first, "frida", "old line before watching")
+        stream = events.watch(["emulator-5554", "emulator-5556"])
+
+        def later():
+            time.sleep(0.5)
+            fake_adb.add_logcat(self.second, "libc", "Fatal signal 6 (SIGABRT), code -1 in tid 7 (frida-server), "
+                                                     "pid 7 (frida-server)", pid=7, priority="F")
+
+        threading.Thread(target=later).start()
+        first = next(stream)
+        if first['message'] == "old line before watching":
+            # -T 1 replays the most recent buffered line, as logcat does
+            first = next(stream)
+        stream.close()
+        self.assertEqual((first['serial'], first['kind'], first['pid']), ("emulator-5556", 'crash', 7))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,86 @@
+#!/usr/bin/env python3
+"""
+Tests for the adb forward port pool (fsm.forward) against the fake adb
+"""
+
+import os
+import shutil
+import sys
+import unittest
+from unittest import mock
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from benchmarks.environment import FakeEnvironment
+from fsm import forward
+from fsm.lock import file_lock
+
+
+class TestForward(unittest.TestCase):
+    def setUp(self):
+        self.env = FakeEnvironment(asset_size=1024).__enter__()
+        self.addCleanup(self.env.__exit__, None, None, None)
+        self.env.add_device("emulator-5554")
+        self.env.add_device("emulator-5556")
+        patcher = mock.patch.dict(os.environ, dict(self.env.env(), FSM_CACHE_DIR=os.path.join(self.env.root, "cache"),
+                                                   **{forward.PORT_RANGE_ENV: "47100-47199"}))
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def test_parse_port_range(self):
+        self.assertEqual(forward.parse_port_range("1000-1010"), (1000, 1010))
+        self.assertEqual(forward.parse_port_range("1000"), (1000, 1000))
+        with self.assertRaises(ValueError):
+            forward.parse_port_range("2000-1000")
+
+    def test_allocates_distinct_ports_and_reuses_them(self):
+        first = forward.ensure_forward("emulator-5554")
+        second = forward.ensure_forward("emulator-5556")
+        self.assertNotEqual(first['port'], second['port'])
+        self.assertTrue(47100 <= first['port'] <= 47199)
+        self.assertEqual(first['endpoint'], f"127.0.0.1:{first['port']}")
+
+        self.assertEqual(forward.ensure_forward("emulator-5554"), first)
+        self.assertEqual(len(forward.list_adb_forwards()), 2)
+
+    def test_lookup_reads_the_persisted_mapping(self):
+        record = forward.ensure_forward("emulator-5556")
+        with mock.patch('fsm.forward.run_command', side_effect=AssertionError("adb called")):
+            self.assertEqual(forward.lookup("emulator-5556"), record)
+            self.assertIsNone(forward.lookup("emulator-5554"))
+
+    def test_prune_tears_down_disconnected_devices(self):
+        forward.ensure_forward("emulator-5554")
+        kept = forward.ensure_forward("emulator-5556")
+        shutil.rmtree(os.path.join(self.env.home, "emulator-5554"))
+
+        removed = forward.prune()
+        self.assertEqual([record['serial'] for record in removed], ["emulator-5554"])
+        self.assertEqual(forward.forwards(), [kept])
+        self.assertIsNone(forward.lookup("emulator-5554"))
+
+    def test_remove_forward(self):
+        record = forward.ensure_forward("emulator-5554")
+        self.assertEqual(forward.remove_forward("emulator-5554"), record)
+        self.assertIsNone(forward.remove_forward("emulator-5554"))
+        self.assertEqual(forward.list_adb_forwards(), [])
+
+    def test_select_serials(self):
+        with self.assertRaises(RuntimeError):
+            forward.select_serials()
+        self.assertEqual(forward.select_serials(all_devices=True), ["emulator-5554", "emulator-5556"])
+        with mock.patch.dict(os.environ, {'ANDROID_SERIAL': "emulator-5556"}):
+            self.assertEqual(forward.select_serials(), ["emulator-5556"])
+
+    def test_file_lock_times_out(self):
+        path = os.path.join(self.env.root, "test.lock")
+        with file_lock(path):
+            with self.assertRaises(TimeoutError):
+                with file_lock(path, timeout=0.1):
+                    pass
+        with file_lock(path, timeout=0.1):
+            pass
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,133 @@
+#!/usr/bin/env python3
+"""
+Tests for the operation history (fsm.history)
+"""
+
+import io
+import os
+import shutil
+import sys
+import tempfile
+import unittest
+from contextlib import redirect_stdout
+from unittest import mock
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from benchmarks import fake_adb
+from benchmarks.environment import FakeEnvironment
+from fsm import core, history
+from fsm.device import Device
+
+
+class TestHistory(unittest.TestCase):
+    def setUp(self):
+        self.cache_dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.cache_dir, True)
+        patcher = mock.patch.dict(os.environ, {'FSM_CACHE_DIR': self.cache_dir, 'FSM_HISTORY': '1'})
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def record(self, serial, push_seconds, outcome_exit=None):
+        clock = iter([0.0, 0.0, 0.1, 0.1 + push_seconds, 0.1 + push_seconds])
+        with mock.patch('fsm.history.time.monotonic', side_effect=lambda: next(clock)):
+            with history.operation('install', serial, "16.1.4"):
+                history.enter('download')
+                history.add_bytes(1024)
+                history.enter('push')
+                if outcome_exit is not None:
+                    raise SystemExit(outcome_exit)
+
+    def test_operations_are_spooled_then_ingested_in_one_batch(self):
+        self.record("emulator-5554", 0.5)
+        with self.assertRaises(SystemExit):
+            self.record("emulator-5554", 0.5, outcome_exit=1)
+        self.assertTrue(os.path.getsize(history.get_spool_path()))
+        self.assertFalse(os.path.exists(history.get_history_path()))
+
+        operations = history.recent()
+        self.assertEqual([operation['outcome'] for operation in operations], ['failed', 'ok'])
+        self.assertEqual(operations[0]['bytes'], 1024)
+        self.assertAlmostEqual(operations[0]['phases']['download'], 0.1)
+        self.assertAlmostEqual(operations[0]['phases']['push'], 0.5)
+        self.assertEqual(os.path.getsize(history.get_spool_path()), 0)
+
+    def test_stats_report_percentiles_per_device_and_phase(self):
+        for push in (0.1, 0.2, 0.3, 0.4, 1.0):
+            self.record("emulator-5554", push)
+        self.record("emulator-5556", 5.0)
+
+        stats = {(record['serial'], record['phase']): record for record in history.stats()}
+        push = stats[("emulator-5554", "push")]
+        self.assertEqual(push['count'], 5)
+        self.assertEqual(push['p50_ms'], 300.0)
+        self.assertEqual(push['max_ms'], 1000.0)
+        self.assertEqual(stats[("emulator-5556", "push")]['p99_ms'], 5000.0)
+        self.assertIn(("emulator-5554", "total"), stats)
+
+        combined = [record for record in history.stats(per_device=False) if record['phase'] == 'push']
+        self.assertEqual([(record['serial'], record['count']) for record in combined], [('*', 6)])
+        self.assertEqual(history.stats(serial="emulator-9999"), [])
+
+    def test_recording_can_be_turned_off(self):
+        with mock.patch.dict(os.environ, {'FSM_HISTORY': '0'}):
+            self.record("emulator-5554", 0.1)
+        self.assertFalse(os.path.exists(history.get_spool_path()))
+
+
+class TestRecordedOperations(unittest.TestCase):
+    def test_install_and_run_record_their_phases(self):
+        with FakeEnvironment(asset_size=1024) as env:
+            device_dir = env.add_device("emulator-5554")
+            with mock.patch.dict(os.environ, dict(env.env("emulator-5554"), FSM_CACHE_DIR=env.root, FSM_HISTORY='1',
+                                                  FSM_GITHUB_API=env.server.base_url)), mock.patch('time.sleep'):
+                device = Device("emulator-5554")
+                core.install_frida_server("16.1.4", device=device)
+                fake_adb.add_device_file(device_dir, "/data/local/tmp/frida-server-16.1.4",
+                                         fake_adb.fake_server_script("16.1.4"))
+                core.run_frida_server(version="16.1.4", device=device)
+                run, install = history.recent()
+
+        self.assertEqual((install['command'], install['serial'], install['version'], install['outcome']),
+                         ('install', "emulator-5554", "16.1.4", 'ok'))
+        self.assertEqual(set(install['phases']), {'discovery', 'connect', 'arch', 'lookup', 'resolve', 'overlap',
+                                                  'download', 'lock', 'push', 'verify'})
+        self.assertGreater(install['bytes'], 0)
+        self.assertEqual(run['command'], 'run')
+        self.assertTrue({'discovery', 'start', 'verify'} <= set(run['phases']))
+
+    def test_install_overlaps_version_lookup_and_device_discovery(self):
+        with FakeEnvironment(asset_size=1024) as env:
+            env.add_device("emulator-5554", latency=0.2)
+            env.server.delay = 0.3
+            with mock.patch.dict(os.environ, dict(env.env("emulator-5554"), FSM_CACHE_DIR=env.root, FSM_HISTORY='1',
+                                                  FSM_GITHUB_API=env.server.base_url)), \
+                    mock.patch('fsm.core.resolve_release_asset', wraps=core.resolve_release_asset) as resolve, \
+                    mock.patch('fsm.core.get_frida_server_arch', wraps=core.get_frida_server_arch) as arch:
+                core.install_frida_server(device=Device("emulator-5554"))
+            phases = history.last()['phases']
+
+        # The download fetches the asset the pipeline resolved instead of probing and resolving again
+        self.assertEqual(resolve.call_count, 1)
+        self.assertEqual(arch.call_count, 1)
+
+        concurrent = sum(phases[phase] for phase in ('connect', 'version', 'arch', 'lookup'))
+        self.assertLess(phases['discovery'], concurrent)
+        self.assertGreater(phases['overlap'], 0.2)
+
+    def test_install_on_an_unsupported_abi_stops_before_downloading(self):
+        with FakeEnvironment(asset_size=1024) as env:
+            device_dir = env.add_device("emulator-5554", abi="mips")
+            out = io.StringIO()
+            with mock.patch.dict(os.environ, dict(env.env("emulator-5554"), FSM_CACHE_DIR=env.root,
+                                                  FSM_GITHUB_API=env.server.base_url)), \
+                    mock.patch('fsm.core.fetch_frida_server') as fetch, redirect_stdout(out), \
+                    self.assertRaises(SystemExit):
+                core.install_frida_server("16.1.4", device=Device("emulator-5554"))
+            fetch.assert_not_called()
+            self.assertIn("Unsupported architecture: mips", out.getvalue())
+            self.assertFalse(os.path.exists(os.path.join(device_dir, "root/data/local/tmp/frida-server-16.1.4")))
+
+
+if __name__ == '__main__':
+    unittest.main()
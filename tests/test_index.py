@@ -0,0 +1,89 @@
+#!/usr/bin/env python3
+"""
+Tests for the local release index (fsm.index) against the local release server
+"""
+
+import os
+import shutil
+import sys
+import tempfile
+import unittest
+from unittest import mock
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from benchmarks.release_server import ReleaseServer
+from fsm import core, index
+
+VERSIONS = [f"16.{minor}.{patch}" for minor in range(3) for patch in range(50)]
+
+
+class TestVersionRange(unittest.TestCase):
+    def test_operators_and_prefixes(self):
+        self.assertTrue(index.version_in_range("16.1.4", ">=16,<17"))
+        self.assertFalse(index.version_in_range("17.0.0", ">=16,<17"))
+        self.assertTrue(index.version_in_range("16.1.4", "16.1"))
+        self.assertTrue(index.version_in_range("16.1.4", "16.*"))
+        self.assertFalse(index.version_in_range("16.10.0", "16.1"))
+        self.assertTrue(index.version_in_range("v16.1.4", "==16.1.4"))
+        self.assertTrue(index.version_in_range("16.1.4", None))
+
+    def test_asset_arch(self):
+        self.assertEqual(index.asset_arch("frida-server-16.1.4-android-arm64.xz"), "android-arm64")
+        self.assertEqual(index.asset_arch("florida-server-17.5.2-android-x86_64.gz"), "android-x86_64")
+        self.assertIsNone(index.asset_arch("frida-server.tar.gz"))
+        self.assertTrue(index.arch_matches("android-arm64", "arm64"))
+        self.assertFalse(index.arch_matches("android-arm64", "arm"))
+
+
+class TestReleaseIndex(unittest.TestCase):
+    def setUp(self):
+        self.server = ReleaseServer(versions=VERSIONS, repos=["frida/frida", "Ylarod/Florida"], asset_size=16).start()
+        self.addCleanup(self.server.stop)
+        self.cache_dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.cache_dir, True)
+        patcher = mock.patch.dict(os.environ, {'FSM_CACHE_DIR': self.cache_dir, 'FSM_GITHUB_API': self.server.base_url})
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def test_sync_is_paginated_then_incremental(self):
+        self.assertEqual(index.sync_repo("frida/frida"), len(VERSIONS))
+        self.assertEqual(len(self.server.requests), 2)
+
+        # Unchanged repository: a single conditional request answered with 304
+        self.assertEqual(index.sync_repo("frida/frida"), 0)
+        self.assertEqual(len(self.server.requests), 3)
+
+        # A new release only costs the first page
+        self.server.versions.append("16.3.0")
+        self.assertEqual(index.sync_repo("frida/frida"), 1)
+        self.assertEqual(self.server.requests[-1], "/repos/frida/frida/releases?per_page=100")
+
+    def test_search_works_offline(self):
+        index.sync_repo("frida/frida")
+        index.sync_repo("Ylarod/Florida")
+        self.server.stop()
+
+        records = index.search(["frida/frida"], ">=16.2.48", "arm64")
+        self.assertEqual([record['version'] for record in records], ["16.2.49", "16.2.48"])
+        self.assertEqual(records[0]['asset'], "frida-server-16.2.49-android-arm64.xz")
+        self.assertEqual(index.indexed_repos(), ["Ylarod/Florida", "frida/frida"])
+
+    def test_install_resolves_fork_assets_from_the_index(self):
+        download_url, filename = core.resolve_release_asset("Ylarod/Florida", "16.0.3", "android-arm")
+        self.assertEqual(filename, "florida-server-16.0.3-android-arm.xz")
+        self.assertEqual(download_url, self.server.asset_url("16.0.3", "android-arm", "Ylarod/Florida"))
+
+        # Unknown releases fall back to frida's naming scheme
+        download_url, filename = core.resolve_release_asset("frida/frida", "99.0.0", "android-arm64")
+        self.assertEqual(filename, "frida-server-99.0.0-android-arm64.xz")
+
+        # A missing arch is never a wildcard when picking the asset to install
+        with self.assertRaises(ValueError):
+            index.resolve_asset("frida/frida", "16.2.49", None)
+        with self.assertRaises(ValueError):
+            core.resolve_release_asset("frida/frida", "16.2.49", None)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,79 @@
+#!/usr/bin/env python3
+"""
+Tests for multi-directory and recursive server discovery (core.find_frida_servers) against the fake adb
+"""
+
+import os
+import sys
+import tempfile
+import unittest
+from unittest import mock
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from benchmarks import fake_adb
+from benchmarks.environment import FakeEnvironment
+from fsm import core
+from fsm.device import Device
+
+
+class TestFindServers(unittest.TestCase):
+    def setUp(self):
+        self.env = FakeEnvironment(asset_size=1024).__enter__()
+        self.addCleanup(self.env.__exit__, None, None, None)
+        self.device_dir = self.env.add_device("emulator-5554")
+        patcher = mock.patch.dict(os.environ, dict(self.env.env("emulator-5554"),
+                                                   FSM_CACHE_DIR=tempfile.mkdtemp(dir=self.env.root),
+                                                   FSM_GITHUB_API=self.env.server.base_url))
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.device = Device("emulator-5554")
+        for path in ("/data/adb/modules/frida/frida-server-15.0.0", "/data/adb/modules/my builds/florida-server",
+                     "/data/adb/modules/notes.txt"):
+            fake_adb.add_device_file(self.device_dir, path, fake_adb.fake_server_script("15.0.0"))
+
+    def paths(self, records):
+        return sorted(record['path'] for record in records)
+
+    def test_several_directories_are_searched_with_one_device_call(self):
+        core.install_frida_server("16.1.4", device=self.device)
+        dirs = ["/data/local/tmp", "/data/adb/modules"]
+        with mock.patch('fsm.core.get_frida_server_version', return_value="15.0.0") as probe, \
+                mock.patch('fsm.core.iter_command_lines', wraps=core.iter_command_lines) as iter_lines, \
+                mock.patch('fsm.core.run_command', wraps=core.run_command) as run_command:
+            records = list(core.find_frida_servers(dirs, recursive=True, device=self.device))
+        self.assertEqual(self.paths(records), ["/data/adb/modules/frida/frida-server-15.0.0",
+                                               "/data/adb/modules/my builds/florida-server",
+                                               "/data/local/tmp/frida-server-16.1.4"])
+        self.assertEqual(iter_lines.call_count, 1)
+        run_command.assert_not_called()
+        # The installed binary is described by its manifest; only the other two are executed
+        self.assertEqual(probe.call_count, 2)
+        self.assertIn(("frida-server-16.1.4", "16.1.4"), [(r['filename'], r['version']) for r in records])
+
+    def test_aliases_match_the_single_directory_listing(self):
+        core.install_frida_server("16.1.4", device=self.device)
+        core.install_frida_server("16.1.4", custom_name="my-frida-server", device=self.device)
+        found = {record['filename']: record['aliases']
+                 for record in core.find_frida_servers(["/data/local/tmp"], recursive=True, device=self.device)}
+        listed = {record['filename']: record['aliases']
+                  for record in core.iter_frida_server_files(device=self.device)}
+        self.assertEqual(found, listed)
+        self.assertEqual(found["my-frida-server"], ["frida-server-16.1.4"])
+
+    def test_without_recursive_subdirectories_are_skipped(self):
+        fake_adb.add_device_file(self.device_dir, "/data/adb/modules/frida-server-top", fake_adb.fake_server_script("15.0.0"))
+        records = list(core.find_frida_servers(["/data/adb/modules", "/data/local/tmp"], device=self.device))
+        self.assertEqual(self.paths(records), ["/data/adb/modules/frida-server-top"])
+
+    def test_name_filter_and_many_entries(self):
+        for index in range(300):
+            fake_adb.add_device_file(self.device_dir, f"/data/adb/modules/bulk/frida-server-build-{index:03d}", b"")
+        with mock.patch('fsm.core.get_frida_server_version', return_value=None):
+            records = list(core.find_frida_servers(["/data/adb/modules"], name="build-", recursive=True,
+                                                   device=self.device))
+        self.assertEqual(len(records), 300)
+
+
+if __name__ == '__main__':
+    unittest.main()
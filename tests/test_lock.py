@@ -0,0 +1,111 @@
+#!/usr/bin/env python3
+"""
+Tests for cross-process coordination: single-flight downloads, device locks and atomic writes
+"""
+
+import os
+import shutil
+import sys
+import tempfile
+import threading
+import unittest
+from concurrent.futures import ThreadPoolExecutor
+from unittest import mock
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from benchmarks.environment import FakeEnvironment
+from benchmarks.release_server import ReleaseServer
+from fsm import core
+from fsm.deadline import deadline
+from fsm.device import Device
+from fsm.lock import atomic_path
+
+
+class TestLocks(unittest.TestCase):
+    def setUp(self):
+        self.cache_dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.cache_dir, True)
+        patcher = mock.patch.dict(os.environ, {'FSM_CACHE_DIR': self.cache_dir, 'FSM_MIRRORS': ''})
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def test_concurrent_fetches_share_one_download(self):
+        server = ReleaseServer(asset_size=64 * 1024, delay=0.3).start()
+        self.addCleanup(server.stop)
+        url = server.asset_url("16.1.4")
+
+        def fetch(_):
+            path = core.fetch_frida_server(url, url.rsplit('/', 1)[-1], cache=True)
+            with open(path, 'rb') as f:
+                content = f.read()
+            os.unlink(path)
+            return content
+
+        with ThreadPoolExecutor(max_workers=8) as pool:
+            contents = list(pool.map(fetch, range(8)))
+        self.assertEqual(len(set(contents)), 1)
+        self.assertIn(b"16.1.4", contents[0])
+        self.assertEqual(len([path for path in server.requests if path.endswith('.xz')]), 1)
+        self.assertTrue(os.path.exists(core.get_download_cache_path(url)))
+
+    def test_download_cache_keeps_the_most_recent_entries(self):
+        cache = os.path.join(self.cache_dir, 'downloads')
+        os.makedirs(cache)
+        for index in range(5):
+            path = os.path.join(cache, f"entry-{index}")
+            open(path, 'w').close()
+            os.utime(path, (index, index))
+        core.prune_download_cache(keep=2)
+        self.assertEqual(sorted(os.listdir(cache)), ["entry-3", "entry-4"])
+
+    def test_device_lock_serializes_sessions_and_is_reentrant(self):
+        holder = Device("emulator-5554")
+        acquired, release = threading.Event(), threading.Event()
+
+        def hold():
+            with holder.exclusive():
+                with holder.exclusive():
+                    acquired.set()
+                    release.wait(5)
+
+        thread = threading.Thread(target=hold)
+        thread.start()
+        self.addCleanup(thread.join)
+        self.addCleanup(release.set)
+        self.assertTrue(acquired.wait(5))
+
+        with self.assertRaises(TimeoutError), deadline(0.2):
+            with Device("emulator-5554").exclusive():
+                pass
+        # Other devices are not affected
+        with deadline(0.2), Device("emulator-5556").exclusive():
+            pass
+
+    def test_implicit_and_explicit_serial_share_the_device_lock(self):
+        with FakeEnvironment() as env:
+            env.add_device("emulator-5554")
+            environ = env.env()
+            environ.pop('ANDROID_SERIAL', None)
+            with mock.patch.dict(os.environ, environ, clear=True):
+                with Device().exclusive():
+                    with self.assertRaises(TimeoutError), deadline(0.2):
+                        with Device("emulator-5554").exclusive():
+                            pass
+
+    def test_atomic_path_keeps_the_old_content_on_failure(self):
+        path = os.path.join(self.cache_dir, "state.json")
+        with open(path, 'w') as f:
+            f.write("old")
+        with self.assertRaises(RuntimeError):
+            with atomic_path(path) as tmp_path:
+                with open(tmp_path, 'w') as f:
+                    f.write("partial")
+                raise RuntimeError("interrupted")
+        with open(path) as f:
+            self.assertEqual(f.read(), "old")
+        self.assertEqual(os.listdir(self.cache_dir), ["state.json"])
+
+
+if __name__ == '__main__':
+    unittest.main()
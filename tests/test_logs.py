@@ -0,0 +1,137 @@
+#!/usr/bin/env python3
+"""
+Tests for frida-server log capture (fsm.logs) against the fake adb
+"""
+
+import os
+import sys
+import tempfile
+import threading
+import time
+import unittest
+from unittest import mock
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from benchmarks.environment import FakeEnvironment
+from fsm import logs
+from fsm.core import run_frida_server
+from fsm.device import Device
+
+
+class TestRotatingFiles(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.addCleanup(self.directory.cleanup)
+        self.path = os.path.join(self.directory.name, "frida-server.log")
+
+    def test_rotates_by_size_and_keeps_backup_count(self):
+        log = logs.RotatingLog(self.path, max_bytes=20, backup_count=2)
+        for index in range(10):
+            log.write([f"line {index}"])
+        log.close()
+        self.assertEqual(sorted(os.listdir(self.directory.name)),
+                         ["frida-server.log", "frida-server.log.1", "frida-server.log.2"])
+        self.assertTrue(all(os.path.getsize(f"{self.path}{suffix}") <= 20 for suffix in ("", ".1", ".2")))
+        self.assertEqual(logs.tail_lines(self.path, 4, 2), ["line 6", "line 7", "line 8", "line 9"])
+        self.assertEqual(len(logs.tail_lines(self.path, 100, 2)), 6)
+
+    def test_tail_reads_from_the_end(self):
+        with open(self.path, "w") as f:
+            f.writelines(f"line {index}\n" for index in range(10000))
+        self.assertEqual(logs.tail_lines(self.path, 3), ["line 9997", "line 9998", "line 9999"])
+        self.assertEqual(logs.tail_lines(self.path, 0), [])
+
+    def test_follow_file_survives_rotation(self):
+        log = logs.RotatingLog(self.path, max_bytes=30, backup_count=1)
+        log.write(["before"])
+        seen = []
+        follower = logs.follow_file(self.path, poll_interval=0.01)
+        thread = threading.Thread(target=lambda: [seen.append(line) for _, line in zip(range(3), follower)])
+        thread.start()
+        time.sleep(0.1)
+        log.write(["first line"])
+        log.write(["second line"])
+        log.write(["third line"])
+        thread.join(5)
+        log.close()
+        self.assertEqual(seen, ["first line", "second line", "third line"])
+
+
+class TestDeviceLog(unittest.TestCase):
+    def setUp(self):
+        self.env = FakeEnvironment(asset_size=1024).__enter__()
+        self.addCleanup(self.env.__exit__, None, None, None)
+        self.device_dir = self.env.add_device("emulator-5554")
+        self.env.add_servers(self.device_dir, 1)
+        patcher = mock.patch.dict(os.environ, dict(self.env.env("emulator-5554"),
+                                                   FSM_CACHE_DIR=os.path.join(self.env.root, "cache")))
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.device_log = os.path.join(self.device_dir, "root" + logs.DEVICE_LOG_PATH)
+
+    def append(self, text):
+        os.makedirs(os.path.dirname(self.device_log), exist_ok=True)
+        with open(self.device_log, "a") as f:
+            f.write(text)
+
+    def test_pull_transfers_only_new_lines(self):
+        log = logs.DeviceLog(Device("emulator-5554"))
+        self.assertEqual(log.pull(), [])
+
+        self.append("one\ntwo\nthr")
+        self.assertEqual(log.pull(), ["one", "two"])
+        self.append("ee\n")
+        self.assertEqual(log.pull(), ["three"])
+        self.assertEqual(log.pull(), [])
+
+        # A fresh file (rotated on the device) is read from its start
+        os.replace(self.device_log, self.device_log + ".1")
+        self.append("restarted\n")
+        self.assertEqual(log.pull(), ["restarted"])
+
+        self.assertEqual(logs.tail_lines(log.path, 10), ["one", "two", "three", "restarted"])
+        self.assertEqual(log.recent(2), ["three", "restarted"])
+
+    def test_follow_streams_and_excludes_other_readers(self):
+        self.append("first\n")
+        log = logs.DeviceLog(Device("emulator-5554"))
+        seen = []
+        ready = threading.Event()
+
+        def follow():
+            for line in log.follow():
+                seen.append(line)
+                ready.set()
+
+        thread = threading.Thread(target=follow)
+        thread.start()
+        self.assertTrue(ready.wait(10))
+        # Another reader finds the log busy and relies on the follower's copy
+        self.assertIsNone(logs.DeviceLog(Device("emulator-5554")).pull())
+
+        self.append("second\n")
+        deadline = time.monotonic() + 10
+        while len(seen) < 2 and time.monotonic() < deadline:
+            time.sleep(0.05)
+        log.stop()
+        thread.join(10)
+        self.assertEqual(seen, ["first", "second"])
+        self.assertEqual(logs.tail_lines(log.path, 10), ["first", "second"])
+        # The next pull continues after what the follower copied
+        self.append("third\n")
+        self.assertEqual(log.pull(), ["third"])
+
+    def test_run_with_log_writes_the_device_log(self):
+        device = Device("emulator-5554")
+        with mock.patch('time.sleep'):
+            self.assertTrue(run_frida_server(device=device, log=True))
+            self.assertTrue(run_frida_server(device=device, log=True))
+        self.assertTrue(os.path.exists(self.device_log + ".1"))
+        with open(self.device_log) as f:
+            self.assertIn("Frida 16.1.4 listening", f.read())
+        self.assertEqual(logs.DeviceLog(device).pull(), ["Frida 16.1.4 listening on 127.0.0.1:27042"])
+
+
+if __name__ == '__main__':
+    unittest.main()
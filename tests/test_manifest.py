@@ -0,0 +1,85 @@
+#!/usr/bin/env python3
+"""
+Tests for the device-side install manifest (fsm.manifest) against the fake adb
+"""
+
+import os
+import sys
+import tempfile
+import unittest
+from unittest import mock
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from benchmarks import fake_adb
+from benchmarks.environment import FakeEnvironment
+from fsm import core, manifest
+from fsm.device import Device
+
+
+def elf_blob(machine, *strings):
+    header = b'\x7fELF\x02\x01\x01' + b'\x00' * 11 + machine.to_bytes(2, 'little')
+    return header + b'\x00' * 44 + b''.join(b'\x00' + s.encode() + b'\x00' for s in strings)
+
+
+class TestScanElf(unittest.TestCase):
+    def scan(self, data):
+        with tempfile.NamedTemporaryFile(delete=False) as f:
+            f.write(data)
+        self.addCleanup(os.unlink, f.name)
+        return manifest.scan_elf(f.name)
+
+    def test_reads_arch_and_most_referenced_version(self):
+        self.assertEqual(self.scan(elf_blob(0xB7, "16.1.4", "1.2.3", "16.1.4")), ('android-arm64', "16.1.4"))
+
+    def test_non_elf_has_neither(self):
+        self.assertEqual(self.scan(b"#!/bin/sh\necho 16.1.4\n"), (None, None))
+
+
+class TestParse(unittest.TestCase):
+    def test_later_lines_win_and_garbage_is_skipped(self):
+        entries = manifest.parse('{"name": "a", "version": "1.0.0"}\nnot json\n{"name": "a", "version": "2.0.0"}\n')
+        self.assertEqual(entries, {'a': {'name': 'a', 'version': "2.0.0"}})
+
+
+class TestManifest(unittest.TestCase):
+    def setUp(self):
+        self.env = FakeEnvironment(asset_size=1024).__enter__()
+        self.addCleanup(self.env.__exit__, None, None, None)
+        self.device_dir = self.env.add_device("emulator-5554")
+        self.cache_dir = tempfile.mkdtemp(dir=self.env.root)
+        patcher = mock.patch.dict(os.environ, dict(self.env.env("emulator-5554"), FSM_CACHE_DIR=self.cache_dir,
+                                                   FSM_GITHUB_API=self.env.server.base_url))
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def test_install_records_entry_and_list_does_not_execute_it(self):
+        device = Device("emulator-5554")
+        core.install_frida_server("16.1.4", device=device)
+        entries = manifest.load("/data/local/tmp", device)
+        entry = entries["frida-server-16.1.4"]
+        self.assertEqual((entry['version'], entry['arch']), ("16.1.4", "android-arm64"))
+        self.assertEqual(len(entry['sha256']), 64)
+
+        with mock.patch('fsm.core.get_frida_server_version') as probe:
+            files = list(core.iter_frida_server_files(device=device))
+        probe.assert_not_called()
+        self.assertEqual([(f['filename'], f['version']) for f in files], [("frida-server-16.1.4", "16.1.4")])
+
+    def test_changed_or_unrecorded_files_are_probed(self):
+        device = Device("emulator-5554")
+        core.install_frida_server("16.1.4", device=device)
+        fake_adb.add_device_file(self.device_dir, "/data/local/tmp/frida-server-16.1.4",
+                                 fake_adb.fake_server_script("16.1.4", padding=10))
+        fake_adb.add_device_file(self.device_dir, "/data/local/tmp/frida-server-custom",
+                                 fake_adb.fake_server_script("15.0.0"))
+        device.invalidate('listings')
+        self.assertEqual(manifest.load("/data/local/tmp", device), {})
+
+        with mock.patch('fsm.core.get_frida_server_version', return_value="15.0.0") as probe:
+            list(core.iter_frida_server_files(device=device))
+        self.assertEqual(probe.call_count, 2)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,82 @@
+#!/usr/bin/env python3
+"""
+Tests for racing download mirrors (fsm.mirrors) against local release servers
+"""
+
+import os
+import shutil
+import sys
+import tempfile
+import time
+import unittest
+from unittest import mock
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from benchmarks.release_server import ReleaseServer
+from fsm import core, mirrors
+
+
+class TestMirrorUrls(unittest.TestCase):
+    def test_base_and_template_mirrors(self):
+        url = "https://github.com/frida/frida/releases/download/16.1.4/frida-server-16.1.4-android-arm64.xz"
+        self.assertEqual(mirrors.mirror_url("https://mirror.example/gh", url),
+                         "https://mirror.example/gh/frida/frida/releases/download/16.1.4/frida-server-16.1.4-android-arm64.xz")
+        self.assertEqual(mirrors.mirror_url("https://proxy.example/{url}", url), "https://proxy.example/" + url)
+
+    def test_configured_mirrors_merge_environment(self):
+        with mock.patch.dict(os.environ, {'FSM_MIRRORS': "https://b.example/, https://c.example"}):
+            self.assertEqual(mirrors.configured_mirrors(["https://a.example", "https://b.example"]),
+                             ["https://a.example", "https://b.example", "https://c.example"])
+
+    def test_rank_tries_new_mirrors_first_and_failed_ones_last(self):
+        stats = {
+            'slow': {'throughput': 10.0, 'last_ok': True},
+            'fast': {'throughput': 1000.0, 'last_ok': True},
+            'broken': {'throughput': 5000.0, 'last_ok': False},
+        }
+        self.assertEqual(mirrors.rank(['broken', 'slow', 'new', 'fast'], stats), ['new', 'fast', 'slow', 'broken'])
+
+
+class TestRace(unittest.TestCase):
+    def setUp(self):
+        self.cache_dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.cache_dir, True)
+        patcher = mock.patch.dict(os.environ, {'FSM_CACHE_DIR': self.cache_dir, 'FSM_MIRRORS': ''})
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+        self.slow = ReleaseServer(asset_size=256 * 1024, delay=2.0).start()
+        self.fast = ReleaseServer(asset_size=256 * 1024).start()
+        self.broken = ReleaseServer(versions=("1.0.0",)).start()
+        for server in (self.slow, self.fast, self.broken):
+            self.addCleanup(server.stop)
+
+    def fetch(self, url, mirror_list):
+        path = core.fetch_frida_server(url, url.rsplit('/', 1)[-1], mirrors=mirror_list)
+        self.addCleanup(os.unlink, path)
+        return path
+
+    def test_fastest_mirror_wins_and_is_remembered(self):
+        start = time.monotonic()
+        path = self.fetch(self.slow.asset_url("16.1.4"), [self.broken.base_url, self.fast.base_url])
+        self.assertLess(time.monotonic() - start, 1.5)
+        with open(path, 'rb') as f:
+            self.assertIn(b"16.1.4", f.read())
+
+        stats = mirrors.load_stats()
+        self.assertEqual(stats[self.fast.base_url]['successes'], 1)
+        self.assertGreater(stats[self.fast.base_url]['throughput'], 0)
+        self.assertEqual(stats[self.broken.base_url]['failures'], 1)
+        # The slow origin had not answered yet, so nothing is known about it
+        self.assertNotIn(self.slow.base_url, stats)
+        self.assertEqual(mirrors.rank([self.broken.base_url, self.fast.base_url, self.slow.base_url]),
+                         [self.slow.base_url, self.fast.base_url, self.broken.base_url])
+
+    def test_all_mirrors_failing_raises(self):
+        with self.assertRaises(Exception):
+            self.fetch(self.broken.asset_url("9.9.9"), [self.fast.base_url + "/missing"])
+
+
+if __name__ == '__main__':
+    unittest.main()
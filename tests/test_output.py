@@ -0,0 +1,93 @@
+#!/usr/bin/env python3
+"""
+Tests for machine-readable output (--output json|ndjson|tsv)
+"""
+
+import io
+import json
+import os
+import sys
+import unittest
+from unittest import mock
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from typer.testing import CliRunner
+
+from fsm.cli import app
+from fsm.core import parse_process_line
+from fsm.output import PROCESS_FIELDS, write_records
+
+PS_LINES = [
+    "USER           PID  PPID     VSZ    RSS WCHAN            ADDR S NAME",
+    "root         12345     1  123456  5678 0                   0 S /data/local/tmp/frida-server-16.1.4",
+    "root         12345     1  123456  5678 0                   0 S /data/local/tmp/frida-server-16.1.4",
+    "u0_a42       23456     1  223456  9999 0                   0 S frida-helper --flag",
+]
+
+
+class TestWriteRecords(unittest.TestCase):
+    records = [
+        {'pid': '1', 'user': 'root', 'memory': '10', 'command': 'init'},
+        {'pid': '2', 'user': 'root', 'memory': '20', 'command': 'with\ttab'},
+    ]
+
+    def test_json_array(self):
+        stream = io.StringIO()
+        self.assertEqual(write_records(iter(self.records), 'json', PROCESS_FIELDS, stream), 2)
+        self.assertEqual(json.loads(stream.getvalue()), self.records)
+
+    def test_empty_json_array(self):
+        stream = io.StringIO()
+        write_records(iter([]), 'json', PROCESS_FIELDS, stream)
+        self.assertEqual(json.loads(stream.getvalue()), [])
+
+    def test_ndjson(self):
+        stream = io.StringIO()
+        write_records(iter(self.records), 'ndjson', PROCESS_FIELDS, stream)
+        lines = stream.getvalue().splitlines()
+        self.assertEqual([json.loads(line) for line in lines], self.records)
+
+    def test_tsv_escapes_tabs(self):
+        stream = io.StringIO()
+        write_records(iter(self.records), 'tsv', PROCESS_FIELDS, stream)
+        lines = stream.getvalue().splitlines()
+        self.assertEqual(lines[0], "pid\tuser\tmemory\tcommand")
+        self.assertEqual(lines[2], "2\troot\t20\twith\\ttab")
+
+
+class TestParseProcessLine(unittest.TestCase):
+    def test_header_is_skipped(self):
+        self.assertIsNone(parse_process_line(PS_LINES[0]))
+
+    def test_command_with_arguments(self):
+        process = parse_process_line(PS_LINES[3])
+        self.assertEqual(process['pid'], '23456')
+        self.assertEqual(process['command'], 'frida-helper --flag')
+
+
+class TestCliMachineOutput(unittest.TestCase):
+    @mock.patch('fsm.core.iter_command_lines')
+    def test_ps_ndjson_deduplicates(self, mock_lines):
+        mock_lines.return_value = iter(PS_LINES)
+        result = CliRunner().invoke(app, ['ps', '-n', 'frida', '--output', 'ndjson'])
+        self.assertEqual(result.exit_code, 0)
+        pids = [json.loads(line)['pid'] for line in result.output.splitlines()]
+        self.assertEqual(pids, ['12345', '23456'])
+
+    @mock.patch('fsm.core.get_frida_server_version', return_value='16.1.4')
+    @mock.patch('fsm.core.run_command', return_value="frida-server-16.1.4\nflorida-server\n")
+    def test_list_tsv(self, mock_run, mock_version):
+        result = CliRunner().invoke(app, ['list', '-o', 'tsv'])
+        self.assertEqual(result.exit_code, 0)
+        self.assertEqual(result.output.splitlines()[1],
+                         "florida-server\t/data/local/tmp/florida-server\t16.1.4\t")
+
+    @mock.patch('fsm.core.run_command', return_value=None)
+    def test_check_json_without_adb(self, mock_run):
+        result = CliRunner().invoke(app, ['check', '-o', 'json'])
+        self.assertEqual(result.exit_code, 1)
+
+
+if __name__ == '__main__':
+    unittest.main()
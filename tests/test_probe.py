@@ -0,0 +1,72 @@
+#!/usr/bin/env python3
+"""
+Tests for the frida-server latency probe (fsm.probe) against a local stand-in
+"""
+
+import os
+import socket
+import sys
+import unittest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from benchmarks.frida_server import FakeFridaServer
+from benchmarks.release_server import ReleaseServer
+from fsm import probe
+
+
+def unused_port():
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+class TestProbe(unittest.TestCase):
+    def test_parse_endpoint(self):
+        self.assertEqual(probe.parse_endpoint("127.0.0.1:27100"), ("127.0.0.1", 27100))
+        self.assertEqual(probe.parse_endpoint("27042"), ("127.0.0.1", 27042))
+
+    def test_summary_interpolates_percentiles_of_successful_samples(self):
+        samples = [{'ok': True, 'connect_ms': value, 'response_ms': value} for value in (4, 1, 3, 5, 2)]
+        samples.append({'ok': False, 'connect_ms': None, 'response_ms': None})
+        summary = probe.summarize(samples)['connect_ms']
+        self.assertEqual((summary['min'], summary['p50'], summary['p90'], summary['max']), (1, 3, 4.6, 5))
+        self.assertIsNone(probe.summarize([samples[-1]])['response_ms']['p50'])
+
+    def test_probe_measures_every_handshake(self):
+        with FakeFridaServer(delay=0.01) as server:
+            samples = [sample for sample in probe.probe("127.0.0.1", server.port, iterations=5)]
+            self.assertEqual(server.connections, 5)
+        self.assertEqual([sample['iteration'] for sample in samples], [1, 2, 3, 4, 5])
+        self.assertTrue(all(sample['ok'] for sample in samples))
+        self.assertTrue(all(sample['response_ms'] >= 10 for sample in samples))
+
+        summary = probe.summarize(samples)
+        self.assertLessEqual(summary['response_ms']['min'], summary['response_ms']['p50'])
+        self.assertLessEqual(summary['response_ms']['p99'], summary['response_ms']['max'])
+
+    def test_failures_are_recorded(self):
+        samples = [sample for sample in probe.probe("127.0.0.1", unused_port(), iterations=2, timeout=0.5)]
+        self.assertFalse(any(sample['ok'] for sample in samples))
+        self.assertTrue(samples[0]['error'])
+        self.assertIsNone(probe.summarize(samples)['connect_ms']['p50'])
+
+    def test_non_frida_responses_fail_the_handshake(self):
+        with ReleaseServer() as server:
+            port = int(server.base_url.rsplit(':', 1)[1])
+            with self.assertRaises(probe.HandshakeError):
+                probe.handshake("127.0.0.1", port)
+
+    def test_wait_until_ready(self):
+        with FakeFridaServer(ready_after=0.3) as server:
+            with self.assertRaises(probe.HandshakeError):
+                probe.handshake("127.0.0.1", server.port)
+            waited = probe.wait_until_ready("127.0.0.1", server.port, timeout=5, interval=0.05)
+            self.assertGreaterEqual(waited, 0.2)
+
+        with self.assertRaises(TimeoutError):
+            probe.wait_until_ready("127.0.0.1", unused_port(), timeout=0.3, interval=0.05)
+
+
+if __name__ == '__main__':
+    unittest.main()
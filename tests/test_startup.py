@@ -0,0 +1,36 @@
+#!/usr/bin/env python3
+"""
+Startup budget for the fsm CLI, measured with `python -X importtime`
+"""
+
+import os
+import subprocess
+import sys
+import unittest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from benchmarks.environment import PROJECT_ROOT
+from benchmarks.importtime import LAZY_MODULES, STARTUP_BUDGET_MS, measure_import
+
+
+class TestStartup(unittest.TestCase):
+    def test_import_within_budget(self):
+        total_ms, _ = measure_import("fsm.cli", runs=3)
+        self.assertLessEqual(total_ms, STARTUP_BUDGET_MS)
+
+    def test_heavy_modules_are_lazy(self):
+        _, modules = measure_import("fsm.cli", runs=1)
+        eager = [name for name in LAZY_MODULES if name in modules]
+        self.assertEqual(eager, [])
+
+    def test_help_skips_rich_when_piped(self):
+        result = subprocess.run([sys.executable, "-X", "importtime", "-m", "fsm", "--help"],
+                                stdout=subprocess.PIPE, stderr=subprocess.PIPE, text=True, cwd=PROJECT_ROOT)
+        self.assertEqual(result.returncode, 0)
+        self.assertIn("Usage:", result.stdout)
+        self.assertNotIn("typer.rich_utils", result.stderr)
+
+
+if __name__ == '__main__':
+    unittest.main()
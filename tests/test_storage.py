@@ -0,0 +1,95 @@
+#!/usr/bin/env python3
+"""
+Tests for on-device garbage collection (fsm.storage) against the fake adb
+"""
+
+import os
+import sys
+import time
+import unittest
+from unittest import mock
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from benchmarks import fake_adb
+from benchmarks.environment import FakeEnvironment
+from fsm import core, storage
+from fsm.device import Device
+
+
+def record(name, last_used, running=False):
+    version = name.split('-')[2] if name.count('-') >= 2 else None
+    return {'name': name, 'path': f"/data/local/tmp/{name}", 'version': version, 'size': 100,
+            'last_used': last_used, 'running': running}
+
+
+class TestPlan(unittest.TestCase):
+    def test_keeps_recent_versions_pinned_and_running(self):
+        files = storage.plan([
+            record("frida-server-17.0.0-arm64", 50),
+            record("frida-server-17.0.0-arm", 10),
+            record("frida-server-16.1.4-arm64", 40),
+            record("frida-server-16.0.0-arm64", 30),
+            record("frida-server-15.0.0-arm64", 20),
+            record("frida-server-14.0.0-arm64", 1, running=True),
+        ], keep=2, pins=["15.0.0"])
+        actions = {f['name']: (f['action'], f['reason']) for f in files}
+        self.assertEqual(actions["frida-server-17.0.0-arm"], ('keep', 'recently used'))
+        self.assertEqual(actions["frida-server-16.1.4-arm64"], ('keep', 'recently used'))
+        self.assertEqual(actions["frida-server-16.0.0-arm64"], ('delete', 'not used recently'))
+        self.assertEqual(actions["frida-server-15.0.0-arm64"], ('keep', 'pinned'))
+        self.assertEqual(actions["frida-server-14.0.0-arm64"], ('keep', 'running'))
+
+    def test_keep_zero_deletes_everything_idle(self):
+        files = storage.plan([record("frida-server-17.0.0-arm64", 5)], keep=0)
+        self.assertEqual(files[0]['action'], 'delete')
+
+
+class TestGc(unittest.TestCase):
+    def setUp(self):
+        self.env = FakeEnvironment(asset_size=1024).__enter__()
+        self.addCleanup(self.env.__exit__, None, None, None)
+        self.device_dir = self.env.add_device("emulator-5554")
+        patcher = mock.patch.dict(os.environ, self.env.env("emulator-5554"))
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+        now = time.time()
+        for age, version in enumerate(["17.0.0", "16.1.4", "16.0.0", "15.0.0"]):
+            path = fake_adb.add_device_file(self.device_dir, f"/data/local/tmp/frida-server-{version}",
+                                            fake_adb.fake_server_script(version))
+            os.utime(path, (now - 3600 * (age + 1), now - 86400))
+        os.makedirs(os.path.join(self.device_dir, "root/data/local/tmp/frida-server-data"))
+        self.tmp = os.path.join(self.device_dir, "root/data/local/tmp")
+
+    def test_collect_uses_one_round_trip(self):
+        device = Device("emulator-5554")
+        with mock.patch('fsm.core.run_command', wraps=core.run_command) as run_command:
+            files = storage.collect(device=device)
+        self.assertEqual(run_command.call_count, 1)
+        self.assertEqual([f['version'] for f in files], ["17.0.0", "16.1.4", "16.0.0", "15.0.0"])
+        self.assertTrue(all(f['size'] > 0 and not f['running'] for f in files))
+
+    def test_dry_run_keeps_files(self):
+        files = storage.gc(keep=1, dry_run=True, device=Device("emulator-5554"))
+        self.assertEqual(sum(f['action'] == 'delete' for f in files), 3)
+        self.assertEqual(len([name for name in os.listdir(self.tmp) if name.startswith("frida-server-1")]), 4)
+
+    def test_gc_deletes_in_one_batch_and_spares_the_running_server(self):
+        device = Device("emulator-5554")
+        with mock.patch('time.sleep'):
+            core.run_frida_server(version="15.0.0", device=device)
+        # Starting 15.0.0 refreshed its access time, so it is now the most recently used
+        files = storage.collect(device=device)
+        self.assertEqual(files[0]['version'], "15.0.0")
+        self.assertTrue(files[0]['running'])
+
+        with mock.patch('fsm.storage.run_command', wraps=core.run_command) as run_command:
+            storage.gc(keep=2, pins=["16.0.0"], device=device)
+        self.assertEqual(run_command.call_count, 1)
+        self.assertEqual(sorted(os.listdir(self.tmp)),
+                         ["frida-server-15.0.0", "frida-server-16.0.0", "frida-server-17.0.0", "frida-server-data"])
+
+
+if __name__ == '__main__':
+    unittest.main()
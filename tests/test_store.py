@@ -0,0 +1,71 @@
+#!/usr/bin/env python3
+"""
+Tests for the content-addressed on-device store (fsm.store) against the fake adb
+"""
+
+import os
+import sys
+import tempfile
+import unittest
+from unittest import mock
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from benchmarks.environment import FakeEnvironment
+from fsm import core, storage, store
+from fsm.device import Device
+
+
+class TestStore(unittest.TestCase):
+    def setUp(self):
+        self.env = FakeEnvironment(asset_size=1024).__enter__()
+        self.addCleanup(self.env.__exit__, None, None, None)
+        self.device_dir = self.env.add_device("emulator-5554")
+        patcher = mock.patch.dict(os.environ, dict(self.env.env("emulator-5554"),
+                                                   FSM_CACHE_DIR=tempfile.mkdtemp(dir=self.env.root),
+                                                   FSM_GITHUB_API=self.env.server.base_url))
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.device = Device("emulator-5554")
+        self.tmp = os.path.join(self.device_dir, "root/data/local/tmp")
+        core.install_frida_server("16.1.4", device=self.device)
+
+    def test_installing_a_stored_release_under_another_name_only_links_it(self):
+        with mock.patch('fsm.core.fetch_frida_server') as fetch, \
+                mock.patch('fsm.core.run_command', wraps=core.run_command) as run_command:
+            core.install_frida_server("16.1.4", custom_name="my-frida-server", device=self.device)
+        fetch.assert_not_called()
+        self.assertFalse([call for call in run_command.call_args_list if " push " in call.args[0]])
+
+        default, alias = (os.path.join(self.tmp, name) for name in ("frida-server-16.1.4", "my-frida-server"))
+        self.assertEqual(os.stat(default).st_ino, os.stat(alias).st_ino)
+        self.assertEqual(len(os.listdir(os.path.join(self.tmp, store.STORE_NAME))), 1)
+
+        records = {record['filename']: record for record in core.iter_frida_server_files(device=self.device)}
+        self.assertEqual(records["my-frida-server"]['version'], "16.1.4")
+        self.assertEqual(records["frida-server-16.1.4"]['aliases'], ["my-frida-server"])
+
+    def test_gc_drops_a_stored_binary_with_its_last_name(self):
+        core.install_frida_server("16.1.4", custom_name="my-frida-server", device=self.device)
+        blobs = os.path.join(self.tmp, store.STORE_NAME)
+
+        storage.gc(keep=0, pins=["my-frida-server"], device=self.device)
+        self.assertEqual(len(os.listdir(blobs)), 1)
+
+        storage.gc(keep=0, device=self.device)
+        self.assertEqual(os.listdir(blobs), [])
+
+    def test_gc_counts_a_shared_binary_once_and_only_with_its_last_name(self):
+        core.install_frida_server("16.1.4", custom_name="my-frida-server", device=self.device)
+        size = os.path.getsize(os.path.join(self.tmp, "frida-server-16.1.4"))
+
+        files = storage.gc(keep=0, pins=["my-frida-server"], dry_run=True, device=self.device)
+        self.assertEqual([(f['name'], f['freed']) for f in files if f['action'] == 'delete'],
+                         [("frida-server-16.1.4", 0)])
+
+        files = storage.gc(keep=0, device=self.device)
+        self.assertEqual(sum(f['freed'] for f in files), size)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,88 @@
+#!/usr/bin/env python3
+"""
+Tests for version switching (`fsm run --switch`) and atomic installs against the fake adb
+"""
+
+import io
+import os
+import sys
+import tempfile
+import time
+import unittest
+from contextlib import redirect_stdout
+from unittest import mock
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from benchmarks import fake_adb
+from benchmarks.environment import FakeEnvironment
+from fsm import core
+from fsm.device import Device
+
+
+class TestSwitch(unittest.TestCase):
+    def setUp(self):
+        self.env = FakeEnvironment(asset_size=1024).__enter__()
+        self.addCleanup(self.env.__exit__, None, None, None)
+        self.device_dir = self.env.add_device("emulator-5554")
+        patcher = mock.patch.dict(os.environ, dict(self.env.env("emulator-5554"),
+                                                   FSM_CACHE_DIR=tempfile.mkdtemp(dir=self.env.root),
+                                                   FSM_GITHUB_API=self.env.server.base_url))
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        for version in ("16.1.4", "17.0.0"):
+            fake_adb.add_device_file(self.device_dir, f"/data/local/tmp/frida-server-{version}",
+                                     fake_adb.fake_server_script(version))
+        self.device = Device("emulator-5554")
+        core.run_frida_server(version="16.1.4", device=self.device)
+
+    def running(self):
+        self.device.invalidate('servers')
+        return [process['command'] for process in map(core.parse_process_line, self.device.running_servers())]
+
+    def test_switch_replaces_the_server_without_host_sleeps(self):
+        out = io.StringIO()
+        # Only the time module fsm.core sees is watched; subprocess polls the real one while waiting for adb
+        with mock.patch('fsm.core.time', wraps=time) as core_time, redirect_stdout(out):
+            self.assertTrue(core.run_frida_server(version="17.0.0", device=self.device, switch=True))
+        core_time.sleep.assert_not_called()
+        self.assertEqual(self.running(), ["/data/local/tmp/frida-server-17.0.0"])
+        self.assertRegex(out.getvalue(), r"downtime \d+ ms")
+
+    def test_switch_leaves_the_old_server_alone_when_the_new_one_is_not_executable(self):
+        fake_adb.add_device_file(self.device_dir, "/data/local/tmp/frida-server-broken", b"", mode=0o644)
+        with self.assertRaises(SystemExit), redirect_stdout(io.StringIO()):
+            core.run_frida_server(name="frida-server-broken", device=self.device, switch=True)
+        self.assertEqual(self.running(), ["/data/local/tmp/frida-server-16.1.4"])
+
+    def test_switch_gives_up_after_its_timeout_by_the_device_clock(self):
+        script = core.switch_script("/data/local/tmp/frida-server-17.0.0", "true;", timeout=1)
+        start = time.monotonic()
+        lines = list(core.iter_command_lines(self.device.root_command(script)))
+        self.assertIn("fsm-switch:timeout", "".join(lines))
+        self.assertLess(time.monotonic() - start, 5)
+
+    def test_restart_runs_every_adb_call_through_run_command_with_a_timeout(self):
+        with mock.patch('fsm.core.run_command', wraps=core.run_command) as run_command, \
+                mock.patch('fsm.core.subprocess.run') as raw_run:
+            self.assertTrue(core.run_frida_server(version="17.0.0", force=True, device=self.device))
+        raw_run.assert_not_called()
+        restart = [call for call in run_command.call_args_list if "kill" in call.args[0] or "nohup" in call.args[0]]
+        self.assertEqual(len(restart), 4)
+        self.assertTrue(all(call.kwargs.get('timeout') for call in restart))
+        self.assertEqual(self.running(), ["/data/local/tmp/frida-server-17.0.0"])
+
+    def test_install_pushes_to_a_temporary_name_and_renames(self):
+        with mock.patch('fsm.core.run_command', wraps=core.run_command) as run_command:
+            core.install_frida_server("16.1.4", device=self.device)
+        pushes = [call.args[0] for call in run_command.call_args_list if " push " in call.args[0]]
+        self.assertEqual(len(pushes), 1)
+        self.assertRegex(pushes[0], r"/data/local/tmp/\.fsm-store/\.[0-9a-f]{64}\.fsm-tmp$")
+        tmp = os.path.join(self.device_dir, "root/data/local/tmp")
+        for directory in (tmp, os.path.join(tmp, ".fsm-store")):
+            self.assertFalse([name for name in os.listdir(directory) if name.endswith(".fsm-tmp")])
+        self.assertTrue(os.access(os.path.join(tmp, "frida-server-16.1.4"), os.X_OK))
+
+
+if __name__ == '__main__':
+    unittest.main()